@@ -0,0 +1,179 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+from telethon import events
+from config import SOURCE_GROUP_SETTINGS
+
+
+logger = logging.getLogger(__name__)
+
+# Reply wording for each group control command
+GROUP_COMMANDS = {
+    '/pause': 'Paused',
+    '/resume': 'Resumed',
+    '/drain': 'Draining',
+}
+
+HELP_TEXT = """Admin commands (send them to your Saved Messages):
+/status - rates, queue depth, pre-filter, send lanes, cache hit rates, latency
+/schedule - upcoming posts Telegram will publish (scheduled pacing)
+/pause <group> - stop ingesting and hold queued messages
+/resume <group> - resume ingesting and release held messages
+/drain <group> - stop ingesting, let queued messages go out
+/profile start|stop - CPU profile of the running bot
+/memsnap - memory snapshot (first call starts tracing)
+<group> is a group id, letter (e.g. S) or name"""
+
+
+class AdminControl:
+    """Runtime control channel driven by commands in our Saved Messages
+
+    Only the bot's own account can write to its Saved Messages, so no extra
+    authentication is needed.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def register(self, client):
+        """Listen for /commands we send to ourselves"""
+        @client.on(events.NewMessage(chats='me', outgoing=True, pattern=r'^/\w+'))
+        async def handle_admin_command(event):
+            try:
+                reply = self.execute(event.raw_text)
+            except Exception as e:
+                logger.error(f"Admin command failed: {e}")
+                reply = f"❌ {e}"
+            await event.reply(reply)
+
+    def execute(self, command_text: str) -> str:
+        """Run one admin command and return the reply text"""
+        parts = command_text.split(maxsplit=1)
+        command = parts[0].lower()
+        argument = parts[1].strip() if len(parts) > 1 else ''
+
+        if command == '/status':
+            return self.status()
+        if command == '/schedule':
+            return self.schedule()
+        if command in GROUP_COMMANDS:
+            group_id = self.resolve_group(argument)
+            if group_id is None:
+                return f"❌ Unknown group: {argument or '(missing)'}"
+            getattr(self.bot, f"{command[1:]}_group")(group_id)
+            return f"✅ {GROUP_COMMANDS[command]} {self._label(group_id)}"
+        if command == '/profile':
+            if argument == 'start':
+                self.bot.profiling.start_cpu_profile()
+                return "✅ CPU profiling started"
+            if argument == 'stop':
+                path = self.bot.profiling.stop_cpu_profile()
+                return f"✅ CPU profile written to {path}" if path else "CPU profiling was not running"
+            return "Usage: /profile start|stop"
+        if command == '/memsnap':
+            path = self.bot.profiling.memory_snapshot()
+            return f"✅ Memory snapshot written to {path}" if path else "✅ Memory tracing started"
+        return HELP_TEXT
+
+    def status(self) -> str:
+        """Human-readable pipeline snapshot"""
+        bot = self.bot
+        queue_stats = bot.queue.stats()
+        connection = bot.watchdog.stats()
+        lanes = bot.lanes.stats()
+        prefilter = bot.prefilter.stats()
+        best_offer = bot.best_offer.stats()
+        digest = bot.digest.stats()
+        lines = [
+            "📊 Pipeline status",
+            f"Queue: {queue_stats['depth']}/{queue_stats['maxsize']} queued, "
+            f"{queue_stats['held']} held, shed {queue_stats['shed_overflow']} overflow / "
+            f"{queue_stats['shed_stale']} stale",
+            f"Coalescing: {len(bot.coalescer)} posts held, {bot.coalescer.merged} merged",
+            f"Best offer: {best_offer['open']} windows open ({best_offer['held']} held), "
+            f"{best_offer['chosen']} chosen, {best_offer['suppressed']} suppressed",
+            f"Digest: {digest['buffered']} listings buffered in {digest['groups']} groups, "
+            f"{digest['digested']} sent in {digest['posts']} posts",
+            f"Pre-filter: {prefilter['passed']} passed, {prefilter['rejected']} dropped {prefilter['by_rule']}",
+            f"Fast lane: {lanes['fast']['per_min']}/min, p95 latency {lanes['fast']['latency']['p95']:.1f}s, "
+            f"p95 send {lanes['fast']['send_time']['p95']:.1f}s, {lanes['fast']['failed']} failed",
+            f"Bulk lane: {lanes['bulk']['active']}/{lanes['bulk']['workers']} busy, "
+            f"{lanes['bulk']['queued']} queued, {lanes['bulk']['per_min']}/min, "
+            f"{lanes['bulk']['bytes_per_sec'] / 1024:.0f} KB/s, p95 latency {lanes['bulk']['latency']['p95']:.1f}s, "
+            f"p95 send {lanes['bulk']['send_time']['p95']:.1f}s, {lanes['bulk']['failed']} failed",
+            f"Connection: {connection['reconnects']} reconnects, "
+            f"{connection['recovered']} messages recovered, last recovery "
+            f"{connection['last_recovery_seconds']}s, last update {connection['seconds_since_update']}s ago",
+        ]
+
+        latency = bot.metrics.latency_percentiles()
+        lines.append(
+            "Latency: " + ', '.join(f"{key} {value:.1f}s" for key, value in latency.items())
+        )
+
+        cache_rates = bot.metrics.cache_hit_rates()
+        if cache_rates:
+            for name, cache_stats in cache_rates.items():
+                lines.append(f"Cache {name}: {cache_stats['hit_rate'] * 100:.0f}% hits ({cache_stats})")
+        else:
+            lines.append("Caches: none registered")
+
+        lines.append("Groups:")
+        rates = bot.metrics.group_rates(list(SOURCE_GROUP_SETTINGS))
+        for group_id, group_rates in rates.items():
+            queued = bot.queue.depth_for(group_id) + bot.lanes.queue.depth_for(group_id)
+            if group_id in bot.queue.held_groups:
+                state = 'paused'
+            elif group_id in bot.enabled_groups:
+                state = 'active'
+            else:
+                state = 'draining' if queued else 'stopped'
+            lines.append(
+                f"  {self._label(group_id)} [{state}] "
+                f"in {group_rates['received_per_min']}/min, out {group_rates['forwarded_per_min']}/min, "
+                f"queued {queued}, "
+                f"total {group_rates['received']}→{group_rates['forwarded']} "
+                f"({group_rates['failed']} failed)"
+            )
+        return '\n'.join(lines)
+
+    def schedule(self, limit: int = 20) -> str:
+        """Upcoming scheduled posts, soonest first"""
+        timeline = self.bot.timeline
+        stats = timeline.stats()
+        lines = [
+            f"🗓 {stats['pending']} post(s) scheduled, {stats['published']} published, "
+            f"timeline ends in {stats['seconds_to_last'] // 60} min"
+        ]
+        upcoming = timeline.upcoming()
+        for post in upcoming[:limit]:
+            at = datetime.fromtimestamp(post.slot, timezone.utc)
+            if post.source_group_id is None:
+                source = "(unknown source)"
+            elif post.source_message_id < 0:
+                source = f"{self._label(post.source_group_id)} digest"
+            else:
+                source = f"{self._label(post.source_group_id)} #{post.source_message_id}"
+            lines.append(f"  {at:%H:%M:%S} UTC {source}")
+        if len(upcoming) > limit:
+            lines.append(f"  … and {len(upcoming) - limit} more")
+        return '\n'.join(lines)
+
+    def resolve_group(self, argument: str) -> Optional[int]:
+        """Find a source group by id, letter or name"""
+        if not argument:
+            return None
+        try:
+            group_id = int(argument)
+            return group_id if group_id in SOURCE_GROUP_SETTINGS else None
+        except ValueError:
+            pass
+        wanted = argument.lower()
+        for group_id, settings in SOURCE_GROUP_SETTINGS.items():
+            if wanted in (settings.get('letter', '').lower(), settings.get('name', '').lower()):
+                return group_id
+        return None
+
+    def _label(self, group_id: int) -> str:
+        settings = SOURCE_GROUP_SETTINGS.get(group_id, {})
+        return f"[{settings.get('letter', '?')}] {settings.get('name', group_id)}"
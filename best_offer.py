@@ -0,0 +1,203 @@
+import re
+import heapq
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from forward_job import ForwardJob
+
+
+logger = logging.getLogger(__name__)
+
+# A price with its number, so it drops out of the fingerprint entirely
+PRICE_TOKEN = re.compile(
+    r'(?:£|\$|৳)\s*\d[\d,.]*|\d[\d,.]*\s*(?:taka|tk|৳|rs|rupees?)\b|(?:price|cost)[:\s]*\d[\d,.]*'
+)
+WORD = re.compile(r'\w+')
+# Words suppliers add around the same product that don't tell products apart
+FILLER = frozenset({
+    'the', 'and', 'with', 'for', 'new', 'stock', 'available', 'only', 'now',
+    'price', 'cost', 'each', 'dm', 'pm', 'inbox', 'order', 'free', 'delivery',
+    'quick', 'days', 'weeks', 'sale', 'offer', 'best', 'quality', 'pics', 'more',
+})
+
+# The text fingerprint alone: photos are never downloaded, and the file
+# metadata Telegram sends (sizes, ids) differs between re-uploads of the
+# same picture, so it can't tell two suppliers' photos apart or together
+OfferKey = str
+
+
+def text_fingerprint(text: str) -> str:
+    """Order-independent words of a listing, without prices, filler or emoji"""
+    text = PRICE_TOKEN.sub(' ', text.lower())
+    words = {word for word in WORD.findall(text) if len(word) > 1 and word not in FILLER}
+    return ' '.join(sorted(words))
+
+
+def offer_key(job: ForwardJob) -> Optional[OfferKey]:
+    """Product key of a new listing, None if it has no text to compare
+
+    The supplier's own text is used: the rendered one carries our
+    per-group prefix and contact block.
+    """
+    return text_fingerprint(job.original_text) or None
+
+
+class _Window:
+    __slots__ = ('deadline', 'candidates')
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.candidates: List[Tuple[float, ForwardJob]] = []  # (price, job), arrival order
+
+
+class OfferSelector:
+    """Forwards only the cheapest copy of a listing several suppliers post
+
+    The first priced listing with a product key opens a window of its
+    group's length; every listing with the same key that arrives before it
+    closes becomes a candidate. When it closes the candidate with the lowest
+    computed price (the earliest on a tie) is submitted and the others are
+    dropped. Open windows are kept in a dict by key plus a heap of deadlines
+    with a single timer for the earliest one. Listings without a price or
+    key, groups with a window of 0, edits and deletions of messages not
+    being held pass straight through.
+    """
+
+    def __init__(self, submit: Callable[[ForwardJob], Awaitable],
+                 window_for: Callable[[int], float],
+                 price_of: Callable[[ForwardJob], Optional[float]],
+                 letter_for: Callable[[int], Any] = lambda group_id: group_id):
+        self._submit = submit
+        self._window_for = window_for
+        self._price_of = price_of
+        self._letter_for = letter_for
+        self._windows: Dict[OfferKey, _Window] = {}
+        self._deadlines: List[Tuple[float, int, OfferKey]] = []  # heap
+        self._held: Dict[Tuple[int, int], OfferKey] = {}  # (group, message) -> key
+        self._sequence = 0
+        self._handle = None
+        self._tasks = set()
+        self.chosen = 0
+        self.suppressed = 0
+        self.won = Counter()  # per source group
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+    async def add(self, job: ForwardJob):
+        """Hold a listing as a candidate, or pass it on"""
+        if job.action != 'new':
+            if not self._update_held(job):
+                await self._submit(job)
+            return
+
+        window = self._window_for(job.source_group_id)
+        key = offer_key(job) if window > 0 else None
+        price = self._price_of(job) if key is not None else None
+        if price is None:
+            await self._submit(job)
+            return
+
+        pending = self._windows.get(key)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self._windows[key] = _Window(loop.time() + window)
+            self._sequence += 1
+            heapq.heappush(self._deadlines, (pending.deadline, self._sequence, key))
+            if self._deadlines[0][2] == key:
+                self._arm()
+        pending.candidates.append((price, job))
+        self._held[(job.source_group_id, job.message_id)] = key
+
+    def _update_held(self, job: ForwardJob) -> bool:
+        """Apply an edit or deletion to a held candidate; False if none matches"""
+        key = self._held.get((job.source_group_id, job.message_id))
+        if key is None:
+            return False
+        candidates = self._windows[key].candidates
+        for index, (price, held) in enumerate(candidates):
+            if (held.source_group_id, held.message_id) != (job.source_group_id, job.message_id):
+                continue
+            if job.action == 'delete':
+                del candidates[index]
+                del self._held[(job.source_group_id, job.message_id)]
+            else:
+                # An edit that drops the price keeps the old one for comparing
+                edited = job._replace(action='new', created_at=held.created_at)
+                new_price = self._price_of(edited)
+                candidates[index] = (price if new_price is None else new_price, edited)
+            break
+        if not candidates:
+            # Its heap entry is skipped when it comes up
+            del self._windows[key]
+        return True
+
+    def _arm(self):
+        """Run the timer for the earliest open window"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        while self._deadlines and self._is_stale(self._deadlines[0]):
+            heapq.heappop(self._deadlines)
+        if self._deadlines:
+            loop = asyncio.get_running_loop()
+            self._handle = loop.call_at(self._deadlines[0][0], self._expire)
+
+    def _is_stale(self, entry: Tuple[float, int, OfferKey]) -> bool:
+        pending = self._windows.get(entry[2])
+        return pending is None or pending.deadline != entry[0]
+
+    def _expire(self):
+        self._handle = None
+        task = asyncio.ensure_future(self._close_due())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _close_due(self):
+        now = asyncio.get_running_loop().time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            entry = heapq.heappop(self._deadlines)
+            if not self._is_stale(entry):
+                await self._close(entry[2])
+        self._arm()
+
+    async def _close(self, key: OfferKey):
+        """Submit the best candidate of a window and drop the rest"""
+        pending = self._windows.pop(key)
+        for _, job in pending.candidates:
+            self._held.pop((job.source_group_id, job.message_id), None)
+        # min() keeps the first of equal prices, i.e. the earliest listing
+        best_price, best = min(pending.candidates, key=lambda candidate: candidate[0])
+        self.chosen += 1
+        self.won[best.source_group_id] += 1
+        if len(pending.candidates) > 1:
+            self.suppressed += len(pending.candidates) - 1
+            others = ', '.join(
+                f"[{self._letter_for(job.source_group_id)}] {price:g}"
+                for price, job in pending.candidates if job is not best
+            )
+            logger.info(
+                f"Best offer for '{key[:60]}': [{self._letter_for(best.source_group_id)}] "
+                f"{best_price:g} ({best.message_id}), suppressed {others}"
+            )
+        await self._submit(best)
+
+    async def flush(self):
+        """Close every open window now"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._deadlines.clear()
+        for key in list(self._windows):
+            await self._close(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'open': len(self._windows),
+            'held': len(self._held),
+            'chosen': self.chosen,
+            'suppressed': self.suppressed,
+            'by_group': dict(self.won),
+        }
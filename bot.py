@@ -1,7 +1,17 @@
+import sys
+import time
+import queue
 import asyncio
 import logging
+from typing import List, Optional
 from telethon import TelegramClient, events
-from telethon.tl.types import Message, InputMediaPhoto
+from telethon.errors import FileReferenceExpiredError, ChatForwardsRestrictedError
+from telethon.tl.functions.messages import GetScheduledHistoryRequest, DeleteScheduledMessagesRequest
+from telethon.tl.types import (
+    Message,
+    InputMediaUploadedPhoto,
+    InputMediaUploadedDocument,
+)
 from config import (
     API_ID, 
     API_HASH, 
@@ -10,9 +20,57 @@ from config import (
     TARGET_GROUP_ID, 
     MESSAGE_DELAY,
     SOURCE_GROUP_SETTINGS,
-    MULTI_SOURCE_MONITORING
+    MULTI_SOURCE_MONITORING,
+    WARM_MEDIA_DC_IDS,
+    QUEUE_MAX_SIZE,
+    QUEUE_MAX_AGE_MINUTES,
+    QUEUE_PUT_TIMEOUT,
+    STOP_DRAIN_SECONDS,
+    MESSAGE_MAP_PATH,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    USE_UVLOOP,
+    DEDUP_DB_PATH,
+    COALESCE_WINDOW_SECONDS,
+    BEST_OFFER_WINDOW_SECONDS,
+    DIGEST_MINUTES,
+    DIGEST_MAX_ITEMS,
+    DIGEST_PHOTOS,
+    DIGEST_BUFFER_PATH,
+    WATCHDOG_INTERVAL,
+    WATCHDOG_TIMEOUT,
+    WATCHDOG_STALL_MINUTES,
+    GAP_RECOVERY_LIMIT,
+    BUFFERED_SESSION,
+    SESSION_FLUSH_SECONDS,
+    MEDIA_CACHE_SIZE,
+    MEDIA_CACHE_TTL_HOURS,
+    SEND_BULK_WORKERS,
+    SEND_BULK_THRESHOLD_MB,
+    SCHEDULED_PACING,
+    SCHEDULE_MIN_LEAD_SECONDS,
+    PREFILTER_RULES
 )
 from message_processor import MessageProcessor
+from startup import StartupTimer
+from forward_job import ForwardJob, MediaRef, deep_sizeof
+from forward_queue import ForwardQueue, PRIORITY_EDIT, PRIORITY_DELETE, PRIORITY_NEW_DEFAULT
+from message_map import MessageMap
+from profiling import ProfilingControls
+from metrics import PipelineMetrics
+from admin import AdminControl
+from capabilities import detect_capabilities, install_uvloop, log_capabilities
+from selftest import run_selftest
+from dedup_store import DedupStore
+from coalescer import PostCoalescer, merge_album
+from best_offer import OfferSelector
+from digest import DigestBuffer
+from connection_watchdog import ConnectionWatchdog
+from buffered_session import BufferedSession
+from media_cache import MediaHandleCache
+from send_lanes import SendLanes
+from prefilter import Prefilter
+from scheduled_pacing import PostTimeline, edit_options, schedule_date
 
 
 # Configure logging
@@ -24,47 +82,152 @@ logger = logging.getLogger(__name__)
 
 
 class MessageForwarderBot:
-    """Telethon-based bot that forwards messages with modifications"""
+    """Telethon-based bot that forwards messages with modifications
+
+    By default one process ingests every source group and sends to the target
+    (role 'all'). Under supervisor.py, 'ingest' shards watch a subset of the
+    groups and pass jobs through ``outbox`` to a single 'send' process.
+    ``control`` carries /pause, /resume and /drain: the send process puts
+    them there for the supervisor, which relays them to the ingest shards.
+    """
     
-    def __init__(self):
+    def __init__(self, group_ids=None, session_name='session_name',
+                 outbox=None, role='all', control=None):
+        self.group_ids = list(group_ids) if group_ids is not None else SOURCE_GROUP_IDS
+        self.session_name = session_name
+        self.outbox = outbox
+        self.role = role
+        self.control = control
         self.processor = MessageProcessor()
         self.client = None
+        self.me_id = None
+        # Replaced by the resolved input peer during warm-up
+        self.target_peer = TARGET_GROUP_ID
+        self.queue = ForwardQueue(
+            maxsize=QUEUE_MAX_SIZE,
+            max_age=QUEUE_MAX_AGE_MINUTES * 60,
+            put_timeout=QUEUE_PUT_TIMEOUT,
+            on_shed=self._digest_done
+        )
+        # Large videos/documents leave the queue for a pool of bulk workers
+        self.lanes = SendLanes(
+            self._execute,
+            workers=SEND_BULK_WORKERS,
+            threshold=int(SEND_BULK_THRESHOLD_MB * 1024 * 1024),
+            queue=ForwardQueue(
+                maxsize=QUEUE_MAX_SIZE,
+                max_age=QUEUE_MAX_AGE_MINUTES * 60,
+                put_timeout=0
+            )
+        )
+        # Pacing by Telegram-scheduled messages, and their publication slots
+        self.scheduled_pacing = SCHEDULED_PACING
+        self.timeline = PostTimeline(min_lead=SCHEDULE_MIN_LEAD_SECONDS)
+        self.message_map = None
+        self.dedup = None
+        self._worker_task = None
+        self._dispatching = False  # the worker is handing a job to the lanes
+        self._outbox_task = None
+        self._control_task = None
+        self.profiling = ProfilingControls(
+            PROFILE_DIR, sample_interval=PROFILE_SAMPLE_INTERVAL_MS / 1000
+        )
+        # Spacing between sends; the self-test turns it off
+        self.pacing_enabled = True
+        self.metrics = PipelineMetrics()
+        # Our own copies of source media, for when sending by reference fails
+        self.media_cache = MediaHandleCache(
+            max_entries=MEDIA_CACHE_SIZE, ttl=MEDIA_CACHE_TTL_HOURS * 3600
+        )
+        self.metrics.register_cache('media', self.media_cache.stats)
+        # Source groups whose media can't be sent by reference (protected content)
+        self.restricted_groups = set()
+        self.admin = AdminControl(self)
+        # Cheap first check on every new message
+        self.prefilter = Prefilter(
+            lambda group_id: SOURCE_GROUP_SETTINGS.get(group_id, {}).get('prefilter', PREFILTER_RULES),
+            merges_posts=lambda group_id: self._coalesce_window(group_id) > 0
+        )
+        # Some groups' listings go out together as periodic catalogue posts
+        self.digest = DigestBuffer(
+            self._submit,
+            lambda group_id: SOURCE_GROUP_SETTINGS.get(group_id, {}).get('digest', {
+                'minutes': DIGEST_MINUTES, 'max_items': DIGEST_MAX_ITEMS, 'photos': DIGEST_PHOTOS
+            }),
+            self.processor.template_for,
+            # Each ingest shard keeps its own buffer
+            path=DIGEST_BUFFER_PATH if role == 'all' else f"{session_name}.{DIGEST_BUFFER_PATH}"
+        )
+        # Only the cheapest copy of a listing several suppliers post goes out
+        self.best_offer = OfferSelector(
+            self.digest.add, self._best_offer_window, self._offer_price,
+            letter_for=lambda group_id: SOURCE_GROUP_SETTINGS.get(group_id, {}).get('letter', group_id)
+        )
+        # Text and photos a sender posts separately become one listing
+        self.coalescer = PostCoalescer(self.best_offer.add, self._coalesce_window)
+        self.watchdog = ConnectionWatchdog(
+            self,
+            interval=WATCHDOG_INTERVAL,
+            timeout=WATCHDOG_TIMEOUT,
+            stall_after=WATCHDOG_STALL_MINUTES * 60,
+            recovery_limit=GAP_RECOVERY_LIMIT
+        )
+        # Checked first thing for every message, so keep it a plain set
+        self.enabled_groups = {
+            group_id
+            for group_id in self.group_ids
+            if SOURCE_GROUP_SETTINGS.get(group_id, {}).get('enabled', True)
+        }
     
     async def start(self):
         """Start the bot"""
         try:
-            # Create Telethon client
-            self.client = TelegramClient('session_name', API_ID, API_HASH)
+            timer = StartupTimer()
+            
+            # Create Telethon client (session writes happen off the event loop)
+            session = (
+                BufferedSession(self.session_name, flush_interval=SESSION_FLUSH_SECONDS)
+                if BUFFERED_SESSION else self.session_name
+            )
+            self.client = TelegramClient(session, API_ID, API_HASH)
             
             # Start the client
-            await self.client.start(phone=PHONE)
+            with timer.step('connect'):
+                await self.client.start(phone=PHONE)
             logger.info("Bot started successfully!")
             
+            # Warm everything the first forward would otherwise pay for
+            with timer.step('resolve entities'):
+                await self._resolve_entities()
+            with timer.step('warm media DCs'):
+                await self._warm_media_dcs()
+            with timer.step('capability check'):
+                log_capabilities(detect_capabilities())
+            with timer.step('compile rules'):
+                warmed_groups = self.processor.warm_up(self.group_ids)
+            logger.info(f"Compiled rule sets for {warmed_groups} source group(s)")
+            
             # Add event handlers for multiple source groups
-            if MULTI_SOURCE_MONITORING:
-                logger.info(f"Multi-source monitoring enabled for {len(SOURCE_GROUP_IDS)} groups")
-                for group_id in SOURCE_GROUP_IDS:
+            if self.role == 'send':
+                logger.info("Send-only process: jobs arrive from the ingest shards")
+            elif MULTI_SOURCE_MONITORING:
+                logger.info(f"Multi-source monitoring enabled for {len(self.group_ids)} groups")
+                for group_id in self.group_ids:
                     group_name = SOURCE_GROUP_SETTINGS[group_id]['name']
                     logger.info(f"Setting up listener for: {group_name} ({group_id})")
                     
-                    # Create a closure to capture the current group_id
-                    async def create_handler(current_group_id):
-                        @self.client.on(events.NewMessage(chats=current_group_id))
-                        async def handle_new_message(event):
-                            await self.handle_source_message(event.message, current_group_id)
-                    
-                    await create_handler(group_id)
+                    self._add_group_handlers(group_id)
             else:
                 # Single source group (backward compatibility)
-                group_id = SOURCE_GROUP_IDS[0]
+                group_id = self.group_ids[0]
                 logger.info(f"Single source monitoring for group: {group_id}")
-                
-                @self.client.on(events.NewMessage(chats=group_id))
-                async def handle_new_message(event):
-                    await self.handle_source_message(event.message, group_id)
+                self._add_group_handlers(group_id)
+            
+            # Any update at all shows the stream is alive
+            self.client.add_event_handler(self.watchdog.touch, events.Raw)
             
             logger.info("Bot is now running and listening for messages...")
-            logger.info(f"Monitoring {len(SOURCE_GROUP_IDS)} source group(s)")
+            logger.info(f"Monitoring {len(self.group_ids)} source group(s)")
             logger.info(f"Forwarding to target group: {TARGET_GROUP_ID}")
             logger.info("=" * 50)
             logger.info("IMPORTANT: Bot will ONLY forward to this target group!")
@@ -78,189 +241,604 @@ class MessageForwarderBot:
             else:
                 logger.info(f"✅ VERIFIED: Bot will forward ONLY to {TARGET_GROUP_ID}")
             
-            # Keep the bot running
-            await self.client.run_until_disconnected()
+            if self.role != 'send':
+                self.dedup = DedupStore(DEDUP_DB_PATH)
+                self.dedup.prune()
+                self.digest.restore()
+            if self.role != 'ingest':
+                self.message_map = MessageMap(MESSAGE_MAP_PATH)
+                if self.scheduled_pacing:
+                    with timer.step('restore schedule'):
+                        await self._restore_schedule()
+                    self.client.add_event_handler(
+                        self.handle_published,
+                        events.NewMessage(chats=TARGET_GROUP_ID, outgoing=True)
+                    )
+                self._worker_task = asyncio.create_task(self._forward_worker())
+                self.lanes.start()
+                self.admin.register(self.client)
+                logger.info("Admin commands enabled: send /help to your Saved Messages")
+            if self.role == 'send':
+                self._outbox_task = asyncio.create_task(self._read_outbox())
+            if self.role == 'ingest' and self.control is not None:
+                self._control_task = asyncio.create_task(self._read_control())
+            self.profiling.install_signal_handlers()
+            
+            timer.report()
+            
+            # Keep the bot running; the watchdog reconnects instead of exiting
+            await self.watchdog.run()
             
         except Exception as e:
             logger.error(f"Failed to start bot: {e}")
             raise
     
-    async def handle_source_message(self, message: Message, source_group_id: int):
-        """Handle incoming messages from source group"""
+    def _add_group_handlers(self, group_id: int):
+        """Listen for new, edited and deleted messages in one source group"""
+        # group_id is bound per call, so every closure sees its own group
+        @self.client.on(events.NewMessage(chats=group_id))
+        async def handle_new_message(event):
+            if event.message.grouped_id:
+                return  # Album items arrive together through events.Album
+            await self.handle_source_message(event.message, group_id)
+        
+        @self.client.on(events.Album(chats=group_id))
+        async def handle_album(event):
+            await self.handle_source_album(event.messages, group_id)
+        
+        @self.client.on(events.MessageEdited(chats=group_id))
+        async def handle_edited_message(event):
+            await self.handle_source_message(event.message, group_id, action='edit')
+        
+        @self.client.on(events.MessageDeleted(chats=group_id))
+        async def handle_deleted_message(event):
+            for message_id in event.deleted_ids:
+                await self.coalescer.add(ForwardJob.deletion(group_id, message_id))
+    
+    async def _resolve_entities(self):
+        """Cache our own id and the input peers of every configured chat"""
+        me = await self.client.get_me()
+        self.me_id = me.id if me else None
+        
+        if TARGET_GROUP_ID:
+            try:
+                self.target_peer = await self.client.get_input_entity(TARGET_GROUP_ID)
+            except Exception as e:
+                logger.error(f"Could not resolve target group {TARGET_GROUP_ID}: {e}")
+        
+        for group_id in self.group_ids:
+            try:
+                await self.client.get_input_entity(group_id)
+            except Exception as e:
+                logger.warning(f"Could not resolve source group {group_id}: {e}")
+    
+    async def _warm_media_dcs(self):
+        """Open exported-sender connections to the media DCs ahead of time"""
+        home_dc = self.client.session.dc_id
+        dc_ids = set(WARM_MEDIA_DC_IDS)
+        
+        # The target's own media lives in the DC of its chat photo
+        if TARGET_GROUP_ID:
+            try:
+                target = await self.client.get_entity(TARGET_GROUP_ID)
+                photo_dc = getattr(getattr(target, 'photo', None), 'dc_id', None)
+                if photo_dc:
+                    dc_ids.add(photo_dc)
+            except Exception as e:
+                logger.warning(f"Could not look up target media DC: {e}")
+        
+        # Telethon has no public call for this; without the private one the
+        # media DCs simply connect on first use
+        borrow = getattr(self.client, '_borrow_exported_sender', None)
+        give_back = getattr(self.client, '_return_exported_sender', None)
+        if borrow is None or give_back is None:
+            if dc_ids - {home_dc}:
+                logger.info("This Telethon version can't pre-connect media DCs; "
+                            "they will connect on first use")
+            return
+        
+        for dc_id in sorted(dc_ids - {home_dc}):
+            try:
+                # Borrowing exports and imports the authorization once; the
+                # sender stays registered so later transfers reuse it.
+                sender = await borrow(dc_id)
+                await give_back(sender)
+                logger.info(f"Warmed connection to media DC {dc_id}")
+            except Exception as e:
+                logger.warning(f"Could not warm media DC {dc_id}: {e}")
+    
+    async def handle_source_message(self, message: Message, source_group_id: int,
+                                    action: str = 'new'):
+        """Handle incoming (or edited) messages from source group"""
+        if source_group_id not in self.enabled_groups:
+            return  # Disabled, paused or draining
         try:
-            # Skip bot messages and service messages
-            if message.from_id and hasattr(message.from_id, 'user_id'):
-                if message.from_id.user_id == (await self.client.get_me()).id:
-                    return  # Skip own messages
-            
-            group_name = SOURCE_GROUP_SETTINGS[source_group_id]['name']
+            job = await self._build_job(message, source_group_id, action)
+            if job is not None:
+                # Held briefly if the sender's photos/text may follow, then queued
+                await self.coalescer.add(job)
+        except Exception as e:
+            logger.error(f"Error handling source message: {e}")
+    
+    async def handle_source_album(self, messages: List[Message], source_group_id: int):
+        """Handle an album: items sharing a grouped_id go out as one post"""
+        if source_group_id not in self.enabled_groups:
+            return
+        try:
+            jobs = {}
+            for message in messages:
+                job = await self._build_job(message, source_group_id)
+                if job is not None:
+                    jobs[message.id] = job
+            # The caption (usually on the first item) decides for the album
+            lead = next((message for message in messages if message.message), messages[0])
+            if lead.id not in jobs:
+                return
+            await self.coalescer.add(merge_album([jobs[message.id] for message in messages
+                                                  if message.id in jobs]))
+        except Exception as e:
+            logger.error(f"Error handling source album: {e}")
+    
+    async def _build_job(self, message: Message, source_group_id: int,
+                         action: str = 'new') -> Optional[ForwardJob]:
+        """Forward job for one source message, None if it is skipped"""
+        self.metrics.record_received(source_group_id)
+        
+        # Another shard (or an earlier run) may already have taken it.
+        # Claimed before filtering, so gap recovery never sees a skipped
+        # message as missed
+        if action == 'new' and self.dedup and not self.dedup.claim(source_group_id, message.id):
+            return
+        
+        # Chatter is dropped before any processing or queueing
+        if action == 'new' and not self.prefilter.allows(message, source_group_id):
+            return
+        
+        # Skip bot messages and service messages
+        if message.from_id and hasattr(message.from_id, 'user_id'):
+            if self.me_id is None:
+                self.me_id = (await self.client.get_me()).id
+            if message.from_id.user_id == self.me_id:
+                return  # Skip own messages
+        
+        group_name = SOURCE_GROUP_SETTINGS.get(source_group_id, {}).get('name', source_group_id)
+        logger.info(
+            f"New message from {message.sender_id} "
+            f"in {group_name} ({source_group_id}): {message.id}"
+        )
+        
+        # Process the message with group-specific settings
+        # Use message.media for proper album detection
+        processed_content = self.processor.process_message({
+            'text': message.text,
+            'media': message.media,  # This handles albums properly
+            'photo': message.photo,
+            'video': message.video,
+            'document': message.document,
+            'audio': message.audio,
+            'caption': message.message
+        }, source_group_id)
+        
+        # Keep only what sending needs, not the full TL object graph
+        job = ForwardJob.from_content(
+            processed_content,
+            source_group_id,
+            message_id=message.id,
+            sender_id=message.sender_id,
+            fallback_media=message.photo or message.document,
+            action=action,
+            original_text=message.text or ''
+        )
+        del processed_content
+        logger.debug(f"Forward job for {message.id} holds {deep_sizeof(job)} bytes")
+        return job
+    
+    async def _submit(self, job: ForwardJob) -> bool:
+        """Queue a job locally, or hand it to the send process when sharded"""
+        if self.outbox is not None:
+            self.outbox.put(job)
+            self._digest_done(job)
+            logger.info(f"Passed {job.action} {job.message_id} to the send process")
+            return True
+        queued = await self.queue.put(job, self._job_priority(job))
+        if queued:
+            stats = self.queue.stats()
             logger.info(
-                f"New message from {message.sender_id} "
-                f"in {group_name} ({source_group_id}): {message.id}"
+                f"Queued {job.action} {job.message_id} (depth {stats['depth']}, "
+                f"shed {stats['shed_overflow']} overflow / {stats['shed_stale']} stale)"
             )
+        return queued
+    
+    def _coalesce_window(self, group_id: int) -> float:
+        return SOURCE_GROUP_SETTINGS.get(group_id, {}).get(
+            'coalesce_window', COALESCE_WINDOW_SECONDS
+        )
+    
+    def _best_offer_window(self, group_id: int) -> float:
+        return SOURCE_GROUP_SETTINGS.get(group_id, {}).get(
+            'best_offer_window', BEST_OFFER_WINDOW_SECONDS
+        )
+    
+    def _offer_price(self, job: ForwardJob):
+        """Our price of a listing (the lowest in its text), None if unpriced"""
+        prices = self.processor.extract_prices(job.text)
+        return min(prices) if prices else None
+    
+    async def _read_outbox(self):
+        """Move jobs from the ingest shards into the local priority queue"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Short timeout so the executor thread never outlives shutdown
+                job = await loop.run_in_executor(None, self.outbox.get, True, 1)
+            except queue.Empty:
+                continue
+            await self.queue.put(job, self._job_priority(job))
+    
+    async def _read_control(self):
+        """Apply group commands the supervisor relays from the send process"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                command, group_id = await loop.run_in_executor(None, self.control.get, True, 1)
+            except queue.Empty:
+                continue
+            if group_id in self.group_ids:
+                getattr(self, f"{command}_group")(group_id)
+    
+    def _relay(self, command: str, group_id: int):
+        """Pass a group command on to the ingest shards (send process only)"""
+        if self.role == 'send' and self.control is not None:
+            self.control.put((command, group_id))
+    
+    def pause_group(self, group_id: int):
+        """Stop ingesting a group and hold its queued messages"""
+        self.enabled_groups.discard(group_id)
+        self.queue.hold(group_id)
+        self.lanes.queue.hold(group_id)
+        self._relay('pause', group_id)
+        logger.info(f"Paused source group {group_id}")
+    
+    def resume_group(self, group_id: int):
+        """Resume ingesting a group and release its held messages"""
+        self.enabled_groups.add(group_id)
+        self.queue.release(group_id)
+        self.lanes.queue.release(group_id)
+        self._relay('resume', group_id)
+        logger.info(f"Resumed source group {group_id}")
+    
+    def drain_group(self, group_id: int):
+        """Stop ingesting a group but let its queued messages go out"""
+        self.enabled_groups.discard(group_id)
+        self.queue.release(group_id)
+        self.lanes.queue.release(group_id)
+        self._relay('drain', group_id)
+        logger.info(f"Draining source group {group_id}")
+    
+    def _job_priority(self, job: ForwardJob) -> int:
+        """Edits and deletions first, then new posts by group priority"""
+        if job.action == 'edit':
+            return PRIORITY_EDIT
+        if job.action == 'delete':
+            return PRIORITY_DELETE
+        return SOURCE_GROUP_SETTINGS.get(
+            job.source_group_id, {}
+        ).get('priority', PRIORITY_NEW_DEFAULT)
+    
+    async def _forward_worker(self):
+        """Take queued jobs in priority order and send each on its lane"""
+        while True:
+            job = await self.queue.get()
+            self._dispatching = True
+            try:
+                await self.lanes.dispatch(job, self._job_priority(job))
+            finally:
+                self._dispatching = False
+    
+    async def _execute(self, job: ForwardJob) -> bool:
+        """Apply one job to the target; False if a new post wasn't sent"""
+        if job.action == 'edit':
+            await self.apply_edit(job)
+        elif job.action == 'delete':
+            await self.apply_delete(job)
+        else:
+            try:
+                return await self.forward_to_target(job) is not None
+            finally:
+                self._digest_done(job)
+        return True
+    
+    def _digest_done(self, job: ForwardJob):
+        """A digest post was sent, handed on or dropped: its listings leave the buffer file"""
+        if job.message_id < 0:
+            self.digest.sent(job)
+    
+    async def apply_edit(self, job: ForwardJob):
+        """Mirror a source edit onto the forwarded target message"""
+        try:
+            forwarded = self.message_map.get(job.source_group_id, job.message_id)
+            if forwarded is None:
+                return  # Never forwarded (or forwarded before the map existed)
+            if forwarded.posted_text == job.text:
+                return  # Edit didn't change what we posted
             
-            # Process the message with group-specific settings
-            # Use message.media for proper album detection
-            processed_content = self.processor.process_message({
-                'text': message.text,
-                'media': message.media,  # This handles albums properly
-                'photo': message.photo,
-                'video': message.video,
-                'document': message.document,
-                'audio': message.audio,
-                'caption': message.message
-            }, source_group_id)
-            
-            # Forward to target group with modifications
-            await self.forward_to_target(processed_content, source_group_id)
+            await self.client.edit_message(
+                self.target_peer, forwarded.target_message_id, job.text,
+                **edit_options(forwarded)
+            )
+            self.message_map.update_text(
+                job.source_group_id, job.message_id, job.text, job.original_text
+            )
+            logger.info(f"Edited target message {forwarded.target_message_id}")
+        except Exception as e:
+            logger.error(f"Error applying edit to target: {e}")
+    
+    async def apply_delete(self, job: ForwardJob):
+        """Remove the target copy of a deleted source message"""
+        try:
+            forwarded = self.message_map.get(job.source_group_id, job.message_id)
+            if forwarded is None:
+                return
             
+            if forwarded.scheduled_for:
+                # Not published yet: take it off the schedule instead
+                await self.client(DeleteScheduledMessagesRequest(
+                    self.target_peer, [forwarded.target_message_id]
+                ))
+                self.timeline.remove(int(forwarded.scheduled_for))
+            else:
+                await self.client.delete_messages(
+                    self.target_peer, [forwarded.target_message_id]
+                )
+            self.message_map.remove(job.source_group_id, job.message_id)
+            logger.info(f"Deleted target message {forwarded.target_message_id}")
         except Exception as e:
-            logger.error(f"Error handling source message: {e}")
+            logger.error(f"Error applying deletion to target: {e}")
+    
+    def _record_forward(self, job: ForwardJob, sent, slot=None):
+        """Store the source → target mapping of a forwarded job"""
+        if self.message_map is None:
+            return
+        # Albums come back as a list; the first message carries the caption
+        if isinstance(sent, list):
+            if not sent:
+                return
+            sent = sent[0]
+        try:
+            # A digest (negative message id) stands for many source messages, none maps to it
+            if job.message_id > 0:
+                self.message_map.record(
+                    job.source_group_id, job.message_id, sent.id,
+                    job.original_text, job.text, job.media_type, slot
+                )
+            if slot:
+                self.timeline.add(slot, job.source_group_id, job.message_id, sent.id)
+        except Exception as e:
+            logger.error(f"Error recording forwarded message: {e}")
     
-    async def forward_to_target(self, content: dict, source_group_id: int):
-        """Forward processed content to target group"""
+    async def forward_to_target(self, job: ForwardJob):
+        """Forward a processed job to target group; returns what was sent"""
         try:
             # STRICT CHECK: Only forward to the configured target group
-            if TARGET_GROUP_ID == 0:
+            if not self.target_peer:
                 logger.error("TARGET_GROUP_ID is 0! Check your .env file")
                 return
             
             logger.info(f"STRICT: Forwarding ONLY to target group {TARGET_GROUP_ID}")
             
-            # Add delay to avoid spam (prefer group-specific delay)
-            try:
-                from config import SOURCE_GROUP_SETTINGS  # lazy import
-                group_delay = SOURCE_GROUP_SETTINGS.get(
-                    source_group_id, {}
-                ).get('message_delay', MESSAGE_DELAY)
-            except Exception:
-                group_delay = MESSAGE_DELAY
-            await asyncio.sleep(group_delay)
+            slot = await self._pace(job) if self.pacing_enabled else None
+            schedule = schedule_date(slot) if slot else None
             
-            if content['media'] and content['media_type']:
-                # Send media with caption
-                caption = content['caption'] or content['text']
-                
-                # Log the target group ID for debugging
-                logger.info(f"Sending media to target group: {TARGET_GROUP_ID}")
-                
-                if content['media_type'] == 'photo':
-                    # Handle multiple photos - send as album if multiple
-                    if len(content['media']) > 1:
-                        # Send multiple photos as album with caption
-                        try:
-                            # Create media group with InputMediaPhoto for proper album
-                            media_group = []
-                            for photo in content['media']:
-                                # ALL photos get the same caption
-                                media_group.append(InputMediaPhoto(photo, caption=caption))
-                            
-                            await self.client.send_media_group(
-                                TARGET_GROUP_ID,
-                                media_group
-                            )
-                            logger.info(f"Sent {len(content['media'])} photos as ALBUM to target group {TARGET_GROUP_ID}")
-                        except Exception as e:
-                            logger.error(f"Failed to send album: {e}")
-                            # Fallback: send first photo with caption, then others without
-                            await self.client.send_file(
-                                TARGET_GROUP_ID,
-                                content['media'][0],
-                                caption=caption
-                            )
-                            # Send remaining photos without caption
-                            for photo in content['media'][1:]:
-                                await self.client.send_file(
-                                    TARGET_GROUP_ID,
-                                    photo
-                                )
-                            logger.info(f"Sent {len(content['media'])} photos with fallback method")
-                    else:
-                        await self.client.send_file(
-                            TARGET_GROUP_ID,
-                            content['media'][0],
-                            caption=caption
-                        )
-                        logger.info(f"Sent 1 photo to target group {TARGET_GROUP_ID}")
-                elif content['media_type'] == 'video':
-                    if len(content['media']) > 1:
-                        # Send multiple videos as album
-                        try:
-                            # Create media group with InputMediaPhoto for proper album
-                            media_group = []
-                            for video in content['media']:
-                                # ALL videos get the same caption
-                                media_group.append(InputMediaPhoto(video, caption=caption))
-                            
-                            await self.client.send_media_group(
-                                TARGET_GROUP_ID,
-                                media_group
-                            )
-                            logger.info(f"Sent {len(content['media'])} videos as ALBUM to target group {TARGET_GROUP_ID}")
-                        except Exception as e:
-                            logger.error(f"Failed to send video album: {e}")
-                            # Fallback: send first video with caption, then others without
-                            await self.client.send_file(
-                                TARGET_GROUP_ID,
-                                content['media'][0],
-                                caption=caption
-                            )
-                            # Send remaining videos without caption
-                            for video in content['media'][1:]:
-                                await self.client.send_file(TARGET_GROUP_ID, video)
-                    else:
-                        await self.client.send_file(
-                            TARGET_GROUP_ID,
-                            content['media'][0],
-                            caption=caption
-                        )
-                        logger.info(f"Sent 1 video to target group {TARGET_GROUP_ID}")
-                elif content['media_type'] == 'document':
-                    if len(content['media']) > 1:
-                        await self.client.send_file(
-                            TARGET_GROUP_ID,
-                            content['media'],
-                            caption=caption
-                        )
-                        logger.info(f"Sent {len(content['media'])} documents to target group {TARGET_GROUP_ID}")
-                    else:
-                        await self.client.send_file(
-                            TARGET_GROUP_ID,
-                            content['media'][0],
-                            caption=caption
-                        )
-                        logger.info(f"Sent 1 document to target group {TARGET_GROUP_ID}")
-                elif content['media_type'] == 'audio':
-                    if len(content['media']) > 1:
-                        await self.client.send_file(
-                            TARGET_GROUP_ID,
-                            content['media'],
-                            caption=caption
-                        )
-                        logger.info(f"Sent {len(content['media'])} audio files to target group {TARGET_GROUP_ID}")
-                    else:
-                        await self.client.send_file(
-                            TARGET_GROUP_ID,
-                            content['media'][0],
-                            caption=caption
-                        )
-                        logger.info(f"Sent 1 audio file to target group {TARGET_GROUP_ID}")
+            sent = None
+            if job.media and job.media_type:
+                sent = await self._send_media_with_fallback(job, schedule)
             else:
                 # Send text only
-                if content['text']:
-                    await self.client.send_message(
-                        TARGET_GROUP_ID,
-                        content['text']
+                if job.text:
+                    sent = await self.client.send_message(
+                        self.target_peer,
+                        job.text,
+                        schedule=schedule
                     )
                     logger.info(f"Sent text message to target group {TARGET_GROUP_ID}")
             
+            if sent is not None:
+                self._record_forward(job, sent, slot)
+                self.metrics.record_forwarded(job.source_group_id, time.time() - job.created_at)
             logger.info(f"Message forwarded to target group {TARGET_GROUP_ID} successfully")
+            return sent
             
         except Exception as e:
+            self.metrics.record_failed(job.source_group_id)
             logger.error(f"Error forwarding to target: {e}")
     
+    async def _pace(self, job: ForwardJob):
+        """Wait out the group's delay; returns a slot if Telegram should publish it instead"""
+        # Add delay to avoid spam (prefer group-specific delay)
+        try:
+            group_delay = SOURCE_GROUP_SETTINGS.get(
+                job.source_group_id, {}
+            ).get('message_delay', MESSAGE_DELAY)
+        except Exception:
+            group_delay = MESSAGE_DELAY
+        if not self.scheduled_pacing:
+            await asyncio.sleep(group_delay)
+            return None
+        
+        slot = self.timeline.reserve(group_delay)
+        if self.timeline.should_schedule(slot):
+            logger.info(f"Scheduling message {job.message_id} for {schedule_date(slot):%H:%M:%S} UTC")
+            return slot
+        await asyncio.sleep(max(slot - time.time(), 0))
+        return None
+    
+    async def handle_published(self, event):
+        """A scheduled post went out: its map entry moves to the published message"""
+        message = event.message
+        if not getattr(message, 'from_scheduled', False):
+            return
+        post = self.timeline.pop_published(message.date)
+        if post is not None and post.source_group_id is not None:
+            self.message_map.mark_published(post.source_group_id, post.source_message_id, message.id)
+    
+    async def _restore_schedule(self):
+        """Rebuild the timeline from the target's scheduled messages after a restart"""
+        try:
+            result = await self.client(GetScheduledHistoryRequest(self.target_peer, hash=0))
+            pending = self.message_map.scheduled()
+            self.timeline.rebuild(result.messages, pending)
+            on_server = {message.id for message in result.messages}
+            # Published while we were offline: find their published copies
+            missed = {int(forwarded.scheduled_for): forwarded for forwarded in pending
+                      if forwarded.target_message_id not in on_server}
+            if not missed:
+                return
+            async for message in self.client.iter_messages(
+                    self.target_peer, offset_date=schedule_date(max(missed) + 1),
+                    limit=len(missed) * 5 + 50):
+                forwarded = missed.pop(int(message.date.timestamp()), None) if message.from_scheduled else None
+                if forwarded is not None:
+                    self.message_map.mark_published(
+                        forwarded.source_group_id, forwarded.source_message_id, message.id
+                    )
+                if not missed:
+                    break
+            if missed:
+                logger.warning(f"Could not find {len(missed)} scheduled post(s) published while offline")
+        except Exception as e:
+            logger.error(f"Error restoring scheduled posts: {e}")
+    
+    async def _send_media(self, job: ForwardJob, media: list, schedule=None):
+        """Send the job's media (sendable inputs, same order) with its caption, at ``schedule`` if given
+
+        Several items go out as one native album in a single request, with
+        the caption on the first item so Telegram shows it under the album.
+        """
+        # Log the target group ID for debugging
+        logger.info(f"Sending media to target group: {TARGET_GROUP_ID}")
+        
+        sent = await self.client.send_file(
+            self.target_peer,
+            media if len(media) > 1 else media[0],
+            caption=job.text,
+            schedule=schedule
+        )
+        if len(media) > 1:
+            logger.info(f"Sent {len(media)} {job.media_type} items as ALBUM to target group {TARGET_GROUP_ID}")
+        else:
+            logger.info(f"Sent 1 {job.media_type} to target group {TARGET_GROUP_ID}")
+        return sent
+    
+    async def _send_media_with_fallback(self, job: ForwardJob, schedule=None):
+        """Send media by reference; from the handle cache or a re-upload if refused"""
+        sent = None
+        if job.source_group_id not in self.restricted_groups:
+            try:
+                sent = await self._send_media(job, [ref.to_input() for ref in job.media], schedule)
+            except ChatForwardsRestrictedError:
+                # Later posts of this group go straight to the cache/upload path
+                self.restricted_groups.add(job.source_group_id)
+                logger.info(f"Source group {job.source_group_id} restricts forwarding, re-uploading its media")
+            except FileReferenceExpiredError:
+                logger.warning(f"File reference of {job.message_id} expired, re-sending from cache or upload")
+        
+        if sent is None:
+            try:
+                sent = await self._send_media(job, await self._resolve_media(job), schedule)
+            except FileReferenceExpiredError:
+                # A cached handle went stale before its TTL ran out
+                for ref in job.media:
+                    self.media_cache.invalidate(ref)
+                sent = await self._send_media(job, await self._resolve_media(job), schedule)
+        
+        self._cache_sent_media(job, sent)
+        return sent
+    
+    async def _resolve_media(self, job: ForwardJob) -> list:
+        """Sendable media for a job: cached handles, re-uploading only the rest"""
+        media = [self.media_cache.get(ref) for ref in job.media]
+        missing = [ref for ref, handle in zip(job.media, media) if handle is None]
+        if missing:
+            uploaded = await self._reupload(job, missing)
+            media = [handle if handle is not None else uploaded[ref.id]
+                     for ref, handle in zip(job.media, media)]
+        return media
+    
+    async def _reupload(self, job: ForwardJob, refs: list) -> dict:
+        """Download media from fresh copies of the source messages and upload it"""
+        message_ids = sorted({ref.message_id or job.message_id for ref in refs})
+        messages = await self.client.get_messages(job.source_group_id, ids=message_ids)
+        sources = {}
+        for message in messages:
+            for item in (getattr(message, 'photo', None), getattr(message, 'document', None)):
+                if item is not None:
+                    sources[item.id] = item
+        
+        uploaded = {}
+        for ref in refs:
+            source = sources.get(ref.id)
+            if source is None:
+                raise ValueError(f"Media {ref.id} is no longer in source message(s) {message_ids}")
+            data = await self.client.download_media(source, file=bytes)
+            if ref.kind == 'photo':
+                handle = await self.client.upload_file(data, file_name='photo.jpg')
+                uploaded[ref.id] = InputMediaUploadedPhoto(handle)
+            else:
+                handle = await self.client.upload_file(data, file_name='file')
+                uploaded[ref.id] = InputMediaUploadedDocument(
+                    handle, mime_type=source.mime_type, attributes=source.attributes
+                )
+            logger.info(f"Re-uploaded {ref.kind} {ref.id} ({len(data)} bytes)")
+        return uploaded
+    
+    def _cache_sent_media(self, job: ForwardJob, sent):
+        """Remember our target-side copy of every source media just sent"""
+        messages = sent if isinstance(sent, list) else [sent]
+        for ref, message in zip(job.media, messages):
+            media = getattr(message, 'media', None)
+            target = MediaRef.from_media(
+                getattr(media, 'photo', None) or getattr(media, 'document', None)
+            )
+            if target is not None:
+                self.media_cache.put(ref, target.to_input())
+    
+    def _backlog(self) -> int:
+        """Posts queued, in the bulk lane or being sent"""
+        return len(self.queue) + len(self.lanes.queue) + self.lanes.active + self._dispatching
+    
+    async def _drain(self, timeout: float):
+        """Let the worker and lanes send what is queued, for at most timeout seconds"""
+        if self._worker_task is None or self._worker_task.done():
+            return
+        deadline = time.monotonic() + timeout
+        if self._backlog():
+            logger.info(f"Sending {self._backlog()} queued post(s) before stopping")
+        while self._backlog():
+            if time.monotonic() >= deadline:
+                logger.warning(f"Stopping with {self._backlog()} post(s) not sent")
+                return
+            await asyncio.sleep(0.05)
+    
     async def stop(self):
         """Stop the bot"""
+        self.watchdog.stop()
+        # Held and queued posts are already claimed in dedup, so they'd never
+        # come back: send them before the worker goes
+        try:
+            await self.coalescer.flush()
+            await self.best_offer.flush()
+            await self._drain(STOP_DRAIN_SECONDS)
+        except Exception as e:
+            logger.error(f"Error sending held posts: {e}")
+        self.lanes.stop()
+        for task in (self._worker_task, self._outbox_task, self._control_task):
+            if task:
+                task.cancel()
+        if self.dedup:
+            self.dedup.close()
+        self.profiling.shutdown()
+        if self.message_map:
+            self.message_map.close()
         if self.client:
             try:
                 await self.client.disconnect()
@@ -269,9 +847,10 @@ class MessageForwarderBot:
                 logger.error(f"Error stopping bot: {e}")
 
 
-async def main():
+async def main(bot: MessageForwarderBot = None):
     """Main function to run the bot"""
-    bot = MessageForwarderBot()
+    if bot is None:
+        bot = MessageForwarderBot()
     
     try:
         await bot.start()
@@ -287,6 +866,10 @@ async def main():
 
 
 if __name__ == "__main__":
+    install_uvloop(USE_UVLOOP)
+    if '--selftest' in sys.argv:
+        # Benchmark this host against the offline fake client and exit
+        sys.exit(0 if asyncio.run(run_selftest()) else 1)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,238 @@
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict
+from telethon.sessions import MemorySession, SQLiteSession
+from telethon.sessions.memory import _SentFileType
+from telethon.sessions.sqlite import EXTENSION
+from telethon.tl import types
+from telethon import utils
+
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedSession(MemorySession):
+    """Telethon session kept in memory and written to the .session file in the background
+
+    Loads an existing SQLite session file once, then serves every lookup
+    and update from memory. Changes are written back (as a complete
+    SQLite session file, swapped in with ``os.replace``) at most every
+    ``flush_interval`` seconds from Telethon's periodic ``save()``, in a
+    worker thread, and on disconnect. A new auth key or DC is written
+    immediately, so a crash can never cost the login.
+    """
+
+    def __init__(self, session_id: str = 'session_name', flush_interval: float = 60):
+        super().__init__()
+        self.filename = session_id if session_id.endswith(EXTENSION) else session_id + EXTENSION
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+        # Loop-side urgent writes and background flushes never interleave,
+        # and an older snapshot never replaces a newer one
+        self._write_lock = threading.Lock()
+        self._snapshot_seq = 0
+        self._written_seq = 0
+        # id -> (id, hash, username, phone, name, date), same rows as the entities table
+        self._entities: Dict[int, tuple] = {}
+        if os.path.exists(self.filename):
+            self._load()
+
+    def _load(self):
+        # SQLiteSession reads the key and upgrades old session files for us
+        stored = SQLiteSession(self.filename)
+        self._dc_id = stored.dc_id
+        self._server_address = stored.server_address
+        self._port = stored.port
+        self._auth_key = stored.auth_key
+        self._takeout_id = stored.takeout_id
+        self._update_states = dict(stored.get_update_states())
+        stored.close()
+
+        conn = sqlite3.connect(self.filename)
+        try:
+            for row in conn.execute('select id, hash, username, phone, name, date from entities'):
+                self._entities[row[0]] = row
+            for md5_digest, file_size, kind, file_id, file_hash in conn.execute(
+                    'select md5_digest, file_size, type, id, hash from sent_files'):
+                self._files[(md5_digest, file_size, _SentFileType(kind))] = (file_id, file_hash)
+        finally:
+            conn.close()
+        logger.info(f"Loaded session {self.filename} ({len(self._entities)} entities)")
+
+    def clone(self, to_instance=None):
+        # Exported/CDN senders only need a throwaway in-memory session
+        return super().clone(to_instance or MemorySession())
+
+    # Login-critical values: written to disk right away when they change
+
+    def set_dc(self, dc_id, server_address, port):
+        changed = (dc_id or 0, server_address, port) != (self._dc_id, self._server_address, self._port)
+        super().set_dc(dc_id, server_address, port)
+        if changed and self._dc_id:
+            self._write_now()
+
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        changed = (value.key if value else None) != (self._auth_key.key if self._auth_key else None)
+        self._auth_key = value
+        if changed:
+            self._write_now()
+
+    @MemorySession.takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self._dirty = True
+
+    # Everything else only marks the session dirty
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty = True
+
+    def cache_file(self, md5_digest, file_size, instance):
+        super().cache_file(md5_digest, file_size, instance)
+        self._dirty = True
+
+    def process_entities(self, tlo):
+        now = int(time.time())
+        for row in self._entities_to_rows(tlo):
+            known = self._entities.get(row[0])
+            if known is None or known[:5] != row:
+                self._entities[row[0]] = row + (now,)
+                self._dirty = True
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            ids = (id,)
+        else:
+            ids = (utils.get_peer_id(types.PeerUser(id)),
+                   utils.get_peer_id(types.PeerChat(id)),
+                   utils.get_peer_id(types.PeerChannel(id)))
+        for entity_id in ids:
+            row = self._entities.get(entity_id)
+            if row is not None:
+                return row[0], row[1]
+        return None
+
+    def get_entity_rows_by_username(self, username):
+        # Usernames move between entities: the most recently seen owner wins
+        rows = [row for row in self._entities.values() if row[2] == username]
+        if not rows:
+            return None
+        row = max(rows, key=lambda row: row[5] or 0)
+        return row[0], row[1]
+
+    def get_entity_rows_by_phone(self, phone):
+        return next(((row[0], row[1]) for row in self._entities.values() if row[3] == phone), None)
+
+    def get_entity_rows_by_name(self, name):
+        return next(((row[0], row[1]) for row in self._entities.values() if row[4] == name), None)
+
+    # Persistence
+
+    async def save(self):
+        """Called by Telethon (every minute and after logins); flushes when due"""
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def close(self):
+        """Called by Telethon on disconnect"""
+        if self._dirty:
+            await self.flush()
+
+    async def flush(self):
+        """Write the session to disk in a worker thread"""
+        async with self._lock:
+            snapshot = self._snapshot()
+            self._dirty = False
+            try:
+                await asyncio.to_thread(self._write, snapshot)
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"Error writing session file: {e}")
+
+    def _write_now(self):
+        """Synchronous write for login-critical changes (rare)"""
+        try:
+            self._write(self._snapshot())
+            self._dirty = False
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error writing session file: {e}")
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Copy of the state to write; taken on the event loop, cheap"""
+        self._snapshot_seq += 1
+        return {
+            'seq': self._snapshot_seq,
+            'dc': (self._dc_id, self._server_address, self._port),
+            'auth_key': self._auth_key,
+            'takeout_id': self._takeout_id,
+            'entities': list(self._entities.values()),
+            'files': [
+                (md5_digest, file_size, kind.value, file_id, file_hash)
+                for (md5_digest, file_size, kind), (file_id, file_hash) in self._files.items()
+            ],
+            'update_states': [
+                (entity_id, state.pts, state.qts, state.date.timestamp(), state.seq)
+                for entity_id, state in self._update_states.items()
+            ],
+        }
+
+    def _write(self, snapshot: Dict[str, Any]):
+        """Build a complete session file next to the real one, then swap it in"""
+        with self._write_lock:
+            if snapshot['seq'] > self._written_seq:
+                self._write_file(snapshot)
+                self._written_seq = snapshot['seq']
+                self._last_flush = time.monotonic()
+                self.flushes += 1
+
+    def _write_file(self, snapshot: Dict[str, Any]):
+        base = self.filename[:-len(EXTENSION)]
+        temp_path = f'{base}.flush{EXTENSION}'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        # SQLiteSession creates the schema of the installed Telethon version
+        temp = SQLiteSession(temp_path)
+        temp.set_dc(*snapshot['dc'])
+        temp.auth_key = snapshot['auth_key']
+        temp.takeout_id = snapshot['takeout_id']
+        temp.close()
+
+        conn = sqlite3.connect(temp_path)
+        try:
+            conn.executemany('insert or replace into entities values (?,?,?,?,?,?)',
+                             snapshot['entities'])
+            conn.executemany('insert or replace into sent_files values (?,?,?,?,?)',
+                             snapshot['files'])
+            conn.executemany('insert or replace into update_state values (?,?,?,?,?)',
+                             snapshot['update_states'])
+            conn.commit()
+        finally:
+            conn.close()
+
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.filename)
+        directory = os.open(os.path.dirname(os.path.abspath(self.filename)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def delete(self):
+        """Remove the session file (log out)"""
+        try:
+            os.remove(self.filename)
+            return True
+        except OSError:
+            return False
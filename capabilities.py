@@ -0,0 +1,97 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict
+
+from telethon.crypto import aes as telethon_aes
+from telethon.crypto import libssl
+
+
+logger = logging.getLogger(__name__)
+
+# Telethon encrypts every MTProto packet; uploads go out in 512 KiB parts
+UPLOAD_PART_SIZE = 512 * 1024
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def crypto_backend() -> str:
+    """AES-IGE implementation Telethon is using: cryptg, libssl or python"""
+    if telethon_aes.cryptg is not None:
+        return 'cryptg'
+    if libssl.encrypt_ige and libssl.decrypt_ige:
+        return 'libssl'
+    return 'python'
+
+
+def install_uvloop(enabled: bool = True) -> bool:
+    """Make uvloop the event loop if present; call before asyncio.run()"""
+    if not enabled or uvloop is None:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def loop_implementation() -> str:
+    """Name of the running (or default) event loop implementation"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return type(asyncio.get_event_loop_policy()).__module__.split('.')[0]
+    return type(loop).__module__.split('.')[0]
+
+
+def benchmark_encrypt(megabytes: float = 1.0) -> float:
+    """AES-IGE encryption throughput in MB/s"""
+    data = os.urandom(int(megabytes * 1024 * 1024) // 16 * 16)
+    key, iv = os.urandom(32), os.urandom(32)
+    started = time.perf_counter()
+    telethon_aes.AES.encrypt_ige(data, key, iv)
+    return len(data) / (1024 * 1024) / (time.perf_counter() - started)
+
+
+async def benchmark_upload_encrypt(client, megabytes: float = 1.0) -> float:
+    """MB/s through ``client.upload_file`` of an offline (fake) client
+
+    Nothing is sent: this measures encrypting the file in upload-sized
+    parts, not network upload speed.
+    """
+    data = os.urandom(int(megabytes * 1024 * 1024))
+    started = time.perf_counter()
+    await client.upload_file(data)
+    return len(data) / (1024 * 1024) / (time.perf_counter() - started)
+
+
+def detect_capabilities(benchmark_megabytes: float = 0) -> Dict[str, Any]:
+    """Which fast paths are active, plus measured encryption throughput if asked
+
+    The benchmark blocks while it runs, so only the self-test asks for it.
+    """
+    capabilities = {
+        'crypto_backend': crypto_backend(),
+        'cryptg_installed': telethon_aes.cryptg is not None,
+        'uvloop_installed': uvloop is not None,
+        'event_loop': loop_implementation(),
+    }
+    if benchmark_megabytes:
+        capabilities['encrypt_mb_s'] = round(benchmark_encrypt(benchmark_megabytes), 1)
+    return capabilities
+
+
+def log_capabilities(capabilities: Dict[str, Any]):
+    """Log the capability report, warning about missing fast paths"""
+    speed = f" ({capabilities['encrypt_mb_s']} MB/s AES-IGE)" if 'encrypt_mb_s' in capabilities else ''
+    logger.info(
+        f"Crypto: {capabilities['crypto_backend']}{speed}, "
+        f"event loop: {capabilities['event_loop']}"
+    )
+    if 'upload_encrypt_mb_s' in capabilities:
+        logger.info(f"Upload encryption (offline, no network): {capabilities['upload_encrypt_mb_s']} MB/s")
+    if not capabilities['cryptg_installed']:
+        logger.warning("cryptg not installed - media encryption is slow (pip install cryptg)")
+    if not capabilities['uvloop_installed'] and os.name != 'nt':
+        logger.warning("uvloop not installed - using the default event loop (pip install uvloop)")
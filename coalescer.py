@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from forward_job import ForwardJob
+from media_types import ALBUM_MEDIA_TYPES
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits: caption length of a media post, items in one album
+CAPTION_LIMIT = 1024
+MAX_ALBUM = 10
+
+
+def merge_jobs(first: ForwardJob, second: ForwardJob) -> Optional[ForwardJob]:
+    """One post out of two adjacent parts, None if they can't share a post
+
+    At most one part may carry text, media must be of one kind that albums
+    allow and fit an album, and text that becomes a caption must fit the
+    caption limit.
+    """
+    if first.text and second.text:
+        return None
+    if first.media and second.media and (
+            first.media_type != second.media_type
+            or first.media_type not in ALBUM_MEDIA_TYPES
+            or len(first.media) + len(second.media) > MAX_ALBUM):
+        return None
+    text_part = first if first.text else second
+    media = first.media + second.media
+    if media and len(text_part.text) > CAPTION_LIMIT:
+        return None
+    return first._replace(
+        # Edits of the listing come from the text message, so map that one
+        message_id=text_part.message_id if text_part.text else first.message_id,
+        text=text_part.text,
+        original_text=text_part.original_text,
+        media=media,
+        media_type=first.media_type or second.media_type,
+    )
+
+
+def combine(parts: List[ForwardJob]) -> Optional[ForwardJob]:
+    combined = parts[0]
+    for part in parts[1:]:
+        combined = merge_jobs(combined, part)
+        if combined is None:
+            return None
+    return combined
+
+
+def merge_album(parts: List[ForwardJob]) -> ForwardJob:
+    """One post out of an album's items, captioned by the item with text
+
+    Telegram grouped them already, so kinds and count need no checks.
+    """
+    text_part = next((part for part in parts if part.text), parts[0])
+    return text_part._replace(
+        media=tuple(ref for part in parts for ref in part.media),
+        media_type=next((part.media_type for part in parts if part.media_type), None),
+    )
+
+
+class _Pending:
+    __slots__ = ('parts', 'combined', 'handle')
+
+    def __init__(self, job: ForwardJob):
+        self.parts = [job]
+        self.combined = job
+        self.handle = None
+
+
+class PostCoalescer:
+    """Merges a sender's text post with adjacent photos into one listing
+
+    Text-only and media-only posts are held per (group, sender) for the
+    group's window; parts that arrive within it (the window restarts with
+    each one) are merged into a single captioned post. Complete posts, edits
+    and deletions of messages not being held pass straight through.
+    """
+
+    def __init__(self, submit: Callable[[ForwardJob], Awaitable],
+                 window_for: Callable[[int], float]):
+        self._submit = submit
+        self._window_for = window_for
+        self._pending: Dict[Tuple[int, int], _Pending] = {}
+        self._tasks = set()
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(self, job: ForwardJob):
+        """Hold, merge or pass on one job"""
+        if job.action != 'new':
+            if not self._update_pending(job):
+                await self._submit(job)
+            return
+
+        window = self._window_for(job.source_group_id)
+        if window <= 0 or job.sender_id is None:
+            await self._submit(job)
+            return
+
+        key = (job.source_group_id, job.sender_id)
+        pending = self._pending.get(key)
+        if pending is not None:
+            merged = merge_jobs(pending.combined, job)
+            if merged is not None:
+                pending.parts.append(job)
+                pending.combined = merged
+                self.merged += 1
+                self._schedule(key, pending, window)
+                return
+            # Doesn't fit (second text, other media kind): send what we have
+            await self._flush(key)
+
+        if bool(job.text) != bool(job.media):
+            pending = self._pending[key] = _Pending(job)
+            self._schedule(key, pending, window)
+        else:
+            await self._submit(job)
+
+    def _update_pending(self, job: ForwardJob) -> bool:
+        """Apply an edit or deletion to a held part; False if none matches"""
+        for key, pending in self._pending.items():
+            if key[0] != job.source_group_id:
+                continue
+            for index, part in enumerate(pending.parts):
+                if part.message_id != job.message_id:
+                    continue
+                if job.action == 'delete':
+                    del pending.parts[index]
+                else:
+                    pending.parts[index] = job._replace(action='new', created_at=part.created_at)
+                if not pending.parts:
+                    pending.handle.cancel()
+                    del self._pending[key]
+                else:
+                    pending.combined = combine(pending.parts)
+                return True
+        return False
+
+    def _schedule(self, key: Tuple[int, int], pending: _Pending, window: float):
+        if pending.handle is not None:
+            pending.handle.cancel()
+        pending.handle = asyncio.get_running_loop().call_later(window, self._expire, key)
+
+    def _expire(self, key: Tuple[int, int]):
+        task = asyncio.ensure_future(self._flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, key: Tuple[int, int]):
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        pending.handle.cancel()
+        if pending.combined is not None:
+            if len(pending.parts) > 1:
+                logger.info(
+                    f"Merged {len(pending.parts)} posts from {key[1]} in {key[0]} "
+                    f"into {pending.combined.message_id}"
+                )
+            await self._submit(pending.combined)
+        else:
+            # An edit made the parts incompatible; send them as they came
+            for part in pending.parts:
+                await self._submit(part)
+
+    async def flush(self):
+        """Send everything being held now"""
+        for key in list(self._pending):
+            await self._flush(key)
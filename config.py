@@ -31,6 +31,90 @@ TARGET_GROUP_ID = int(os.getenv('TARGET_GROUP_ID', 0))
 # Message settings
 MESSAGE_DELAY = int(os.getenv('MESSAGE_DELAY', 2))
 
+# Forward queue limits
+QUEUE_MAX_SIZE = int(os.getenv('QUEUE_MAX_SIZE', 500))
+# New posts older than this when their turn comes are dropped, not sent late
+QUEUE_MAX_AGE_MINUTES = float(os.getenv('QUEUE_MAX_AGE_MINUTES', 30))
+# Seconds a low-priority post may wait for queue space before being dropped
+QUEUE_PUT_TIMEOUT = float(os.getenv('QUEUE_PUT_TIMEOUT', 5))
+# Seconds the bot keeps sending queued posts when it is stopped
+STOP_DRAIN_SECONDS = float(os.getenv('STOP_DRAIN_SECONDS', 30))
+
+# Send lanes: large videos/documents go to parallel bulk workers so text and
+# photos never wait behind them
+SEND_BULK_WORKERS = int(os.getenv('SEND_BULK_WORKERS', 2))
+SEND_BULK_THRESHOLD_MB = float(os.getenv('SEND_BULK_THRESHOLD_MB', 5))
+
+# Where the source → target message map is stored
+MESSAGE_MAP_PATH = os.getenv('MESSAGE_MAP_PATH', 'forwarded_messages.db')
+
+# Shared record of source messages already taken (all shards use it)
+DEDUP_DB_PATH = os.getenv('DEDUP_DB_PATH', 'dedup.db')
+
+# Number of ingest processes supervisor.py starts
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', os.cpu_count() or 1))
+
+# Bulk re-pricing (reprice.py)
+REPRICE_EDITS_PER_SECOND = float(os.getenv('REPRICE_EDITS_PER_SECOND', 1))
+REPRICE_BATCH_SIZE = int(os.getenv('REPRICE_BATCH_SIZE', 500))
+REPRICE_CHECKPOINT_PATH = os.getenv('REPRICE_CHECKPOINT_PATH', 'reprice_checkpoint.json')
+
+# On-demand profiling output (see profiling.py)
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+
+# Use uvloop as the event loop when it is installed
+USE_UVLOOP = os.getenv('USE_UVLOOP', 'true').lower() == 'true'
+
+# Seconds to wait for a sender's photos after a text post (or the text after
+# photos) to merge them into one listing; 0 turns merging off
+COALESCE_WINDOW_SECONDS = float(os.getenv('COALESCE_WINDOW_SECONDS', 0))
+
+# Seconds to collect copies of the same listing from several suppliers and
+# forward only the cheapest (see best_offer.py); 0 turns it off
+BEST_OFFER_WINDOW_SECONDS = float(os.getenv('BEST_OFFER_WINDOW_SECONDS', 0))
+
+# Digest mode (see digest.py): a group's new listings are sent together as a
+# catalogue post every DIGEST_MINUTES or DIGEST_MAX_ITEMS listings, whichever
+# comes first, with up to DIGEST_PHOTOS pictures; 0 minutes turns it off
+DIGEST_MINUTES = float(os.getenv('DIGEST_MINUTES', 0))
+DIGEST_MAX_ITEMS = int(os.getenv('DIGEST_MAX_ITEMS', 10))
+DIGEST_PHOTOS = int(os.getenv('DIGEST_PHOTOS', 1))
+DIGEST_BUFFER_PATH = os.getenv('DIGEST_BUFFER_PATH', 'digest_buffer.json')
+
+# Connection watchdog: heartbeat every WATCHDOG_INTERVAL seconds (a probe
+# timing out after WATCHDOG_TIMEOUT counts as failed). With no updates for
+# WATCHDOG_STALL_MINUTES the groups are polled for missed messages; at most
+# GAP_RECOVERY_LIMIT messages per group are recovered after a reconnect.
+WATCHDOG_INTERVAL = float(os.getenv('WATCHDOG_INTERVAL', 15))
+WATCHDOG_TIMEOUT = float(os.getenv('WATCHDOG_TIMEOUT', 10))
+WATCHDOG_STALL_MINUTES = float(os.getenv('WATCHDOG_STALL_MINUTES', 10))
+GAP_RECOVERY_LIMIT = int(os.getenv('GAP_RECOVERY_LIMIT', 200))
+
+# Keep the Telethon session in memory and write session_name.session in the
+# background every SESSION_FLUSH_SECONDS (false: Telethon's SQLite session)
+BUFFERED_SESSION = os.getenv('BUFFERED_SESSION', 'true').lower() == 'true'
+SESSION_FLUSH_SECONDS = float(os.getenv('SESSION_FLUSH_SECONDS', 60))
+
+# Handles of media already sent to the target, reused when a source file
+# reference expired or the source group forbids sending its media on
+MEDIA_CACHE_SIZE = int(os.getenv('MEDIA_CACHE_SIZE', 2000))
+MEDIA_CACHE_TTL_HOURS = float(os.getenv('MEDIA_CACHE_TTL_HOURS', 6))
+
+# Pace posts by handing them to Telegram as scheduled messages on a spacing
+# timeline instead of sleeping between sends. Posts due sooner than
+# SCHEDULE_MIN_LEAD_SECONDS are still waited for in-process.
+SCHEDULED_PACING = os.getenv('SCHEDULED_PACING', 'false').lower() == 'true'
+SCHEDULE_MIN_LEAD_SECONDS = float(os.getenv('SCHEDULE_MIN_LEAD_SECONDS', 10))
+
+# Extra data centres to pre-warm at startup (comma-separated DC ids).
+# The DC holding the target group's media is always warmed.
+WARM_MEDIA_DC_IDS = [
+    int(dc_id.strip())
+    for dc_id in os.getenv('WARM_MEDIA_DC_IDS', '').split(',')
+    if dc_id.strip()
+]
+
 # Buyer's specific requirements
 # Watch detection keywords
 WATCH_KEYWORDS = [
@@ -49,9 +133,78 @@ PRICING_LOGIC = {
     'round_up_prices': True  # Round up prices to remove pence
 }
 
+# Category pricing table (see pricing_table.py). Categories are matched by
+# keyword in order, the one without keywords is the fallback; each has price
+# bands by original price ("up_to" inclusive, the last band open with None).
+# None derives it from WATCH_KEYWORDS/PRICING_LOGIC above:
+# watches +105, everything else x1.65 +5.
+PRICING_TABLE = None
+# Example with bands and more categories:
+# PRICING_TABLE = {
+#     'round_up_prices': True,
+#     'categories': [
+#         {'name': 'watches', 'keywords': WATCH_KEYWORDS, 'bands': [
+#             {'up_to': 100, 'multiplier': 1, 'add': 105},
+#             {'up_to': None, 'multiplier': 1.4, 'add': 80}]},
+#         {'name': 'bags', 'keywords': ['bag', 'handbag', 'tote', 'wallet'], 'bands': [
+#             {'up_to': 50, 'multiplier': 1.8, 'add': 5},
+#             {'up_to': None, 'multiplier': 1.5, 'add': 10}]},
+#         {'name': 'shoes', 'keywords': ['shoe', 'trainer', 'sneaker', 'air max'], 'bands': [
+#             {'up_to': None, 'multiplier': 1.6, 'add': 8}]},
+#         {'name': 'default', 'bands': [
+#             {'up_to': None, 'multiplier': 1.65, 'add': 5}]},
+#     ],
+# }
+
+# Per-group pricing tables, e.g. {-1001879591244: {...}}; others use PRICING_TABLE
+GROUP_PRICING_TABLES: dict[int, dict] = {}
+
+# Old exact-match price rewrites (PRICE_UPDATE_RULES below), applied after
+# pricing. Superseded by the pricing table; enable only to keep old output.
+LEGACY_PRICE_UPDATE_RULES = os.getenv('LEGACY_PRICE_UPDATE_RULES', 'false').lower() == 'true'
+
 # Delivery message to append
 DELIVERY_MESSAGE = "Quick Free delivery 3/4 days"
 
+# Layout of every forwarded post (see output_templates.py): prefix, the
+# re-priced body, then the delivery line and the contact block, each after
+# the separator unless the body already contains it. '{letter}'/'{name}' in
+# the prefix and '{contact_text}'/'{telegram_link}'/'{shop_name}' in the
+# contact block are filled in once at startup; '' leaves a part out.
+OUTPUT_TEMPLATE = {
+    'prefix': '[{letter}] ',
+    'delivery': DELIVERY_MESSAGE,
+    'contact': '{contact_text}\n{telegram_link}',
+    'separator': '\n\n',
+}
+
+# Per-group changes to OUTPUT_TEMPLATE, by group id
+GROUP_OUTPUT_TEMPLATES: dict[int, dict] = {
+    -1003095265760: {'delivery': '2/4 weeks delivery'},  # Joyce's group
+}
+
+# Pre-filter (see prefilter.py): drops chatter before any processing or
+# queueing. Every rule is off by default.
+PREFILTER_RULES = {
+    # Text-only posts shorter than this are dropped
+    'min_length': int(os.getenv('PREFILTER_MIN_LENGTH', 0)),
+    # Posts with text but no price are dropped
+    'require_price': os.getenv('PREFILTER_REQUIRE_PRICE', 'false').lower() == 'true',
+    # Posts without a photo, video or file are dropped (stickers don't count)
+    'require_media': os.getenv('PREFILTER_REQUIRE_MEDIA', 'false').lower() == 'true',
+    # Posts containing any of these phrases (any case) are dropped
+    'blocklist': [
+        phrase.strip()
+        for phrase in os.getenv('PREFILTER_BLOCKLIST', '').split(',')
+        if phrase.strip()
+    ],
+    # Only these senders are forwarded; empty allows everyone
+    'senders': [],
+}
+
+# Per-group changes to PREFILTER_RULES, e.g. {-1001879591244: {'min_length': 20}}
+GROUP_PREFILTER_RULES: dict[int, dict] = {}
+
 # Multiple source group monitoring settings
 MULTI_SOURCE_MONITORING = len(SOURCE_GROUP_IDS) > 1
 _source_group_names_raw = os.getenv('SOURCE_GROUP_NAMES', '')
@@ -87,26 +240,55 @@ for i, group_id in enumerate(SOURCE_GROUP_IDS):
     group_delay_key = f'GROUP_{i+1}_DELAY'
     group_delay = int(os.getenv(group_delay_key, MESSAGE_DELAY))
     
+    # Queue priority for new posts (lower is sent sooner, edits use 0)
+    group_priority = int(os.getenv(f'GROUP_{i+1}_PRIORITY', 10))
+    
+    # Groups can be switched off without removing them (and paused at runtime)
+    group_enabled = os.getenv(f'GROUP_{i+1}_ENABLED', 'true').lower() == 'true'
+    
+    # Per-group merge window for split text/photo posts
+    group_coalesce_window = float(os.getenv(f'GROUP_{i+1}_COALESCE_WINDOW', COALESCE_WINDOW_SECONDS))
+    
+    # Per-group best-offer window (0 keeps the group out of the comparison)
+    group_best_offer_window = float(os.getenv(f'GROUP_{i+1}_BEST_OFFER_WINDOW', BEST_OFFER_WINDOW_SECONDS))
+    
+    # Per-group digest mode, e.g. for suppliers that dump their stock daily
+    group_digest = {
+        'minutes': float(os.getenv(f'GROUP_{i+1}_DIGEST_MINUTES', DIGEST_MINUTES)),
+        'max_items': int(os.getenv(f'GROUP_{i+1}_DIGEST_MAX_ITEMS', DIGEST_MAX_ITEMS)),
+        'photos': DIGEST_PHOTOS,
+    }
+    
     # Get group letter for identification (use default if not in SOURCE_GROUP_LETTERS)
     group_letter = SOURCE_GROUP_LETTERS.get(group_id, f"G{i+1}")
     
-    # Custom delivery message for specific groups
-    custom_delivery_message = DELIVERY_MESSAGE
-    # Joyce's group gets different delivery time
-    if group_id == -1003095265760:  # Joyce's group
-        custom_delivery_message = "2/4 weeks delivery"
+    # Pre-filter rules; GROUP_X_SENDERS restricts a group to some senders
+    group_prefilter = {**PREFILTER_RULES, **GROUP_PREFILTER_RULES.get(group_id, {})}
+    group_senders = os.getenv(f'GROUP_{i+1}_SENDERS', '')
+    if group_senders:
+        group_prefilter['senders'] = [int(sender) for sender in group_senders.split(',') if sender.strip()]
+    
+    # Output layout, with the group's own delivery line etc.
+    group_template = {**OUTPUT_TEMPLATE, **GROUP_OUTPUT_TEMPLATES.get(group_id, {})}
     
     SOURCE_GROUP_SETTINGS[group_id] = {
         'name': group_name,
-        'enabled': True,
+        'enabled': group_enabled,
         'message_delay': group_delay,
+        'priority': group_priority,
+        'coalesce_window': group_coalesce_window,
+        'best_offer_window': group_best_offer_window,
+        'digest': group_digest,
         'watch_keywords': WATCH_KEYWORDS.copy(),
         'pricing_logic': PRICING_LOGIC.copy(),
-        'delivery_message': custom_delivery_message,
+        'pricing_table': GROUP_PRICING_TABLES.get(group_id, PRICING_TABLE),
+        'prefilter': group_prefilter,
+        'output_template': group_template,
+        'delivery_message': group_template['delivery'],
         'letter': group_letter  # Add letter identification
     }
 
-# Price update rules (keeping existing for backward compatibility)
+# Price update rules (legacy, only applied with LEGACY_PRICE_UPDATE_RULES=true)
 PRICE_UPDATE_RULES = {
     '1000': '1200',  # 1000 → 1200
     '500': '600',    # 500 → 600
@@ -0,0 +1,178 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict
+from telethon.tl.functions.updates import GetStateRequest
+
+
+logger = logging.getLogger(__name__)
+
+# Reconnect backoff: doubles on every failed attempt
+MIN_BACKOFF = 1
+MAX_BACKOFF = 60
+
+
+class ConnectionWatchdog:
+    """Keeps the bot connected and makes sure no listing is missed
+
+    Every ``interval`` seconds (or as soon as the connection drops) the
+    connection is probed with a cheap GetState request; ``max_failures``
+    failed probes in a row trigger a reconnect with backoff. If no update
+    arrived for ``stall_after`` seconds the source groups are polled; finding
+    messages the update stream never delivered means it stalled, so the
+    client reconnects as well. After every reconnect Telethon catches up from
+    the update state saved in the session, and each group is read from the
+    last message the dedup store recorded, so nothing is forwarded twice.
+    """
+
+    def __init__(self, bot, interval: float = 15, timeout: float = 10,
+                 stall_after: float = 600, recovery_limit: int = 200,
+                 max_failures: int = 2, clock=time.monotonic):
+        self.bot = bot
+        self.interval = interval
+        self.timeout = timeout
+        self.stall_after = stall_after
+        self.recovery_limit = recovery_limit
+        self.max_failures = max_failures
+        self.clock = clock
+        self.last_update = clock()
+        self.failures = 0
+        self.reconnects = 0
+        self.recovered = 0
+        self.last_recovery_seconds = None
+        self._running = False
+
+    async def touch(self, event=None):
+        """Record that an update arrived (registered as a raw event handler)"""
+        self.last_update = self.clock()
+
+    async def run(self):
+        """Watch the connection until stop() is called"""
+        self._running = True
+        while self._running:
+            try:
+                if not await self.healthy():
+                    await self.reconnect()
+                elif self.clock() - self.last_update > self.stall_after:
+                    missed = await self.recover_gap()
+                    self.last_update = self.clock()
+                    if missed:
+                        logger.warning(f"Update stream stalled ({missed} missed messages), reconnecting")
+                        await self.reconnect()
+            except (asyncio.CancelledError, PermissionError):
+                raise
+            except Exception as e:
+                logger.error(f"Watchdog error: {e}")
+            await self._wait()
+
+    def stop(self):
+        self._running = False
+
+    async def _wait(self):
+        """Sleep for one interval, waking up early if the client disconnects"""
+        client = self.bot.client
+        disconnected = getattr(client, 'disconnected', None) if client.is_connected() else None
+        if disconnected is None:
+            await asyncio.sleep(self.interval)
+            return
+        waiter = asyncio.ensure_future(disconnected)
+        done, _ = await asyncio.wait({waiter}, timeout=self.interval)
+        if waiter in done:
+            if not waiter.cancelled() and waiter.exception():
+                logger.warning(f"Connection lost: {waiter.exception()}")
+        else:
+            waiter.cancel()
+
+    async def healthy(self) -> bool:
+        """Heartbeat: False once the probe failed ``max_failures`` times in a row"""
+        client = self.bot.client
+        if not client.is_connected():
+            return False
+        try:
+            await asyncio.wait_for(client(GetStateRequest()), self.timeout)
+            self.failures = 0
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Heartbeat failed ({self.failures}/{self.max_failures}): {e!r}")
+            return self.failures < self.max_failures
+
+    async def reconnect(self):
+        """Reconnect with backoff, then replay what was missed meanwhile"""
+        client = self.bot.client
+        started = self.clock()
+        self.reconnects += 1
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.warning(f"Error closing stale connection: {e}")
+
+        backoff = MIN_BACKOFF
+        while self._running:
+            try:
+                await client.connect()
+                if not await client.is_user_authorized():
+                    # Only an interactive login helps here
+                    raise PermissionError("Session is no longer authorized, log in again")
+                break
+            except PermissionError:
+                self._running = False
+                raise
+            except Exception as e:
+                logger.error(f"Reconnect failed: {e}, retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+        if not client.is_connected():
+            return
+
+        self.failures = 0
+        # Updates from the session's saved state first, then our own record
+        await client.catch_up()
+        missed = await self.recover_gap()
+        self.last_update = self.clock()
+        self.last_recovery_seconds = round(self.clock() - started, 2)
+        logger.info(
+            f"Reconnected in {self.last_recovery_seconds}s, "
+            f"recovered {missed} missed messages"
+        )
+
+    async def recover_gap(self) -> int:
+        """Handle source messages newer than the last one taken, per group"""
+        bot = self.bot
+        if bot.dedup is None:
+            return 0  # Send-only process: nothing to ingest
+        missed = 0
+        for group_id in sorted(bot.enabled_groups):
+            last_id = bot.dedup.last_message_id(group_id)
+            if not last_id:
+                continue  # Never forwarded from this group: don't replay history
+            album = []  # Items of an album come in a row and go out as one post
+            try:
+                async for message in bot.client.iter_messages(
+                        group_id, min_id=last_id, reverse=True, limit=self.recovery_limit):
+                    if bot.dedup.seen(group_id, message.id):
+                        continue
+                    missed += 1
+                    if album and message.grouped_id != album[0].grouped_id:
+                        await bot.handle_source_album(album, group_id)
+                        album = []
+                    if message.grouped_id:
+                        album.append(message)
+                    else:
+                        await bot.handle_source_message(message, group_id)
+                if album:
+                    await bot.handle_source_album(album, group_id)
+            except Exception as e:
+                logger.error(f"Could not recover messages of {group_id}: {e}")
+        self.recovered += missed
+        return missed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'reconnects': self.reconnects,
+            'recovered': self.recovered,
+            'last_recovery_seconds': self.last_recovery_seconds,
+            'seconds_since_update': round(self.clock() - self.last_update),
+        }
@@ -0,0 +1,64 @@
+import time
+import sqlite3
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class DedupStore:
+    """Process-safe record of source messages already taken for forwarding
+
+    Backed by SQLite in WAL mode so every shard process (and the gap recovery
+    after a reconnect) can claim messages from the same file; a message is
+    forwarded only by whoever claims it first.
+    """
+
+    def __init__(self, path: str = 'dedup.db', retention_days: float = 7):
+        self.path = path
+        self.retention = retention_days * 86400
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS claimed ('
+            ' source_group_id INTEGER NOT NULL,'
+            ' source_message_id INTEGER NOT NULL,'
+            ' claimed_at REAL NOT NULL,'
+            ' PRIMARY KEY (source_group_id, source_message_id))'
+        )
+
+    def claim(self, source_group_id: int, source_message_id: int) -> bool:
+        """True if this caller is the first to see the message"""
+        cursor = self._conn.execute(
+            'INSERT OR IGNORE INTO claimed VALUES (?, ?, ?)',
+            (source_group_id, source_message_id, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def seen(self, source_group_id: int, source_message_id: int) -> bool:
+        return self._conn.execute(
+            'SELECT 1 FROM claimed WHERE source_group_id = ? AND source_message_id = ?',
+            (source_group_id, source_message_id)
+        ).fetchone() is not None
+
+    def last_message_id(self, source_group_id: int) -> int:
+        """Highest claimed message id of a group (0 if none)"""
+        row = self._conn.execute(
+            'SELECT MAX(source_message_id) FROM claimed WHERE source_group_id = ?',
+            (source_group_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def prune(self) -> int:
+        """Forget claims older than the retention period"""
+        cursor = self._conn.execute(
+            'DELETE FROM claimed WHERE claimed_at < ?',
+            (time.time() - self.retention,)
+        )
+        if cursor.rowcount:
+            logger.info(f"Pruned {cursor.rowcount} old dedup entries")
+        return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List
+
+from coalescer import CAPTION_LIMIT, MAX_ALBUM
+from forward_job import ForwardJob, MediaRef
+from output_templates import OutputTemplate
+from prefilter import PRICE_PATTERN
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit for a text message; a caption has CAPTION_LIMIT
+TEXT_LIMIT = 4096
+# Longest catalogue line, so one listing always fits a caption
+ENTRY_LIMIT = 200
+
+# Message ids of digest posts: negative, so they never clash with a source
+# message or with each other in the queue, send lanes and timeline
+_digest_ids = itertools.count(-1, -1)
+
+
+def entry_line(job: ForwardJob) -> str:
+    """Catalogue line of a listing: its first line as posted, plus the price line if elsewhere"""
+    lines = [line.strip() for line in job.text.split('\n') if line.strip()]
+    if not lines:
+        return ''
+    entry = lines[0]
+    if PRICE_PATTERN.search(entry.lower()) is None:
+        priced = next((line for line in lines[1:] if PRICE_PATTERN.search(line.lower())), None)
+        if priced is not None:
+            entry = f"{entry} – {priced}"
+    if len(entry) > ENTRY_LIMIT:
+        entry = entry[:ENTRY_LIMIT - 1].rstrip() + '…'
+    return entry
+
+
+def render_digest(items: List[ForwardJob], template: OutputTemplate) -> str:
+    entries = '\n'.join(f"{number}. {entry_line(job)}" for number, job in enumerate(items, 1))
+    noun = 'listing' if len(items) == 1 else 'listings'
+    return template.render(f"🗂 {len(items)} new {noun}\n\n{entries}", prefixed=False)
+
+
+def digest_media(items: List[ForwardJob], photos: int) -> tuple:
+    """First photo of each listing, in list order, at most ``photos`` of them"""
+    return tuple(job.media[0] for job in items if job.media)[:min(photos, MAX_ALBUM)]
+
+
+def digest_chunks(items: List[ForwardJob], template: OutputTemplate,
+                  photos: int) -> List[List[ForwardJob]]:
+    """Listings split into runs that each fit one post within Telegram's length limits"""
+    def fits(chunk: List[ForwardJob]) -> bool:
+        limit = CAPTION_LIMIT if digest_media(chunk, photos) else TEXT_LIMIT
+        return len(render_digest(chunk, template)) <= limit
+
+    chunks = []
+    for job in items:
+        if chunks and fits(chunks[-1] + [job]):
+            chunks[-1].append(job)
+        else:
+            chunks.append([job])
+    return chunks
+
+
+def digest_post(chunk: List[ForwardJob], template: OutputTemplate, photos: int) -> ForwardJob:
+    """Catalogue post for one run of listings"""
+    media = digest_media(chunk, photos)
+    return ForwardJob(
+        source_group_id=chunk[0].source_group_id,
+        message_id=next(_digest_ids),  # Stands for many source messages, mapped to none
+        sender_id=None,
+        # Stamped when packed: the queue drops new posts older than its
+        # max age, and a digest's listings are that old by design
+        created_at=time.time(),
+        media_type='photo' if media else None,
+        media=media,
+        text=render_digest(chunk, template),
+    )
+
+
+def pack_digests(items: List[ForwardJob], template: OutputTemplate,
+                 photos: int) -> List[ForwardJob]:
+    """Catalogue posts for buffered listings, each within Telegram's length limits"""
+    return [digest_post(chunk, template, photos)
+            for chunk in digest_chunks(items, template, photos)]
+
+
+def _job_to_json(job: ForwardJob) -> Dict[str, Any]:
+    data = job._asdict()
+    data['media'] = [[ref.kind, ref.id, ref.access_hash, ref.file_reference.hex(),
+                      ref.size, ref.message_id] for ref in job.media]
+    return data
+
+
+def _job_from_json(data: Dict[str, Any]) -> ForwardJob:
+    media = tuple(
+        MediaRef(kind, media_id, access_hash, bytes.fromhex(file_reference), size, message_id)
+        for kind, media_id, access_hash, file_reference, size, message_id in data['media']
+    )
+    return ForwardJob(**{**data, 'media': media})
+
+
+class DigestBuffer:
+    """Collects a group's new listings into periodic catalogue posts
+
+    For groups whose ``settings_for(group_id)['minutes']`` is above 0, new
+    text and photo listings are buffered and sent as numbered catalogue
+    posts (the first line and price of each, with the group's delivery and
+    contact lines once) when the oldest has waited that long or
+    ``max_items`` are buffered. Up to ``photos`` pictures go with a post as
+    an album; posts are split to stay within caption and message limits.
+    The buffer is written to ``path`` on every change (write-then-rename)
+    and reloaded by ``restore``; a digest's listings stay in the file until
+    ``sent`` is called with its post, so a stop before then sends them again. Other groups, videos, documents, edits and
+    deletions of messages not being buffered pass straight through.
+    """
+
+    def __init__(self, submit: Callable[[ForwardJob], Awaitable],
+                 settings_for: Callable[[int], Dict[str, Any]],
+                 template_for: Callable[[int], OutputTemplate],
+                 path: str = 'digest_buffer.json'):
+        self._submit = submit
+        self._settings_for = settings_for
+        self._template_for = template_for
+        self.path = path
+        self._buffers: Dict[int, List[ForwardJob]] = {}
+        self._handles: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self._unsent: Dict[int, List[ForwardJob]] = {}  # digest post id -> its listings
+        self.digested = 0  # listings sent in digests
+        self.posts = 0  # digest posts sent
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._buffers.values())
+
+    async def add(self, job: ForwardJob):
+        """Buffer a listing, or pass it on"""
+        if job.action != 'new':
+            if not self._update_buffered(job):
+                await self._submit(job)
+            return
+
+        settings = self._settings_for(job.source_group_id)
+        if (settings.get('minutes', 0) <= 0 or not job.text
+                or job.media_type not in (None, 'photo')):
+            await self._submit(job)
+            return
+
+        items = self._buffers.setdefault(job.source_group_id, [])
+        items.append(job)
+        if len(items) >= settings.get('max_items', 10):
+            await self.flush(job.source_group_id)
+            return
+        self._save()
+        if len(items) == 1:
+            self._schedule(job.source_group_id, settings['minutes'] * 60)
+
+    def _update_buffered(self, job: ForwardJob) -> bool:
+        """Apply an edit or deletion to a buffered listing; False if none matches"""
+        items = self._buffers.get(job.source_group_id) or []
+        for index, item in enumerate(items):
+            if item.message_id != job.message_id:
+                continue
+            if job.action == 'delete':
+                del items[index]
+                if not items:
+                    self._cancel(job.source_group_id)
+                    del self._buffers[job.source_group_id]
+            else:
+                items[index] = job._replace(action='new', created_at=item.created_at)
+            self._save()
+            return True
+        return False
+
+    def _schedule(self, group_id: int, delay: float):
+        self._cancel(group_id)
+        self._handles[group_id] = asyncio.get_running_loop().call_later(
+            max(delay, 0), self._expire, group_id
+        )
+
+    def _cancel(self, group_id: int):
+        handle = self._handles.pop(group_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _expire(self, group_id: int):
+        self._handles.pop(group_id, None)
+        task = asyncio.ensure_future(self.flush(group_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, group_id: int = None):
+        """Send a group's buffered listings now (every group's if None)"""
+        group_ids = list(self._buffers) if group_id is None else [group_id]
+        for group_id in group_ids:
+            self._cancel(group_id)
+            items = self._buffers.pop(group_id, None)
+            if not items:
+                continue
+            settings = self._settings_for(group_id)
+            template = self._template_for(group_id)
+            photos = settings.get('photos', 1)
+            posts = []
+            for chunk in digest_chunks(items, template, photos):
+                post = digest_post(chunk, template, photos)
+                self._unsent[post.message_id] = chunk
+                posts.append(post)
+            self._save()
+            self.digested += len(items)
+            self.posts += len(posts)
+            logger.info(f"Digest of {len(items)} listings from {group_id} in {len(posts)} post(s)")
+            for post in posts:
+                await self._submit(post)
+
+    def sent(self, post: ForwardJob):
+        """A digest post went out (or was dropped): forget its listings"""
+        if self._unsent.pop(post.message_id, None) is not None:
+            self._save()
+
+    def restore(self):
+        """Reload the buffer written before a restart and re-arm its timers"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable digest buffer: {e}")
+            return
+        for group_id, items in saved.items():
+            try:
+                jobs = [_job_from_json(item) for item in items]
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable digest items of {group_id}: {e}")
+                continue
+            if not jobs:
+                continue
+            group_id = int(group_id)
+            self._buffers[group_id] = jobs
+            minutes = self._settings_for(group_id).get('minutes', 0)
+            due = min(job.created_at for job in jobs) + minutes * 60
+            self._schedule(group_id, due - time.time())
+        logger.info(f"Restored {len(self)} buffered digest listing(s)")
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a half-written buffer
+        try:
+            # Listings of digests not sent yet are saved as buffered again
+            saved = {group_id: list(items) for group_id, items in self._buffers.items()}
+            for chunk in self._unsent.values():
+                saved.setdefault(chunk[0].source_group_id, []).extend(chunk)
+            if not saved:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({str(group_id): [_job_to_json(job) for job in items]
+                           for group_id, items in saved.items()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error saving digest buffer: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'buffered': len(self),
+            'groups': len(self._buffers),
+            'unsent': sum(len(items) for items in self._unsent.values()),
+            'digested': self.digested,
+            'posts': self.posts,
+        }
@@ -0,0 +1,124 @@
+import sys
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from telethon.tl.types import (
+    Photo,
+    Document,
+    InputPhoto,
+    InputDocument,
+    PhotoSize,
+    PhotoSizeProgressive,
+)
+
+
+class MediaRef(NamedTuple):
+    """Just enough of a Telegram photo/document to send it again by reference"""
+    kind: str  # 'photo' or 'document' (the TL object it came from)
+    id: int
+    access_hash: int
+    file_reference: bytes
+    size: int = 0
+    message_id: int = 0  # source message it came from, to fetch it again
+
+    @classmethod
+    def from_media(cls, media: Any, message_id: int = 0) -> Optional['MediaRef']:
+        """Build a reference from a Telethon Photo/Document, None otherwise"""
+        if isinstance(media, Photo):
+            return cls('photo', media.id, media.access_hash,
+                       media.file_reference, _photo_size(media), message_id)
+        if isinstance(media, Document):
+            return cls('document', media.id, media.access_hash,
+                       media.file_reference, media.size or 0, message_id)
+        return None
+
+    def to_input(self):
+        """Input object Telethon's send_file accepts without re-uploading"""
+        if self.kind == 'photo':
+            return InputPhoto(self.id, self.access_hash, self.file_reference)
+        return InputDocument(self.id, self.access_hash, self.file_reference)
+
+
+class ForwardJob(NamedTuple):
+    """Immutable, compact record of one processed message waiting to be sent"""
+    source_group_id: int
+    message_id: int
+    sender_id: Optional[int]
+    created_at: float
+    media_type: Optional[str]  # kind from media_types.classify_media ('photo', 'video', 'voice', ...) or None
+    media: Tuple[MediaRef, ...]
+    text: str  # rendered text, used as caption when media is present
+    action: str = 'new'  # 'new', 'edit' or 'delete'
+    original_text: str = ''  # source text before processing (for re-rendering)
+
+    @classmethod
+    def from_content(cls, content: Dict[str, Any], source_group_id: int,
+                     message_id: int = 0, sender_id: Optional[int] = None,
+                     fallback_media: Any = None, action: str = 'new',
+                     original_text: str = '') -> 'ForwardJob':
+        """Build a job from MessageProcessor output, dropping the TL objects"""
+        media_items = content.get('media') or []
+        if not isinstance(media_items, (list, tuple)):
+            media_items = [media_items]
+
+        refs = []
+        for media in media_items:
+            ref = MediaRef.from_media(media, message_id)
+            if ref is not None:
+                refs.append(ref)
+
+        # On errors process_message returns its input, whose media is the
+        # MessageMedia wrapper; fall back to the message's own photo/document
+        if not refs and content.get('media_type') and fallback_media is not None:
+            ref = MediaRef.from_media(fallback_media, message_id)
+            if ref is not None:
+                refs.append(ref)
+
+        return cls(
+            source_group_id=source_group_id,
+            message_id=message_id,
+            sender_id=sender_id,
+            created_at=time.time(),
+            media_type=content.get('media_type') if refs else None,
+            media=tuple(refs),
+            text=content.get('caption') or content.get('text') or '',
+            action=action,
+            original_text=original_text,
+        )
+
+    @classmethod
+    def deletion(cls, source_group_id: int, message_id: int) -> 'ForwardJob':
+        """Job that removes the target copy of a deleted source message"""
+        return cls(source_group_id, message_id, None, time.time(),
+                   None, (), '', action='delete')
+
+
+def _photo_size(photo: Photo) -> int:
+    """Byte size of the largest stored size of a photo (0 when unknown)"""
+    size = 0
+    for photo_size in photo.sizes or []:
+        if isinstance(photo_size, PhotoSize):
+            size = max(size, photo_size.size)
+        elif isinstance(photo_size, PhotoSizeProgressive) and photo_size.sizes:
+            size = max(size, max(photo_size.sizes))
+    return size
+
+
+def deep_sizeof(obj: Any, _seen: set = None) -> int:
+    """Approximate retained bytes of an object graph (sys.getsizeof, recursive)"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, _seen) + deep_sizeof(v, _seen)
+                    for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, _seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), _seen)
+    return size
@@ -0,0 +1,211 @@
+import time
+import heapq
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Optional
+
+from forward_job import ForwardJob
+
+
+logger = logging.getLogger(__name__)
+
+# Lower number = sent sooner. Edits and deletions keep the target in sync
+# with the source, so they go ahead of new posts (one whose post is still
+# queued is folded into that post instead).
+PRIORITY_EDIT = 0
+PRIORITY_DELETE = 0
+PRIORITY_NEW_DEFAULT = 10
+
+
+class ForwardQueue:
+    """Bounded priority queue of forward jobs with stale-message shedding
+
+    - Jobs are ordered by (priority, arrival).
+    - When full, a new job evicts the lowest-priority, oldest queued job if it
+      ranks at least as high; otherwise the producer waits up to
+      ``put_timeout`` seconds for space (backpressure) before the job is shed.
+    - New posts older than ``max_age`` seconds when dequeued are shed instead
+      of being sent late. Edits and deletions never go stale.
+    - Jobs of a held (paused) group are parked until the group is released;
+      parked jobs don't count towards ``maxsize``.
+    - An edit of a new post that is still queued replaces it and a deletion
+      cancels it, so neither overtakes the post it refers to.
+    """
+
+    def __init__(self, maxsize: int = 500, max_age: float = 1800,
+                 put_timeout: float = 5, clock: Callable[[], float] = time.time,
+                 on_shed: Optional[Callable[[ForwardJob], None]] = None):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.put_timeout = put_timeout
+        self.clock = clock
+        # Told about every job dropped without being sent
+        self.on_shed = on_shed
+
+        self._heap = []
+        self._seq = 0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+        self.enqueued = 0
+        self.dequeued = 0
+        self.shed_overflow = Counter()  # per source group
+        self.shed_stale = Counter()  # per source group
+        self._pending_stale_summary = Counter()
+        self.held_groups = set()
+        self._held = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def put(self, job: ForwardJob, priority: int = PRIORITY_NEW_DEFAULT) -> bool:
+        """Queue a job; returns False if it had to be shed"""
+        if job.action != 'new' and self._apply_to_queued(job):
+            return True
+        if len(self._heap) >= self.maxsize:
+            worst_index = self._worst_index()
+            worst_priority = self._heap[worst_index][0]
+            if priority <= worst_priority:
+                self._evict(worst_index)
+            else:
+                # Lower class than anything queued: apply backpressure
+                try:
+                    await asyncio.wait_for(self._wait_not_full(), self.put_timeout)
+                except asyncio.TimeoutError:
+                    self.shed_overflow[job.source_group_id] += 1
+                    logger.warning(
+                        f"Queue full ({self.maxsize}), shed message "
+                        f"{job.message_id} from {job.source_group_id}"
+                    )
+                    self._shed(job)
+                    return False
+
+        heapq.heappush(self._heap, (priority, self._seq, job))
+        self._seq += 1
+        self.enqueued += 1
+        self._not_empty.set()
+        if len(self._heap) >= self.maxsize:
+            self._not_full.clear()
+        return True
+
+    async def get(self) -> ForwardJob:
+        """Wait for the next job, shedding stale new posts on the way"""
+        while True:
+            while not self._heap:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+            entry = heapq.heappop(self._heap)
+            self._not_full.set()
+            job = entry[2]
+
+            if job.source_group_id in self.held_groups:
+                self._held[job.source_group_id].append(entry)
+                continue
+
+            if job.action == 'new' and self.clock() - job.created_at > self.max_age:
+                self.shed_stale[job.source_group_id] += 1
+                self._pending_stale_summary[job.source_group_id] += 1
+                self._shed(job)
+                continue
+
+            self._log_stale_summary()
+            self.dequeued += 1
+            return job
+
+    def _apply_to_queued(self, job: ForwardJob) -> bool:
+        """Fold an edit/deletion into the queued new post it refers to, if any"""
+        key = (job.source_group_id, job.message_id)
+        for entries in (self._heap, self._held.get(job.source_group_id, [])):
+            for index, (priority, seq, queued) in enumerate(entries):
+                if queued.action != 'new' or (queued.source_group_id, queued.message_id) != key:
+                    continue
+                if job.action == 'delete':
+                    entries[index] = entries[-1]
+                    entries.pop()
+                    if entries is self._heap:
+                        heapq.heapify(self._heap)
+                        self._not_full.set()
+                    logger.info(f"Cancelled queued message {job.message_id}, deleted at the source")
+                else:
+                    # Same place in line, so the edited post doesn't jump ahead
+                    entries[index] = (priority, seq, job._replace(
+                        action='new', created_at=queued.created_at))
+                    logger.info(f"Replaced queued message {job.message_id} with its edit")
+                return True
+        return False
+
+    def hold(self, group_id: int):
+        """Park a group's queued (and future) jobs until released"""
+        self.held_groups.add(group_id)
+
+    def release(self, group_id: int):
+        """Put a held group's parked jobs back in line"""
+        self.held_groups.discard(group_id)
+        for entry in self._held.pop(group_id, []):
+            heapq.heappush(self._heap, entry)
+        if self._heap:
+            self._not_empty.set()
+
+    def depth_for(self, group_id: int) -> int:
+        """Jobs waiting for one group, queued or parked"""
+        return len(self._held.get(group_id, ())) + sum(
+            1 for _, _, job in self._heap if job.source_group_id == group_id
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth (total and per priority) and shed counts"""
+        depth_by_priority = Counter(priority for priority, _, _ in self._heap)
+        return {
+            'depth': len(self._heap),
+            'held': sum(len(entries) for entries in self._held.values()),
+            'maxsize': self.maxsize,
+            'depth_by_priority': dict(sorted(depth_by_priority.items())),
+            'enqueued': self.enqueued,
+            'dequeued': self.dequeued,
+            'shed_overflow': sum(self.shed_overflow.values()),
+            'shed_stale': sum(self.shed_stale.values()),
+        }
+
+    async def _wait_not_full(self):
+        while len(self._heap) >= self.maxsize:
+            self._not_full.clear()
+            await self._not_full.wait()
+
+    def _worst_index(self) -> int:
+        """Index of the lowest-priority job, oldest first among equals"""
+        worst = 0
+        for index, (priority, seq, _) in enumerate(self._heap):
+            worst_priority, worst_seq, _ = self._heap[worst]
+            if priority > worst_priority or (priority == worst_priority and seq < worst_seq):
+                worst = index
+        return worst
+
+    def _evict(self, index: int):
+        _, _, job = self._heap[index]
+        self._heap[index] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        self.shed_overflow[job.source_group_id] += 1
+        logger.warning(
+            f"Queue full ({self.maxsize}), evicted message {job.message_id} "
+            f"from {job.source_group_id} for a higher-priority one"
+        )
+        self._shed(job)
+
+    def _shed(self, job: ForwardJob):
+        if self.on_shed is not None:
+            self.on_shed(job)
+
+    def _log_stale_summary(self):
+        """Summarise stale drops once per run of shed jobs, not per job"""
+        if not self._pending_stale_summary:
+            return
+        for group_id, count in self._pending_stale_summary.items():
+            logger.warning(
+                f"Shed {count} stale message(s) from {group_id} "
+                f"(older than {self.max_age / 60:.0f} min)"
+            )
+        self._pending_stale_summary.clear()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Differential fuzz harness for the text pipeline
+Generates adversarial supplier captions and runs each through a frozen copy
+of the original MessageProcessor text pipeline and through the current one.
+The copy is given the configured rules explicitly and reads no config itself.
+Any difference is shrunk to a small reproducer; every case also records how
+much faster the current pipeline is.
+
+Usage:
+    python fuzz_harness.py                      # 2000 cases, seed 1
+    python fuzz_harness.py --cases 20000 --seed 7 --report fuzz_report.jsonl
+
+Groups with their own pricing table, or an output template other than a
+different delivery line, are skipped: the reference only knows the two-case
+watch/non-watch pricing and the original layout. Group cases are also run
+through the prefixed path (the "[letter] " label process_message adds).
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from config import (
+    PRICE_UPDATE_RULES,
+    LEGACY_PRICE_UPDATE_RULES,
+    KEYWORD_REPLACEMENTS,
+    WATCH_KEYWORDS,
+    PRICING_LOGIC,
+    PRICING_TABLE,
+    OUTPUT_TEMPLATE,
+    DELIVERY_MESSAGE,
+    SOURCE_GROUP_SETTINGS,
+    CONTACT_INFO
+)
+from message_processor import MessageProcessor
+from metrics import percentiles
+
+
+logger = logging.getLogger(__name__)
+
+
+# Reference pipeline: the original MessageProcessor text path, frozen.
+# Do not optimise or "fix" anything below; it defines correct output. It
+# reads no config: the rules it applies are passed in (see reference_rules).
+
+LEGACY_PRICE_PATTERNS = [
+    r'£(\d+(?:\.\d{2})?)',
+    r'\$(\d+(?:\.\d{2})?)',
+    r'(\d+(?:\.\d{2})?)\s*(?:taka|tk|৳)',
+    r'৳\s*(\d+(?:\.\d{2})?)',
+    r'(\d+(?:\.\d{2})?)\s*rs',
+    r'(\d+(?:\.\d{2})?)\s*rupees?',
+    r'price[:\s]*(\d+(?:\.\d{2})?)',
+    r'cost[:\s]*(\d+(?:\.\d{2})?)',
+]
+
+
+def legacy_pricing(text: str, group_settings: dict, rules: Dict[str, Any]) -> str:
+    watch_keywords = group_settings.get('watch_keywords', rules['watch_keywords'])
+    pricing_logic = group_settings.get('pricing_logic', rules['pricing_logic'])
+    text_lower = text.lower()
+    is_watch = any(keyword in text_lower for keyword in watch_keywords)
+
+    for pattern in LEGACY_PRICE_PATTERNS:
+        for match in re.finditer(pattern, text):
+            original_price = float(match.group(1))
+            if is_watch:
+                new_price = original_price + pricing_logic['watch_multiplier']
+            else:
+                new_price = (original_price * pricing_logic['non_watch_multiplier']
+                             + pricing_logic['non_watch_delivery_fee'])
+            if pricing_logic.get('round_up_prices', True):
+                new_price = math.ceil(new_price)
+
+            if '£' in match.group(0) or '$' in match.group(0):
+                text = text.replace(match.group(0), f"£{int(new_price)}")
+            else:
+                text = text.replace(match.group(0), f"৳{int(new_price)}")
+    return text
+
+
+def legacy_update_prices(text: str, rules: Dict[str, Any]) -> str:
+    for old_price, new_price in rules['price_update_rules'].items():
+        text = re.sub(rf'\b{old_price}\b', new_price, text)
+        text = re.sub(rf'৳\s*{old_price}', f'৳ {new_price}', text)
+        text = re.sub(rf'{old_price}\s*taka', f'{new_price} taka', text)
+        text = re.sub(rf'{old_price}\s*tk', f'{new_price} tk', text)
+        text = re.sub(rf'£{old_price}', f'£{new_price}', text)
+        text = re.sub(rf'\${old_price}', f'${new_price}', text)
+    return text
+
+
+def legacy_keywords(text: str, rules: Dict[str, Any]) -> str:
+    for old_keyword, new_keyword in rules['keyword_replacements'].items():
+        text = re.compile(re.escape(old_keyword), re.IGNORECASE).sub(new_keyword, text)
+    return text
+
+
+def legacy_modify_text(text: str, source_group_id: Optional[int], rules: Dict[str, Any]) -> str:
+    if not text:
+        return text
+    group_settings = rules['group_settings'].get(source_group_id, {}) if source_group_id else {}
+
+    text = legacy_pricing(text, group_settings, rules)
+    text = legacy_update_prices(text, rules)
+    text = legacy_keywords(text, rules)
+
+    delivery_message = group_settings.get('delivery_message', rules['delivery_message']) if group_settings else rules['delivery_message']
+    contact_info = rules['contact_info']
+    if delivery_message.lower() not in text.lower():
+        text += f"\n\n{delivery_message}"
+    if contact_info.get('auto_add_contact', True):
+        if contact_info['contact_text'].lower() not in text.lower():
+            text += f"\n\n{contact_info['contact_text']}\n{contact_info['telegram_link']}"
+    return text
+
+
+def legacy_process_text(text: str, source_group_id: Optional[int], rules: Dict[str, Any]) -> str:
+    """The original process_message text path: letter prefix, then modify_text"""
+    if source_group_id and text:
+        group_settings = rules['group_settings'].get(source_group_id, {})
+        text = f"[{group_settings.get('letter', f'G{source_group_id}')}] {text}"
+    return legacy_modify_text(text, source_group_id, rules)
+
+
+def reference_rules() -> Dict[str, Any]:
+    """The configured rules, as the reference should apply them
+
+    The old PRICE_UPDATE_RULES rewrites are only part of the expected output
+    while LEGACY_PRICE_UPDATE_RULES keeps them on.
+    """
+    return {
+        'price_update_rules': PRICE_UPDATE_RULES if LEGACY_PRICE_UPDATE_RULES else {},
+        'keyword_replacements': KEYWORD_REPLACEMENTS,
+        'watch_keywords': WATCH_KEYWORDS,
+        'pricing_logic': PRICING_LOGIC,
+        'delivery_message': DELIVERY_MESSAGE,
+        'contact_info': CONTACT_INFO,
+        'group_settings': SOURCE_GROUP_SETTINGS,
+    }
+
+
+# Adversarial captions
+
+AMOUNTS = ['0', '5', '25', '30', '50', '85', '90', '99.99', '12.5', '0.01', '1000',
+           '1000.00', '500', '123456789', '007', '৫০০', '٣٠']  # Bengali and Arabic digits
+PRICE_FORMS = ['£{}', '${}', '৳{}', '৳ {}', '{} tk', '{}tk', '{} taka', '{}৳', '{} rs',
+               '{}rs', '{} rupees', '{} rupee', 'price: {}', 'Price {}', 'price{}',
+               'cost: {}', 'cost{}', '£{}.{}']
+WORDS = ['Rolex', 'watch', 'Casio', 'bag', 'apple', 'tagline', 'AAA', 'AAAA', 'aaa', 'old',
+         'OLD', 'bold', 'Golden', 'cheap', 'cheapest', 'NEW STOCK', 'new stock', 'NEW  STOCK',
+         'দাম', 'টাকা', 'ঘড়ি', '🔥', '✅', 'Shoes', 'size', 'per', 'pcs', '-', '/', '|',
+         'prices', 'costly', 'rs.', 'Quick Free delivery 3/4 days', 'For orders message here',
+         'https://t.me/BFSshopuk']
+SEPARATORS = [' ', '  ', '\n', '', ', ', ' - ', '\t']
+
+
+def generate_caption(rng: random.Random) -> str:
+    """One adversarial caption: prices, keywords and separators mixed at random"""
+    parts = []
+    for _ in range(rng.randint(1, 14)):
+        roll = rng.random()
+        if roll < 0.45:
+            form = rng.choice(PRICE_FORMS)
+            amounts = [rng.choice(AMOUNTS) for _ in range(form.count('{}'))]
+            parts.append(form.format(*amounts))
+        elif roll < 0.9:
+            parts.append(rng.choice(WORDS))
+        else:
+            # Adjacent prices with no separator at all
+            parts.append(''.join(rng.choice(PRICE_FORMS).split('{}')[0] + rng.choice(AMOUNTS)
+                                 for _ in range(rng.randint(2, 4))))
+    text = ''.join(part + rng.choice(SEPARATORS) for part in parts).strip()
+    if rng.random() < 0.03:
+        # Very long caption, the shape of a supplier's full price list
+        text = '\n'.join([text] * rng.randint(50, 400))
+    return text
+
+
+# Divergence minimisation
+
+def minimise(text: str, fails: Callable[[str], bool]) -> str:
+    """Smallest text (delta debugging over chunks, then characters) that still fails"""
+    granularity = 2
+    while len(text) >= 2:
+        chunk = math.ceil(len(text) / granularity)
+        for start in range(0, len(text), chunk):
+            candidate = text[:start] + text[start + chunk:]
+            if candidate and fails(candidate):
+                text = candidate
+                granularity = max(granularity - 1, 2)
+                break
+        else:
+            if chunk == 1:
+                break
+            granularity = min(granularity * 2, len(text))
+    return text
+
+
+def _timed(function: Callable[[], str], repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        function()
+        best = min(best, time.perf_counter_ns() - started)
+    return best
+
+
+def _reference_layout(template: Dict[str, Any]) -> bool:
+    """Whether the reference appends delivery and contact the way this template does"""
+    return (template.get('separator', '\n\n') == '\n\n'
+            and template.get('contact') == '{contact_text}\n{telegram_link}')
+
+
+def fuzz_groups() -> List[Optional[int]]:
+    """Ungrouped path plus every group the reference can price and lay out"""
+    if PRICING_TABLE is not None or not _reference_layout(OUTPUT_TEMPLATE):
+        return []
+    return [None] + [group_id for group_id, settings in SOURCE_GROUP_SETTINGS.items()
+                     if not settings.get('pricing_table')
+                     and _reference_layout(settings.get('output_template', OUTPUT_TEMPLATE))]
+
+
+def prefixed_groups() -> List[int]:
+    """Groups whose posts start with the original "[letter] " prefix"""
+    # process_message only prefixes a truthy group id
+    return [group_id for group_id in fuzz_groups() if group_id
+            and SOURCE_GROUP_SETTINGS[group_id].get('output_template', OUTPUT_TEMPLATE).get('prefix') == '[{letter}] ']
+
+
+def run_fuzz(cases: int = 2000, seed: int = 1, processor: MessageProcessor = None,
+             repeat: int = 3, report_path: Optional[str] = None) -> Dict[str, Any]:
+    """Compare reference and current pipeline on generated captions
+
+    Group cases take the prefixed path (as process_message does) half the time.
+    """
+    processor = processor or MessageProcessor()
+    groups = fuzz_groups()
+    if not groups:
+        raise ValueError("A custom PRICING_TABLE or OUTPUT_TEMPLATE is configured; nothing to compare against")
+    with_prefix = set(prefixed_groups())
+    rules = reference_rules()
+    rng = random.Random(seed)
+    divergences = []
+    speedups = []
+    prefixed_cases = 0
+    report = open(report_path, 'w', encoding='utf-8') if report_path else None
+
+    try:
+        for case in range(cases):
+            text = generate_caption(rng)
+            group_id = rng.choice(groups)
+            prefixed = group_id in with_prefix and rng.random() < 0.5
+            reference = legacy_process_text if prefixed else legacy_modify_text
+            prefixed_cases += prefixed
+
+            def expected_for(t: str) -> str:
+                return reference(t, group_id, rules)
+
+            def actual_for(t: str) -> str:
+                return processor.modify_text(t, group_id, prefixed)
+
+            expected = expected_for(text)
+            actual = actual_for(text)
+
+            legacy_ns = _timed(lambda: expected_for(text), repeat)
+            current_ns = _timed(lambda: actual_for(text), repeat)
+            speedup = legacy_ns / max(current_ns, 1)
+            speedups.append(speedup)
+
+            record = {'case': case, 'group': group_id, 'prefixed': prefixed, 'length': len(text),
+                      'speedup': round(speedup, 2), 'ok': expected == actual}
+            if expected != actual:
+                reproducer = minimise(text, lambda t: expected_for(t) != actual_for(t))
+                record.update({
+                    'input': reproducer,
+                    'expected': expected_for(reproducer),
+                    'actual': actual_for(reproducer),
+                })
+                divergences.append(record)
+                logger.error(f"Divergence in case {case} (group {group_id}, "
+                             f"prefixed {prefixed}): {reproducer!r}")
+            if report:
+                report.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        if report:
+            report.close()
+
+    return {
+        'cases': cases,
+        'prefixed_cases': prefixed_cases,
+        'divergences': divergences,
+        'speedup': {key: round(value, 2) for key, value in percentiles(speedups, (10, 50, 90)).items()},
+        'slowest_speedup': round(min(speedups), 2) if speedups else None,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    arguments = sys.argv[1:]
+
+    def option(name: str, default: Optional[str] = None) -> Optional[str]:
+        if name in arguments:
+            return arguments[arguments.index(name) + 1]
+        return default
+
+    result = run_fuzz(
+        cases=int(option('--cases', '2000')),
+        seed=int(option('--seed', '1')),
+        report_path=option('--report'),
+    )
+    print(f"🧪 {result['cases']} cases ({result['prefixed_cases']} prefixed), "
+          f"{len(result['divergences'])} divergences")
+    print(f"   Speedup vs reference: {result['speedup']}, slowest case {result['slowest_speedup']}x")
+    for divergence in result['divergences'][:10]:
+        print(f"❌ {divergence['input']!r}\n   expected {divergence['expected']!r}\n"
+              f"   actual   {divergence['actual']!r}")
+    sys.exit(1 if result['divergences'] else 0)
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from forward_job import MediaRef
+
+
+class MediaHandleCache:
+    """Target-side handles of source media that was already sent once
+
+    Keyed by the source media's stable (kind, id); the value is the
+    InputPhoto/InputDocument of our own copy in the target, which can be
+    sent again without downloading or uploading a byte. Entries expire
+    after ``ttl`` seconds (file references do too) and the least recently
+    used entry is evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl: float = 6 * 3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(ref: MediaRef) -> Tuple[str, int]:
+        return ref.kind, ref.id
+
+    def get(self, ref: MediaRef) -> Optional[Any]:
+        """Cached handle for a source media, counting the transfer it saves"""
+        key = self._key(ref)
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() - entry[1] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # A download plus an upload of the file
+        self.bytes_saved += 2 * ref.size
+        return entry[0]
+
+    def put(self, ref: MediaRef, handle: Any):
+        key = self._key(ref)
+        self._entries[key] = (handle, self.clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, ref: MediaRef):
+        self._entries.pop(self._key(ref), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'evictions': self.evictions,
+            'bytes_saved': self.bytes_saved,
+        }
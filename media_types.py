@@ -0,0 +1,53 @@
+from typing import Any, Optional, Tuple
+from telethon.tl.types import (
+    Document,
+    DocumentAttributeAnimated,
+    DocumentAttributeAudio,
+    DocumentAttributeSticker,
+    DocumentAttributeVideo,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+    Photo,
+)
+
+
+# Kinds Telegram can group into one album (sent in a single request);
+# voice notes, round videos, GIFs and stickers always go out alone
+ALBUM_MEDIA_TYPES = ('photo', 'video', 'audio', 'document')
+
+
+def document_kind(document: Document) -> str:
+    """Kind of a document by its attributes, strongest first
+
+    A GIF also carries a video attribute and a sticker an image size, so
+    the order of the checks matters.
+    """
+    attributes = {type(attribute): attribute for attribute in document.attributes or ()}
+    if DocumentAttributeSticker in attributes:
+        return 'sticker'
+    if DocumentAttributeAnimated in attributes:
+        return 'animation'
+    video = attributes.get(DocumentAttributeVideo)
+    if video is not None:
+        return 'video_note' if video.round_message else 'video'
+    audio = attributes.get(DocumentAttributeAudio)
+    if audio is not None:
+        return 'voice' if audio.voice else 'audio'
+    return 'document'
+
+
+def classify_media(media: Any) -> Optional[Tuple[str, Any]]:
+    """(kind, Photo/Document) of a message's media or a bare Photo/Document
+
+    None for anything that isn't a file: web page previews, polls,
+    locations, and photos or documents that are no longer available.
+    """
+    if isinstance(media, MessageMediaPhoto):
+        media = media.photo
+    elif isinstance(media, MessageMediaDocument):
+        media = media.document
+    if isinstance(media, Photo):
+        return 'photo', media
+    if isinstance(media, Document):
+        return document_kind(media), media
+    return None
@@ -0,0 +1,133 @@
+import time
+import sqlite3
+import logging
+from typing import List, NamedTuple, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class ForwardedMessage(NamedTuple):
+    """One source message and the target message it was forwarded as"""
+    source_group_id: int
+    source_message_id: int
+    target_message_id: int
+    original_text: str
+    posted_text: str
+    media_type: Optional[str]
+    forwarded_at: float
+    scheduled_for: Optional[float] = None  # publication time while still scheduled
+
+
+class MessageMap:
+    """Persistent source → target message map (SQLite)
+
+    Lets edits and deletions in a source group be mirrored to the target and
+    lets listings be re-rendered later from their original text.
+    """
+
+    def __init__(self, path: str = 'forwarded_messages.db'):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS forwarded ('
+            ' source_group_id INTEGER NOT NULL,'
+            ' source_message_id INTEGER NOT NULL,'
+            ' target_message_id INTEGER NOT NULL,'
+            ' original_text TEXT NOT NULL,'
+            ' posted_text TEXT NOT NULL,'
+            ' media_type TEXT,'
+            ' forwarded_at REAL NOT NULL,'
+            ' scheduled_for REAL,'
+            ' PRIMARY KEY (source_group_id, source_message_id))'
+        )
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(forwarded)')]
+        if 'scheduled_for' not in columns:
+            # Maps written before scheduled pacing existed
+            self._conn.execute('ALTER TABLE forwarded ADD COLUMN scheduled_for REAL')
+        self._conn.commit()
+
+    def record(self, source_group_id: int, source_message_id: int,
+               target_message_id: int, original_text: str, posted_text: str,
+               media_type: Optional[str] = None, scheduled_for: Optional[float] = None):
+        """Remember where a source message was forwarded to"""
+        self._conn.execute(
+            'INSERT OR REPLACE INTO forwarded VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (source_group_id, source_message_id, target_message_id,
+             original_text, posted_text, media_type, time.time(), scheduled_for)
+        )
+        self._conn.commit()
+
+    def get(self, source_group_id: int, source_message_id: int) -> Optional[ForwardedMessage]:
+        """Look up the target copy of a source message"""
+        row = self._conn.execute(
+            'SELECT * FROM forwarded WHERE source_group_id = ? AND source_message_id = ?',
+            (source_group_id, source_message_id)
+        ).fetchone()
+        return ForwardedMessage(*row) if row else None
+
+    def update_text(self, source_group_id: int, source_message_id: int,
+                    posted_text: str, original_text: Optional[str] = None):
+        """Store the text the target message now shows"""
+        if original_text is None:
+            self._conn.execute(
+                'UPDATE forwarded SET posted_text = ? '
+                'WHERE source_group_id = ? AND source_message_id = ?',
+                (posted_text, source_group_id, source_message_id)
+            )
+        else:
+            self._conn.execute(
+                'UPDATE forwarded SET posted_text = ?, original_text = ? '
+                'WHERE source_group_id = ? AND source_message_id = ?',
+                (posted_text, original_text, source_group_id, source_message_id)
+            )
+        self._conn.commit()
+
+    def mark_published(self, source_group_id: int, source_message_id: int,
+                       target_message_id: int):
+        """A scheduled post went out: it now lives under its published id"""
+        self._conn.execute(
+            'UPDATE forwarded SET target_message_id = ?, scheduled_for = NULL '
+            'WHERE source_group_id = ? AND source_message_id = ?',
+            (target_message_id, source_group_id, source_message_id)
+        )
+        self._conn.commit()
+
+    def scheduled(self) -> List[ForwardedMessage]:
+        """Entries still waiting for Telegram to publish them, soonest first"""
+        rows = self._conn.execute(
+            'SELECT * FROM forwarded WHERE scheduled_for IS NOT NULL ORDER BY scheduled_for'
+        ).fetchall()
+        return [ForwardedMessage(*row) for row in rows]
+
+    def remove(self, source_group_id: int, source_message_id: int):
+        """Forget a source message (after its target copy was deleted)"""
+        self._conn.execute(
+            'DELETE FROM forwarded WHERE source_group_id = ? AND source_message_id = ?',
+            (source_group_id, source_message_id)
+        )
+        self._conn.commit()
+
+    def page_after(self, key: Optional[Tuple[int, int]] = None,
+                   limit: int = 500) -> List[ForwardedMessage]:
+        """Next page of entries in (group, message id) order, after ``key``"""
+        if key is None:
+            rows = self._conn.execute(
+                'SELECT * FROM forwarded '
+                'ORDER BY source_group_id, source_message_id LIMIT ?',
+                (limit,)
+            ).fetchall()
+        else:
+            rows = self._conn.execute(
+                'SELECT * FROM forwarded '
+                'WHERE (source_group_id, source_message_id) > (?, ?) '
+                'ORDER BY source_group_id, source_message_id LIMIT ?',
+                (key[0], key[1], limit)
+            ).fetchall()
+        return [ForwardedMessage(*row) for row in rows]
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM forwarded').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,94 @@
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Iterable, List
+
+
+def percentiles(values: Iterable[float], points=(50, 95, 99)) -> Dict[str, float]:
+    """Nearest-rank percentiles of a sample, e.g. {'p50': .., 'p99': ..}"""
+    ordered = sorted(values)
+    if not ordered:
+        return {f'p{point}': 0.0 for point in points}
+    last = len(ordered) - 1
+    return {
+        f'p{point}': ordered[min(last, int(len(ordered) * point / 100))]
+        for point in points
+    }
+
+
+class PipelineMetrics:
+    """Per-group counters, rates and forward latency for the running bot
+
+    Rates are computed over the last ``window`` seconds from bounded deques of
+    event times; latencies keep the most recent ``latency_samples`` values.
+    """
+
+    def __init__(self, window: float = 300, latency_samples: int = 1000,
+                 clock: Callable[[], float] = time.time):
+        self.window = window
+        self.clock = clock
+        self.latency_samples = latency_samples
+        self.started_at = clock()
+
+        self.received = Counter()
+        self.forwarded = Counter()
+        self.failed = Counter()
+        self._received_times = {}
+        self._forwarded_times = {}
+        self._latencies = deque(maxlen=latency_samples)
+        self._caches = {}
+
+    def record_received(self, group_id: int):
+        self.received[group_id] += 1
+        self._times(self._received_times, group_id).append(self.clock())
+
+    def record_forwarded(self, group_id: int, latency: float):
+        self.forwarded[group_id] += 1
+        self._times(self._forwarded_times, group_id).append(self.clock())
+        self._latencies.append(latency)
+
+    def record_failed(self, group_id: int):
+        self.failed[group_id] += 1
+
+    def register_cache(self, name: str, stats: Callable[[], Dict[str, Any]]):
+        """Report a cache's stats() (with 'hits' and 'misses') in snapshots"""
+        self._caches[name] = stats
+
+    def rate_per_minute(self, times: deque) -> float:
+        cutoff = self.clock() - self.window
+        recent = sum(1 for t in times if t >= cutoff)
+        return recent * 60 / min(self.window, max(self.clock() - self.started_at, 1))
+
+    def group_rates(self, group_ids: List[int]) -> Dict[int, Dict[str, float]]:
+        """Received/forwarded per minute for each group"""
+        return {
+            group_id: {
+                'received_per_min': round(self.rate_per_minute(
+                    self._received_times.get(group_id, ())), 2),
+                'forwarded_per_min': round(self.rate_per_minute(
+                    self._forwarded_times.get(group_id, ())), 2),
+                'received': self.received[group_id],
+                'forwarded': self.forwarded[group_id],
+                'failed': self.failed[group_id],
+            }
+            for group_id in group_ids
+        }
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """Forward latency percentiles in seconds (receive → sent)"""
+        return {key: round(value, 3) for key, value in percentiles(self._latencies).items()}
+
+    def cache_hit_rates(self) -> Dict[str, Dict[str, Any]]:
+        rates = {}
+        for name, stats in self._caches.items():
+            cache_stats = stats()
+            lookups = cache_stats.get('hits', 0) + cache_stats.get('misses', 0)
+            cache_stats['hit_rate'] = round(cache_stats.get('hits', 0) / lookups, 3) if lookups else 0.0
+            rates[name] = cache_stats
+        return rates
+
+    def _times(self, table: dict, group_id: int) -> deque:
+        times = table.get(group_id)
+        if times is None:
+            # Enough for a busy group's whole window without growing forever
+            times = table[group_id] = deque(maxlen=5000)
+        return times
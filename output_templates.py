@@ -0,0 +1,50 @@
+from typing import Any, Dict
+
+
+class OutputTemplate:
+    """Layout of a forwarded post, compiled once per group
+
+    A post is ``prefix + body``, then the delivery line and the contact block,
+    each preceded by ``separator`` and left out when the body already
+    contains it (case-insensitive; the contact block is recognised by its
+    first line). ``render`` lowercases the body once and joins the parts in
+    a single allocation.
+    """
+
+    def __init__(self, definition: Dict[str, Any], letter: str = '', name: str = '',
+                 contact_info: Dict[str, Any] = None):
+        contact_info = contact_info or {}
+        self.prefix = (definition.get('prefix') or '').format(letter=letter, name=name)
+        self.delivery = definition.get('delivery') or ''
+        self.separator = definition.get('separator', '\n\n')
+        contact = definition.get('contact') or ''
+        if not contact_info.get('auto_add_contact', True):
+            contact = ''
+        self.contact = contact.format(
+            contact_text=contact_info.get('contact_text', ''),
+            telegram_link=contact_info.get('telegram_link', ''),
+            shop_name=contact_info.get('shop_name', ''),
+        )
+
+        self._delivery_lower = self.delivery.lower()
+        self._contact_marker = self.contact.split('\n', 1)[0].lower()
+        # Adding the delivery line can itself satisfy the contact check
+        self._contact_in_delivery = bool(self._contact_marker) and (
+            self._contact_marker in (self.separator + self.delivery).lower()
+        )
+
+    def render(self, body: str, prefixed: bool = True) -> str:
+        """Full post text for an already re-priced body ('' stays '')"""
+        if not body:
+            return body
+        lowered = body.lower()
+        parts = [self.prefix, body] if prefixed else [body]
+        with_delivery = bool(self.delivery) and self._delivery_lower not in lowered
+        if with_delivery:
+            parts.append(self.separator)
+            parts.append(self.delivery)
+        if (self._contact_marker and self._contact_marker not in lowered
+                and not (with_delivery and self._contact_in_delivery)):
+            parts.append(self.separator)
+            parts.append(self.contact)
+        return ''.join(parts)
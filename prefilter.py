@@ -0,0 +1,111 @@
+import re
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, NamedTuple, Optional, Pattern
+
+
+logger = logging.getLogger(__name__)
+
+# Anything MessageProcessor would price (same forms, only the first digit needed)
+PRICE_PATTERN = re.compile(
+    r'£\d|\$\d|৳\s*\d|\d\s*(?:taka|tk|৳|rs|rupee)|price[:\s]*\d|cost[:\s]*\d'
+)
+
+
+class RuleSet(NamedTuple):
+    """One group's pre-filter rules, ready to run"""
+    min_length: int
+    require_price: bool
+    require_media: bool
+    senders: frozenset  # empty: everyone
+    blocklist: Optional[Pattern]
+    merges_posts: bool  # text and photos may arrive as separate posts
+
+
+def compile_rules(rules: Dict[str, Any], merges_posts: bool = False) -> Optional[RuleSet]:
+    """RuleSet for a rules dict from config, None if no rule is on"""
+    phrases = [phrase for phrase in rules.get('blocklist') or () if phrase]
+    rule_set = RuleSet(
+        min_length=rules.get('min_length') or 0,
+        require_price=bool(rules.get('require_price')),
+        require_media=bool(rules.get('require_media')),
+        senders=frozenset(rules.get('senders') or ()),
+        # Longest phrases first so the alternation never stops at a prefix
+        blocklist=re.compile(
+            '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True)),
+            re.IGNORECASE
+        ) if phrases else None,
+        merges_posts=merges_posts,
+    )
+    if not (rule_set.min_length or rule_set.require_price or rule_set.require_media
+            or rule_set.senders or rule_set.blocklist):
+        return None
+    return rule_set
+
+
+def reject_reason(rules: RuleSet, text: str, has_media: bool,
+                  sender_id: Optional[int]) -> Optional[str]:
+    """Name of the first rule a post breaks (cheapest checks first), None if it passes"""
+    if rules.senders and sender_id not in rules.senders:
+        return 'sender'
+    if not has_media and len(text.strip()) < rules.min_length:
+        return 'min_length'
+    # A split post's other half may still arrive: photos without text, or
+    # priced text without photos, are left to the coalescer
+    if text and rules.require_price and PRICE_PATTERN.search(text) is None:
+        return 'price'
+    if (rules.require_media and not has_media
+            and not (rules.merges_posts and PRICE_PATTERN.search(text))):
+        return 'media'
+    if rules.blocklist is not None and rules.blocklist.search(text):
+        return 'blocklist'
+    return None
+
+
+class Prefilter:
+    """Drops chatter ("sold", greetings, stickers, ...) before any work is done
+
+    Each group's rules come from ``rules_for(group_id)`` and are compiled on
+    first use. Counts rejections per rule and per group.
+    """
+
+    def __init__(self, rules_for: Callable[[int], Dict[str, Any]],
+                 merges_posts: Callable[[int], bool] = lambda group_id: False):
+        self.rules_for = rules_for
+        self.merges_posts = merges_posts
+        self._compiled: Dict[int, Optional[RuleSet]] = {}
+        self.passed = 0
+        self.rejected = Counter()  # per rule
+        self.rejected_groups = Counter()  # per source group
+
+    def allows(self, message: Any, group_id: int) -> bool:
+        """Whether a new source message is worth processing"""
+        if group_id not in self._compiled:
+            self._compiled[group_id] = compile_rules(
+                self.rules_for(group_id), self.merges_posts(group_id)
+            )
+        rules = self._compiled[group_id]
+        if rules is None:
+            self.passed += 1
+            return True
+
+        # Raw fields only: message.text would re-render entities
+        has_media = bool(
+            message.photo or message.video or (message.document and not message.sticker)
+        )
+        reason = reject_reason(rules, message.message or '', has_media, message.sender_id)
+        if reason is None:
+            self.passed += 1
+            return True
+        self.rejected[reason] += 1
+        self.rejected_groups[group_id] += 1
+        logger.debug(f"Pre-filter dropped {message.id} from {group_id} ({reason})")
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'passed': self.passed,
+            'rejected': sum(self.rejected.values()),
+            'by_rule': dict(self.rejected),
+            'by_group': dict(self.rejected_groups),
+        }
@@ -0,0 +1,112 @@
+import re
+import math
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class CategoryPricing:
+    """Price bands of one category compiled into parallel sorted arrays
+
+    Band ``i`` applies to original prices up to and including
+    ``breakpoints[i]``; the last band is open-ended. A lookup is one
+    ``bisect`` however many bands there are.
+    """
+
+    __slots__ = ('name', 'matcher', 'breakpoints', 'multipliers', 'adds')
+
+    def __init__(self, name: str, keywords: Sequence[str], bands: List[Dict[str, Any]]):
+        self.name = name
+        # Substring match on lowercased text, same as the legacy keyword check
+        self.matcher = (
+            re.compile('|'.join(re.escape(keyword.lower()) for keyword in keywords))
+            if keywords else None
+        )
+
+        ordered = sorted(
+            bands, key=lambda band: math.inf if band.get('up_to') is None else band['up_to']
+        )
+        if not ordered or ordered[-1].get('up_to') is not None:
+            raise ValueError(f"Pricing category '{name}' needs an open-ended last band (up_to: None)")
+        self.breakpoints = [
+            math.inf if band.get('up_to') is None else float(band['up_to']) for band in ordered
+        ]
+        self.multipliers = [float(band.get('multiplier', 1)) for band in ordered]
+        self.adds = [float(band.get('add', 0)) for band in ordered]
+
+    def price(self, original: float) -> float:
+        index = bisect_left(self.breakpoints, original)
+        return original * self.multipliers[index] + self.adds[index]
+
+    def price_many(self, originals: Sequence[float]) -> List[float]:
+        """Evaluate every price of a message in one pass"""
+        breakpoints, multipliers, adds = self.breakpoints, self.multipliers, self.adds
+        if len(breakpoints) == 1:
+            multiplier, add = multipliers[0], adds[0]
+            return [original * multiplier + add for original in originals]
+        result = []
+        for original in originals:
+            index = bisect_left(breakpoints, original)
+            result.append(original * multipliers[index] + adds[index])
+        return result
+
+
+class PricingTable:
+    """Compiled per-category pricing: category detection plus band lookup
+
+    Categories are tried in declared order; the first whose keywords appear
+    in the text wins. A category without keywords is the fallback.
+    """
+
+    def __init__(self, definition: Dict[str, Any]):
+        self.round_up = definition.get('round_up_prices', True)
+        self.categories = [
+            CategoryPricing(category['name'], category.get('keywords', ()), category['bands'])
+            for category in definition['categories']
+        ]
+        self._keyword_categories = [c for c in self.categories if c.matcher is not None]
+        fallbacks = [c for c in self.categories if c.matcher is None]
+        if not fallbacks:
+            raise ValueError("Pricing table needs a fallback category without keywords")
+        self.fallback = fallbacks[0]
+        self._by_name = {category.name: category for category in self.categories}
+
+    def category_for(self, text: str) -> CategoryPricing:
+        text_lower = text.lower()
+        for category in self._keyword_categories:
+            if category.matcher.search(text_lower):
+                return category
+        return self.fallback
+
+    def category(self, name: str) -> Optional[CategoryPricing]:
+        return self._by_name.get(name)
+
+    def finish(self, price: float) -> float:
+        """Apply rounding (up to whole pounds) if enabled"""
+        return math.ceil(price) if self.round_up else price
+
+    def price_many(self, category: CategoryPricing, originals: Sequence[float]) -> List[float]:
+        if self.round_up:
+            return [math.ceil(price) for price in category.price_many(originals)]
+        return category.price_many(originals)
+
+
+def legacy_pricing_definition(pricing_logic: Dict[str, Any],
+                              watch_keywords: Sequence[str]) -> Dict[str, Any]:
+    """Pricing table equivalent to the two-case PRICING_LOGIC dict"""
+    return {
+        'round_up_prices': pricing_logic.get('round_up_prices', True),
+        'categories': [
+            {
+                'name': 'watches',
+                'keywords': list(watch_keywords),
+                'bands': [{'up_to': None, 'multiplier': 1,
+                           'add': pricing_logic['watch_multiplier']}],
+            },
+            {
+                'name': 'default',
+                'bands': [{'up_to': None,
+                           'multiplier': pricing_logic['non_watch_multiplier'],
+                           'add': pricing_logic['non_watch_delivery_fee']}],
+            },
+        ],
+    }
@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Functions of these modules (the forward pipeline, in the order a message
+# passes through it) get their own section in the CPU report
+STAGE_MODULES = (
+    'dedup_store.py', 'prefilter.py', 'message_processor.py', 'pricing_table.py',
+    'output_templates.py', 'media_types.py', 'forward_job.py', 'coalescer.py',
+    'best_offer.py', 'digest.py', 'forward_queue.py', 'send_lanes.py',
+    'scheduled_pacing.py', 'media_cache.py',
+)
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack from a background thread
+
+    Nothing runs while the profiler is stopped. While started, a daemon thread
+    records the loop thread's stack every ``interval`` seconds; the result is
+    written in collapsed-stack format (one ``frame;frame;frame count`` per
+    line), which flamegraph tools read directly.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self._target_thread_id = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self.started_at = time.time()
+        self._target_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample_loop, name='cpu-profiler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stage_breakdown(self) -> Counter:
+        """Inclusive samples per function of the pipeline modules"""
+        stages = Counter()
+        for stack, count in self.stacks.items():
+            seen = set()
+            for frame in stack.split(';'):
+                if frame not in seen and any(module in frame for module in STAGE_MODULES):
+                    stages[frame] += count
+                    seen.add(frame)
+        return stages
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a sleeping task"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.lags = []
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def summary(self) -> dict:
+        if not self.lags:
+            return {'samples': 0}
+        lags = sorted(self.lags)
+        return {
+            'samples': len(lags),
+            'mean_ms': round(sum(lags) / len(lags) * 1000, 2),
+            'p99_ms': round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            'max_ms': round(lags[-1] * 1000, 2),
+        }
+
+
+class ProfilingControls:
+    """On-demand CPU profiling, memory snapshots and loop-lag reporting
+
+    Triggered with signals (``kill -USR1 <pid>`` toggles the CPU profile,
+    ``kill -USR2 <pid>`` takes a memory snapshot) or by calling the methods
+    directly. All output goes to timestamped files in ``output_dir``.
+    """
+
+    def __init__(self, output_dir: str = 'profiles', sample_interval: float = 0.005,
+                 traceback_frames: int = 10):
+        self.output_dir = output_dir
+        self.cpu = SamplingProfiler(sample_interval)
+        self.loop_lag = LoopLagMonitor()
+        self.traceback_frames = traceback_frames
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def install_signal_handlers(self) -> bool:
+        """Hook SIGUSR1/SIGUSR2 on the running loop (Unix only)"""
+        if not hasattr(signal, 'SIGUSR1'):
+            return False
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGUSR1, self.toggle_cpu_profile)
+        loop.add_signal_handler(signal.SIGUSR2, self.memory_snapshot)
+        logger.info(
+            f"Profiling controls ready: kill -USR1 {os.getpid()} toggles CPU profile, "
+            f"kill -USR2 {os.getpid()} takes a memory snapshot"
+        )
+        return True
+
+    def toggle_cpu_profile(self) -> Optional[str]:
+        if self.cpu.running:
+            return self.stop_cpu_profile()
+        self.start_cpu_profile()
+        return None
+
+    def start_cpu_profile(self):
+        """Start sampling the loop thread and measuring loop lag"""
+        self.cpu.start()
+        self.loop_lag.start()
+        logger.info("CPU profiling started")
+
+    def stop_cpu_profile(self) -> Optional[str]:
+        """Stop sampling and write the profile; returns the report path"""
+        if not self.cpu.running:
+            return None
+        self.cpu.stop()
+        self.loop_lag.stop()
+        duration = time.time() - self.cpu.started_at
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = _timestamp()
+        stacks_path = os.path.join(self.output_dir, f'cpu-{stamp}.collapsed')
+        with open(stacks_path, 'w') as f:
+            for stack, count in self.cpu.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        report_path = os.path.join(self.output_dir, f'cpu-{stamp}.txt')
+        samples = max(self.cpu.samples, 1)
+        with open(report_path, 'w') as f:
+            f.write(f"Duration: {duration:.1f}s, samples: {self.cpu.samples}\n")
+            f.write(f"Event-loop lag: {self.loop_lag.summary()}\n\n")
+            f.write("Pipeline stages (inclusive % of samples):\n")
+            for frame, count in self.cpu.stage_breakdown().most_common():
+                f.write(f"  {count / samples * 100:6.2f}%  {frame}\n")
+            f.write("\nHottest leaf frames:\n")
+            leaves = Counter()
+            for stack, count in self.cpu.stacks.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            for frame, count in leaves.most_common(25):
+                f.write(f"  {count / samples * 100:6.2f}%  {frame}\n")
+
+        logger.info(f"CPU profile written to {report_path} and {stacks_path}")
+        return report_path
+
+    def memory_snapshot(self) -> Optional[str]:
+        """Take a tracemalloc snapshot and diff it against the previous one
+
+        The first call only starts tracing (tracemalloc costs nothing until
+        then); every later call writes the top allocations and the growth
+        since the previous snapshot.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+            self._last_snapshot = self._take_snapshot()
+            logger.info("Memory tracing started; next snapshot will show growth")
+            return None
+
+        snapshot = self._take_snapshot()
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f'memory-{_timestamp()}.txt')
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, 'w') as f:
+            f.write(f"Traced: {current / 1024:.0f} KiB (peak {peak / 1024:.0f} KiB)\n\n")
+            f.write("Top allocations:\n")
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f"  {stat}\n")
+            if self._last_snapshot is not None:
+                f.write("\nGrowth since previous snapshot:\n")
+                for stat in snapshot.compare_to(self._last_snapshot, 'lineno')[:25]:
+                    f.write(f"  {stat}\n")
+        self._last_snapshot = snapshot
+        logger.info(f"Memory snapshot written to {path}")
+        return path
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        # Same filters on every snapshot, or the diff shows tracemalloc itself
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+
+    def stop_memory_tracing(self):
+        """Stop tracemalloc so it no longer slows allocations down"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._last_snapshot = None
+        logger.info("Memory tracing stopped")
+
+    def shutdown(self):
+        """Flush a running CPU profile and stop all tracing"""
+        self.stop_cpu_profile()
+        if tracemalloc.is_tracing():
+            self.stop_memory_tracing()
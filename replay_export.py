@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Replay a Telegram Desktop chat export through the MessageProcessor
+Streams the export's messages one by one (memory stays flat no matter how
+big the file is) and writes one JSONL line per message with the original
+and rewritten prices and the pricing category the message fell into.
+
+Usage:
+    python replay_export.py result.json --group S --out report.jsonl
+    python replay_export.py result.json --with-text   # include both texts
+
+--group takes a group id, letter or name; without it the chat id from the
+export header is used (Telegram exports it without the -100 prefix).
+Only single-chat exports (Export chat history) are supported.
+"""
+
+import sys
+import json
+import time
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterator, Optional, Tuple
+from config import SOURCE_GROUP_SETTINGS
+from message_processor import MessageProcessor
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+MESSAGES_KEY = '"messages"'
+# Far above any real message; an object still undecodable after this much
+# text is malformed, not cut by a chunk boundary
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+def iter_export_messages(path: str, chunk_size: int = CHUNK_SIZE,
+                         max_message_size: int = MAX_MESSAGE_SIZE) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Header fields and a lazy iterator over the messages of an export
+
+    Reads the file in chunks and decodes one message object at a time with
+    ``JSONDecoder.raw_decode``; only the current chunk and the message being
+    decoded are ever held in memory. A malformed object is skipped once
+    ``max_message_size`` characters past it (or the rest of the file) still
+    don't decode, resuming at the first ``{`` on a later line.
+    """
+    f = open(path, encoding='utf-8')
+    decoder = json.JSONDecoder()
+    buffer = ''
+
+    # Everything before "messages": [ is the (small) chat header
+    while True:
+        index = buffer.find(MESSAGES_KEY)
+        if index != -1:
+            bracket = buffer.find('[', index)
+            if bracket != -1:
+                break
+        chunk = f.read(chunk_size)
+        if not chunk:
+            f.close()
+            raise ValueError(f"No messages array found in {path}")
+        buffer += chunk
+
+    header_text = buffer[:index].rstrip().rstrip(',')
+    header = json.loads(header_text + '}') if header_text.strip() != '{' else {}
+    buffer = buffer[bracket + 1:]
+
+    def messages() -> Iterator[Dict[str, Any]]:
+        nonlocal buffer
+        position = 0
+        eof = False
+        try:
+            while True:
+                # Skip separators between objects
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer) and buffer[position] == ']':
+                    return
+                try:
+                    if position >= len(buffer):
+                        raise ValueError('need more data')
+                    message, position = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    if eof and position >= len(buffer):
+                        raise ValueError(f"Truncated export: {path}")
+                    # At the end of the file no more data can complete it either
+                    if eof or len(buffer) - position > max_message_size:
+                        line_end = buffer.find('\n', position + 1)
+                        resume = buffer.find('{', line_end) if line_end != -1 else -1
+                        skipped = (resume if resume != -1 else len(buffer)) - position
+                        logger.warning(f"Skipping {skipped} characters of malformed JSON in {path}")
+                        if eof and resume == -1:
+                            return
+                        buffer = buffer[resume:] if resume != -1 else ''
+                        position = 0
+                        continue
+                    # Object spans the chunk boundary: drop what's consumed, read on
+                    buffer = buffer[position:]
+                    position = 0
+                    chunk = f.read(chunk_size)
+                    eof = not chunk
+                    buffer += chunk
+                    continue
+                yield message
+        finally:
+            f.close()
+
+    return header, messages()
+
+
+def flatten_text(text: Any) -> str:
+    """Export text is a string or a list of strings and entity dicts"""
+    if isinstance(text, str):
+        return text
+    if isinstance(text, list):
+        return ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+    return ''
+
+
+def resolve_group(argument: Optional[str], header: Dict[str, Any]) -> Optional[int]:
+    """Group id from --group (id, letter or name) or from the export header"""
+    if argument:
+        for group_id, settings in SOURCE_GROUP_SETTINGS.items():
+            if argument.lower() in (str(group_id), settings.get('letter', '').lower(),
+                                    settings.get('name', '').lower()):
+                return group_id
+        try:
+            return int(argument)
+        except ValueError:
+            raise ValueError(f"Unknown group: {argument}")
+    if 'id' in header:
+        # Supergroups and channels are exported without the -100 prefix
+        chat_id = int(header['id'])
+        return chat_id if chat_id < 0 else int(f'-100{chat_id}')
+    return None
+
+
+def replay(path: str, out_path: str, group_argument: Optional[str] = None,
+           with_text: bool = False, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Run every message of an export through the processor, write a JSONL report"""
+    header, messages = iter_export_messages(path, chunk_size)
+    group_id = resolve_group(group_argument, header)
+    processor = MessageProcessor()
+    logger.info(f"Replaying '{header.get('name', path)}' as group {group_id}")
+
+    stats = {'messages': 0, 'priced': 0, 'categories': Counter(), 'skipped': 0}
+    started = time.perf_counter()
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for message in messages:
+            text = flatten_text(message.get('text'))
+            if message.get('type') != 'message' or not text:
+                stats['skipped'] += 1
+                continue
+
+            content = processor.process_message({'text': text}, group_id)
+            rewritten = content.get('caption') or content.get('text') or ''
+            original_prices = processor.extract_prices(text)
+            category = processor.price_category(text, group_id)
+
+            record = {
+                'id': message.get('id'),
+                'date': message.get('date'),
+                'category': category,
+                'original_prices': original_prices,
+                'rewritten_prices': processor.extract_prices(rewritten),
+            }
+            if with_text:
+                record['original'] = text
+                record['rewritten'] = rewritten
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+            stats['messages'] += 1
+            stats['priced'] += bool(original_prices)
+            stats['categories'][category] += 1
+            if stats['messages'] % 10000 == 0:
+                elapsed = time.perf_counter() - started
+                logger.info(f"{stats['messages']} messages, {stats['messages'] / elapsed:.0f} msg/s")
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    stats['categories'] = dict(stats['categories'])
+    stats['seconds'] = round(elapsed, 2)
+    stats['messages_per_second'] = round(stats['messages'] / elapsed)
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    arguments = sys.argv[1:]
+
+    def option(name: str, default: Optional[str] = None) -> Optional[str]:
+        if name in arguments:
+            return arguments[arguments.index(name) + 1]
+        return default
+
+    stats = replay(
+        arguments[0],
+        option('--out', 'replay_report.jsonl'),
+        group_argument=option('--group'),
+        with_text='--with-text' in arguments,
+    )
+    print(f"✅ Replay complete: {stats}")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Bulk re-pricing of already-forwarded listings
+Re-renders every forwarded listing from its original text with the current
+pricing rules and edits only the target messages whose caption changed.
+
+Stop the bot before running this (both use the same session file).
+
+Usage:
+    python reprice.py            # resume from the last checkpoint
+    python reprice.py --dry-run  # only report what would change
+    python reprice.py --restart  # ignore the checkpoint and start over
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError, MessageNotModifiedError
+from config import (
+    API_ID,
+    API_HASH,
+    PHONE,
+    TARGET_GROUP_ID,
+    MESSAGE_MAP_PATH,
+    REPRICE_EDITS_PER_SECOND,
+    REPRICE_BATCH_SIZE,
+    REPRICE_CHECKPOINT_PATH
+)
+from message_map import ForwardedMessage, MessageMap
+from scheduled_pacing import edit_options
+from message_processor import MessageProcessor
+
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """Paces edits at up to ``max_rate`` per second, backing off on flood waits
+
+    The rate halves after every FloodWaitError and creeps back up by 10% after
+    each batch that completed without one, so a long run settles just below
+    the rate Telegram tolerates.
+    """
+
+    def __init__(self, max_rate: float, clock=time.monotonic, sleep=asyncio.sleep):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.clock = clock
+        self.sleep = sleep
+        self._next_slot = 0.0
+
+    async def wait(self):
+        """Wait for the next edit slot"""
+        now = self.clock()
+        if self._next_slot > now:
+            await self.sleep(self._next_slot - now)
+            now = self._next_slot
+        self._next_slot = now + 1 / self.rate
+
+    def back_off(self):
+        self.rate = max(self.rate / 2, 0.05)
+
+    def recover(self):
+        self.rate = min(self.rate * 1.1, self.max_rate)
+
+
+class Repricer:
+    """Walks the message map and re-renders captions with the current rules"""
+
+    def __init__(self, client, target_peer, message_map: MessageMap,
+                 processor: MessageProcessor = None,
+                 checkpoint_path: str = REPRICE_CHECKPOINT_PATH,
+                 edits_per_second: float = REPRICE_EDITS_PER_SECOND,
+                 batch_size: int = REPRICE_BATCH_SIZE,
+                 dry_run: bool = False):
+        self.client = client
+        self.target_peer = target_peer
+        self.message_map = message_map
+        self.processor = processor or MessageProcessor()
+        self.checkpoint_path = checkpoint_path
+        self.limiter = AdaptiveRateLimiter(edits_per_second)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.stats = {
+            'scanned': 0,
+            'changed': 0,
+            'edited': 0,
+            'unchanged': 0,
+            'failed': 0,
+            'flood_waits': 0,
+        }
+
+    def render(self, forwarded: ForwardedMessage) -> str:
+        """Caption the listing would get if it were forwarded today"""
+        content = self.processor.process_message(
+            {'text': forwarded.original_text}, forwarded.source_group_id
+        )
+        return content.get('caption') or content.get('text') or ''
+
+    def diff_batch(self, batch: List[ForwardedMessage]) -> List[Tuple[ForwardedMessage, str]]:
+        """Render a batch and keep only the listings whose caption changed"""
+        changed = []
+        for forwarded in batch:
+            if not forwarded.original_text:
+                continue  # Nothing to re-render (media without caption)
+            new_text = self.render(forwarded)
+            if new_text != forwarded.posted_text:
+                changed.append((forwarded, new_text))
+        return changed
+
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        """Re-price every listing, resuming from the checkpoint unless told not to"""
+        key = None if restart else self._load_checkpoint()
+        if key:
+            logger.info(f"Resuming re-pricing after {key}")
+        started = time.monotonic()
+
+        while True:
+            batch = self.message_map.page_after(key, self.batch_size)
+            if not batch:
+                break
+            changed = self.diff_batch(batch)
+            self.stats['scanned'] += len(batch)
+            self.stats['changed'] += len(changed)
+
+            flood_free = True
+            for forwarded, new_text in changed:
+                if self.dry_run:
+                    logger.info(
+                        f"Would edit {forwarded.target_message_id}: "
+                        f"{forwarded.posted_text!r} -> {new_text!r}"
+                    )
+                    continue
+                flood_free &= await self._edit(forwarded, new_text)
+
+            key = (batch[-1].source_group_id, batch[-1].source_message_id)
+            if not self.dry_run:
+                self._save_checkpoint(key)
+                if flood_free:
+                    self.limiter.recover()
+            logger.info(
+                f"Re-priced {self.stats['scanned']}/{len(self.message_map)} listings, "
+                f"{self.stats['edited']} edited, rate {self.limiter.rate:.2f}/s"
+            )
+
+        if not self.dry_run:
+            self._clear_checkpoint()
+        self.stats['seconds'] = round(time.monotonic() - started, 1)
+        return self.stats
+
+    async def _edit(self, forwarded: ForwardedMessage, new_text: str) -> bool:
+        """Edit one target message; returns False if a flood wait was hit"""
+        flood_free = True
+        while True:
+            await self.limiter.wait()
+            try:
+                await self.client.edit_message(
+                    self.target_peer, forwarded.target_message_id, new_text,
+                    **edit_options(forwarded)
+                )
+                self.stats['edited'] += 1
+            except FloodWaitError as e:
+                self.stats['flood_waits'] += 1
+                self.limiter.back_off()
+                flood_free = False
+                logger.warning(f"Flood wait of {e.seconds}s, slowing to {self.limiter.rate:.2f}/s")
+                await asyncio.sleep(e.seconds)
+                continue
+            except MessageNotModifiedError:
+                self.stats['unchanged'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"Failed to edit {forwarded.target_message_id}: {e}")
+                return flood_free
+
+            self.message_map.update_text(
+                forwarded.source_group_id, forwarded.source_message_id, new_text
+            )
+            return flood_free
+
+    def _load_checkpoint(self) -> Optional[Tuple[int, int]]:
+        try:
+            with open(self.checkpoint_path) as f:
+                return tuple(json.load(f)['last_key'])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint: {e}")
+            return None
+
+    def _save_checkpoint(self, key: Tuple[int, int]):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_key': list(key), 'stats': self.stats}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _clear_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+
+async def main():
+    dry_run = '--dry-run' in sys.argv
+    restart = '--restart' in sys.argv
+
+    message_map = MessageMap(MESSAGE_MAP_PATH)
+    client = TelegramClient('session_name', API_ID, API_HASH)
+    await client.start(phone=PHONE)
+    try:
+        target_peer = await client.get_input_entity(TARGET_GROUP_ID)
+        repricer = Repricer(client, target_peer, message_map, dry_run=dry_run)
+        stats = await repricer.run(restart=restart)
+        print(f"✅ Re-pricing complete: {stats}")
+    finally:
+        await client.disconnect()
+        message_map.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    asyncio.run(main())
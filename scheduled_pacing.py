@@ -0,0 +1,110 @@
+import math
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from message_map import ForwardedMessage
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram keeps at most this many scheduled messages per chat
+SCHEDULED_LIMIT = 100
+
+
+def schedule_date(slot: float) -> datetime:
+    return datetime.fromtimestamp(slot, timezone.utc)
+
+
+def edit_options(forwarded: ForwardedMessage) -> Dict[str, Any]:
+    """Extra edit_message arguments: a post that is still scheduled is edited as such"""
+    if forwarded.scheduled_for:
+        return {'schedule': schedule_date(forwarded.scheduled_for)}
+    return {}
+
+
+class ScheduledPost(NamedTuple):
+    slot: int
+    source_group_id: Optional[int]  # None if the map doesn't know the post
+    source_message_id: Optional[int]
+    target_message_id: int  # id in the chat's scheduled list
+
+
+class PostTimeline:
+    """Publication slots of our posts to the target
+
+    Each post gets the first slot at least its group's delay after the
+    previous post (whole seconds, at least one apart, never in the past).
+    A post whose slot is ``min_lead`` seconds or more ahead is handed to
+    Telegram with a schedule date and tracked here until it is published;
+    closer slots are simply waited for. Telegram holds at most ``limit``
+    scheduled messages per chat, beyond that posts are waited for too.
+    """
+
+    def __init__(self, min_lead: float = 10, limit: int = SCHEDULED_LIMIT,
+                 clock: Callable[[], float] = time.time):
+        self.min_lead = min_lead
+        self.limit = limit
+        self.clock = clock
+        self.last_slot = 0
+        self._posts: Dict[int, ScheduledPost] = {}  # by slot
+        self.scheduled = 0
+        self.published = 0
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def reserve(self, delay: float) -> int:
+        """Claim the next slot for a post"""
+        self.last_slot = max(math.ceil(self.clock()),
+                             self.last_slot + max(math.ceil(delay), 1))
+        return self.last_slot
+
+    def should_schedule(self, slot: int) -> bool:
+        return slot - self.clock() >= self.min_lead and len(self._posts) < self.limit
+
+    def add(self, slot: int, source_group_id: int, source_message_id: int,
+            target_message_id: int):
+        self._posts[slot] = ScheduledPost(slot, source_group_id, source_message_id,
+                                          target_message_id)
+        self.scheduled += 1
+
+    def remove(self, slot: int):
+        self._posts.pop(slot, None)
+
+    def pop_published(self, date: datetime) -> Optional[ScheduledPost]:
+        """The post due at ``date``, which Telegram just published"""
+        post = self._posts.pop(int(date.timestamp()), None)
+        if post is not None:
+            self.published += 1
+        return post
+
+    def rebuild(self, scheduled_messages: Iterable[Any], known: List[ForwardedMessage]):
+        """Restore the timeline from the target's scheduled messages after a restart"""
+        by_target = {forwarded.target_message_id: forwarded for forwarded in known}
+        self._posts.clear()
+        for message in scheduled_messages:
+            slot = int(message.date.timestamp())
+            forwarded = by_target.get(message.id)
+            if forwarded is None and slot in self._posts:
+                continue  # Another item of an album already in the timeline
+            self._posts[slot] = ScheduledPost(
+                slot,
+                forwarded.source_group_id if forwarded else None,
+                forwarded.source_message_id if forwarded else None,
+                message.id
+            )
+            self.last_slot = max(self.last_slot, slot)
+        logger.info(f"Restored {len(self._posts)} scheduled post(s), last at {self.last_slot}")
+
+    def upcoming(self) -> List[ScheduledPost]:
+        return [self._posts[slot] for slot in sorted(self._posts)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self._posts),
+            'scheduled': self.scheduled,
+            'published': self.published,
+            'seconds_to_last': max(0, round(self.last_slot - self.clock())),
+        }
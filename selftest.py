@@ -0,0 +1,92 @@
+import time
+import random
+import logging
+from typing import Any, Dict, Iterator, List
+
+from telethon.tl.types import Photo, PhotoSize
+
+from capabilities import benchmark_upload_encrypt, detect_capabilities, log_capabilities
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob
+from message_map import MessageMap
+from metrics import percentiles
+
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS = ['Casio watch', 'Rolex Submariner', 'Gucci wallet', 'LV bag', 'Nike Air Max',
+            'Hublot Big Bang', 'Prada shoes', 'Omega Seamaster', 'Dior perfume', 'AAA belt']
+EXTRAS = ['NEW STOCK', 'Boxed', 'with receipt', 'all sizes', 'cheap', 'old stock clearance',
+          'DM for more pics', '']
+
+
+def synthetic_messages(count: int, group_ids: List[int], seed: int = 1) -> Iterator[Dict[str, Any]]:
+    """Supplier-like messages: processor input plus group and media kind"""
+    rng = random.Random(seed)
+    for message_id in range(1, count + 1):
+        price = rng.choice(['£{}', '${}', '{} tk', 'price: {}', '৳{}']).format(
+            rng.randint(10, 900))
+        text = f"{rng.choice(PRODUCTS)} {price} {rng.choice(EXTRAS)}".strip()
+        with_photo = rng.random() < 0.7
+        yield {
+            'group_id': rng.choice(group_ids),
+            'message_id': message_id,
+            'text': text,
+            'photo': _synthetic_photo(message_id) if with_photo else None,
+        }
+
+
+def _synthetic_photo(photo_id: int) -> Photo:
+    return Photo(
+        id=photo_id, access_hash=photo_id * 7919, file_reference=b'\x01' * 24,
+        date=None, sizes=[PhotoSize('y', 1280, 1280, 150000)], dc_id=4,
+    )
+
+
+async def run_selftest(messages: int = 1000) -> bool:
+    """Benchmark crypto, upload encryption and the send path against the fake client
+
+    Returns True when the host runs the fast configuration (cryptg + uvloop).
+    """
+    # Imported here: bot.py imports this module for --selftest
+    from bot import MessageForwarderBot
+    from config import SOURCE_GROUP_IDS
+
+    capabilities = detect_capabilities(benchmark_megabytes=4)
+    client = FakeTelegramClient(record_calls=False)
+    capabilities['upload_encrypt_mb_s'] = round(await benchmark_upload_encrypt(client, megabytes=8), 1)
+    log_capabilities(capabilities)
+
+    bot = MessageForwarderBot()
+    bot.client = client
+    bot.target_peer = 'selftest-target'
+    bot.pacing_enabled = False
+    bot.message_map = MessageMap(':memory:')
+
+    # Per-message info logs would dominate the measurement
+    logging.getLogger('bot').setLevel(logging.WARNING)
+    latencies = []
+    started = time.perf_counter()
+    for message in synthetic_messages(messages, SOURCE_GROUP_IDS or [0]):
+        message_started = time.perf_counter()
+        content = bot.processor.process_message({
+            'text': message['text'],
+            'photo': message['photo'],
+        }, message['group_id'])
+        job = ForwardJob.from_content(content, message['group_id'],
+                                      message_id=message['message_id'])
+        await bot.forward_to_target(job)
+        latencies.append(time.perf_counter() - message_started)
+    elapsed = time.perf_counter() - started
+    bot.message_map.close()
+
+    latency_ms = {key: round(value * 1000, 3) for key, value in percentiles(latencies).items()}
+    fast = capabilities['crypto_backend'] == 'cryptg' and capabilities['event_loop'] == 'uvloop'
+    print("🧪 Self-test results")
+    print("=" * 50)
+    for key, value in capabilities.items():
+        print(f"   {key}: {value}")
+    print(f"   send path: {messages / elapsed:.0f} msg/s over {messages} messages "
+          f"({client.sent_count} sent), latency {latency_ms} ms")
+    print("✅ Fast configuration" if fast else "⚠️  Not the fast configuration (install cryptg and uvloop)")
+    return fast
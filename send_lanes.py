@@ -0,0 +1,160 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from forward_job import ForwardJob
+from forward_queue import ForwardQueue, PRIORITY_NEW_DEFAULT
+from metrics import percentiles
+
+
+logger = logging.getLogger(__name__)
+
+FAST = 'fast'
+BULK = 'bulk'
+# Media types whose transfers can be arbitrarily large
+BULK_MEDIA_TYPES = ('video', 'document')
+
+
+def job_size(job: ForwardJob) -> int:
+    """Bytes of media a job sends (0 when unknown or text only)"""
+    return sum(ref.size for ref in job.media)
+
+
+class LaneStats:
+    """Throughput and latency of one send lane
+
+    Rates are over the last ``window`` seconds; latency (post received →
+    sent) and send time (time spent in the send itself) keep the most recent
+    ``samples`` values.
+    """
+
+    def __init__(self, window: float = 300, samples: int = 1000,
+                 clock: Callable[[], float] = time.time):
+        self.window = window
+        self.clock = clock
+        self.started_at = clock()
+        self.sent = 0
+        self.failed = 0
+        self.bytes = 0
+        self._latencies = deque(maxlen=samples)
+        self._send_times = deque(maxlen=samples)
+        self._recent = deque(maxlen=5000)  # (finished at, bytes)
+
+    def record(self, job: ForwardJob, send_time: float, ok: bool):
+        if not ok:
+            self.failed += 1
+            return
+        now = self.clock()
+        size = job_size(job)
+        self.sent += 1
+        self.bytes += size
+        self._latencies.append(now - job.created_at)
+        self._send_times.append(send_time)
+        self._recent.append((now, size))
+
+    def stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        cutoff = now - self.window
+        recent = [size for finished, size in self._recent if finished >= cutoff]
+        span = min(self.window, max(now - self.started_at, 1))
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'per_min': round(len(recent) * 60 / span, 2),
+            'bytes_per_sec': round(sum(recent) / span),
+            'latency': {key: round(value, 3) for key, value in percentiles(self._latencies).items()},
+            'send_time': {key: round(value, 3) for key, value in percentiles(self._send_times).items()},
+        }
+
+
+class SendLanes:
+    """Fast lane for text and small media, a worker pool for large transfers
+
+    ``dispatch`` runs fast-lane jobs right away on the caller's task (the
+    forward worker) and queues large videos and documents for ``workers``
+    parallel bulk workers, so a big upload never holds up the posts behind
+    it. Edits and deletions of a post still in the bulk lane are kept back
+    and applied right after it is sent. ``workers=0`` sends everything on
+    the fast lane.
+    """
+
+    def __init__(self, handler: Callable[[ForwardJob], Awaitable[bool]],
+                 workers: int = 2, threshold: int = 5 * 1024 * 1024,
+                 queue: ForwardQueue = None, clock: Callable[[], float] = time.time):
+        self.handler = handler
+        self.workers = workers
+        self.threshold = threshold
+        self.queue = queue or ForwardQueue()
+        self.queue.on_shed = self._forget
+        self.lanes = {FAST: LaneStats(clock=clock), BULK: LaneStats(clock=clock)}
+        self.active = 0
+        # (group, message) of bulk posts not sent yet -> edits/deletions waiting for them
+        self._followups: Dict[Tuple[int, int], List[ForwardJob]] = {}
+        self._tasks = []
+
+    def lane_for(self, job: ForwardJob) -> str:
+        if not self.workers or job.action != 'new' or not job.media:
+            return FAST
+        size = job_size(job)
+        if size >= self.threshold:
+            return BULK
+        # Unknown size: only photos are known to stay small
+        if not size and job.media_type in BULK_MEDIA_TYPES:
+            return BULK
+        return FAST
+
+    async def dispatch(self, job: ForwardJob, priority: int = PRIORITY_NEW_DEFAULT):
+        """Send a job on its lane; returns once it is sent or handed to the pool"""
+        key = (job.source_group_id, job.message_id)
+        if job.action != 'new' and key in self._followups:
+            self._followups[key].append(job)
+            return
+        if self.lane_for(job) == BULK:
+            self._followups[key] = []
+            if await self.queue.put(job, priority):
+                logger.info(f"Message {job.message_id} ({job_size(job)} bytes) sent on the bulk lane")
+            return
+        await self._run(FAST, job)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._bulk_worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {lane: lane_stats.stats() for lane, lane_stats in self.lanes.items()}
+        stats[BULK].update({'queued': len(self.queue), 'active': self.active,
+                            'workers': self.workers})
+        return stats
+
+    async def _bulk_worker(self):
+        while True:
+            job = await self.queue.get()
+            self.active += 1
+            try:
+                await self._run(BULK, job)
+            finally:
+                self.active -= 1
+            for followup in self._followups.pop((job.source_group_id, job.message_id), ()):
+                await self._run(FAST, followup)
+
+    async def _run(self, lane: str, job: ForwardJob):
+        started = time.perf_counter()
+        try:
+            ok = await self.handler(job)
+        except Exception as e:
+            logger.error(f"Error sending on the {lane} lane: {e}")
+            ok = False
+        self.lanes[lane].record(job, time.perf_counter() - started, ok)
+
+    def _forget(self, job: ForwardJob):
+        """A bulk post was shed: its held edits have nothing to apply to"""
+        followups = self._followups.pop((job.source_group_id, job.message_id), None)
+        if followups:
+            logger.info(f"Dropped {len(followups)} edit(s) of shed message {job.message_id}")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Soak test for slow leaks and latency drift
+Replays synthetic supplier messages through the whole pipeline (pre-filter,
+dedup, processing, coalescing, queue, send lanes, message map) against the
+offline fake client. Messages are spread over hours of simulated time; every
+``--sample-minutes`` of simulated time RSS, live objects by type and forward
+latency percentiles are sampled. The run fails if memory, object counts or
+p99 latency drift past the thresholds between the end of warm-up and the end
+of the run.
+
+Usage:
+    python soak.py                                     # 1,000,000 messages over 24 simulated hours
+    python soak.py --messages 200000 --hours 6 --report soak_report.jsonl
+"""
+
+import os
+import gc
+import sys
+import json
+import random
+import asyncio
+import logging
+import tempfile
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from telethon.tl.types import Message, MessageMediaPhoto, PeerChannel, PeerUser
+
+from coalescer import PostCoalescer
+from dedup_store import DedupStore
+from fake_client import FakeTelegramClient
+from message_map import MessageMap
+from selftest import synthetic_messages
+
+
+logger = logging.getLogger(__name__)
+
+SENDERS = 40  # distinct suppliers posting in the synthetic groups
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # Not Linux: peak RSS is the best the standard library offers
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def object_counts() -> Counter:
+    """Live gc-tracked objects by type name"""
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def soak_messages(count: int, group_ids: List[int], hours: float,
+                  seed: int = 1) -> Iterator[Tuple[int, Message]]:
+    """(group id, Telethon message) from synthetic_messages, over ``hours`` of simulated time"""
+    rng = random.Random(seed)
+    rate = count / (hours * 3600)
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for data in synthetic_messages(count, group_ids, seed):
+        date += timedelta(seconds=rng.expovariate(rate))
+        yield data['group_id'], Message(
+            id=data['message_id'], peer_id=PeerChannel(abs(data['group_id'])), date=date,
+            message=data['text'], from_id=PeerUser(rng.randrange(1, SENDERS + 1)),
+            media=MessageMediaPhoto(photo=data['photo']) if data['photo'] else None,
+        )
+
+
+def detect_drift(samples: List[Dict[str, Any]], warmup: float = 0.2,
+                 max_rss_growth_mb: float = 64, max_p99_ratio: float = 2.0,
+                 max_object_growth: int = 20000) -> List[str]:
+    """Threshold breaches between the end of warm-up and the end of the run"""
+    start = int(len(samples) * warmup)
+    if len(samples) - start < 2:
+        return []
+    window = max(1, min(3, (len(samples) - start) // 2))
+    baseline, final = samples[start:start + window], samples[-window:]
+
+    failures = []
+    rss_growth = final[-1]['rss_mb'] - statistics.median(s['rss_mb'] for s in baseline)
+    if rss_growth > max_rss_growth_mb:
+        failures.append(f"RSS grew {rss_growth:.1f} MB (limit {max_rss_growth_mb} MB)")
+
+    # Sub-millisecond p99s are noise, not a trend
+    baseline_p99 = max(statistics.median(s['latency_ms']['p99'] for s in baseline), 1.0)
+    final_p99 = statistics.median(s['latency_ms']['p99'] for s in final)
+    if final_p99 / baseline_p99 > max_p99_ratio:
+        failures.append(f"p99 latency went from {baseline_p99:.1f} ms to {final_p99:.1f} ms "
+                        f"(limit x{max_p99_ratio})")
+
+    first, last = samples[start]['objects'], samples[-1]['objects']
+    for name, count in last.items():
+        growth = count - first.get(name, 0)
+        if growth > max_object_growth:
+            failures.append(f"{growth} more live {name} objects (limit {max_object_growth})")
+    return failures
+
+
+async def run_soak(messages: int = 1_000_000, hours: float = 24, sample_minutes: float = 30,
+                   batch: int = 200, seed: int = 1, coalesce_window: float = 0.01,
+                   report_path: Optional[str] = None, **thresholds) -> Dict[str, Any]:
+    """Feed the pipeline and sample it; ``thresholds`` go to detect_drift"""
+    # Imported here: bot.py imports selftest, which this module imports
+    from bot import MessageForwarderBot
+    from config import SOURCE_GROUP_IDS
+
+    group_ids = SOURCE_GROUP_IDS or [0]
+    bot = MessageForwarderBot(group_ids=group_ids)
+    bot.client = FakeTelegramClient(record_calls=False)
+    bot.target_peer = 'soak-target'
+    bot.me_id = 0
+    bot.pacing_enabled = False
+    bot.coalescer = PostCoalescer(bot.best_offer.add, lambda group_id: coalesce_window)
+    # Real files: SQLite's page cache is bounded, an in-memory database is not
+    workdir = tempfile.TemporaryDirectory()
+    bot.dedup = DedupStore(os.path.join(workdir.name, 'dedup.db'))
+    bot.message_map = MessageMap(os.path.join(workdir.name, 'map.db'))
+    bot.lanes.start()
+    # Per-message info logs would dominate the run
+    for name in ('bot', 'coalescer', 'best_offer', 'digest', 'send_lanes', 'forward_queue'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    samples = []
+    report = open(report_path, 'w', encoding='utf-8') if report_path else None
+    started_at = next_sample = None
+    fed = 0
+
+    async def drain():
+        # Same path as the forward worker, run inline so sampling sees an idle pipeline
+        while len(bot.queue) or len(bot.coalescer) or len(bot.best_offer) or len(bot.digest):
+            if not len(bot.queue):
+                await asyncio.sleep(coalesce_window)
+                continue
+            job = await bot.queue.get()
+            await bot.lanes.dispatch(job, bot._job_priority(job))
+
+    def sample(date: datetime):
+        gc.collect()
+        counts = object_counts()
+        record = {
+            'sim_hours': round((date - started_at).total_seconds() / 3600, 2),
+            'messages': fed,
+            'sent': bot.client.sent_count,
+            'rss_mb': round(rss_mb(), 1),
+            'latency_ms': {key: round(value * 1000, 3)
+                           for key, value in bot.metrics.latency_percentiles().items()},
+            'queue_depth': len(bot.queue),
+            'objects': dict(counts.most_common(25)),
+            'total_objects': sum(counts.values()),
+        }
+        samples.append(record)
+        if report:
+            report.write(json.dumps(record) + '\n')
+            report.flush()
+        logger.info(f"[{record['sim_hours']}h] {fed} messages, RSS {record['rss_mb']} MB, "
+                    f"p99 {record['latency_ms']['p99']} ms, {record['total_objects']} objects")
+
+    try:
+        for group_id, message in soak_messages(messages, group_ids, hours, seed):
+            if started_at is None:
+                started_at = message.date
+                next_sample = started_at + timedelta(minutes=sample_minutes)
+            await bot.handle_source_message(message, group_id)
+            fed += 1
+            if fed % batch == 0:
+                await drain()
+            if message.date >= next_sample:
+                await drain()
+                sample(message.date)
+                next_sample += timedelta(minutes=sample_minutes)
+        await drain()
+        if started_at is not None:
+            sample(message.date)
+
+        failures = detect_drift(samples, **thresholds)
+        summary = {'messages': fed, 'sent': bot.client.sent_count, 'samples': len(samples),
+                   'failures': failures}
+        if report:
+            report.write(json.dumps({'summary': summary}) + '\n')
+        return summary
+    finally:
+        if report:
+            report.close()
+        bot.lanes.stop()
+        bot.dedup.close()
+        bot.message_map.close()
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    arguments = sys.argv[1:]
+
+    def option(name: str, default: Optional[str] = None) -> Optional[str]:
+        if name in arguments:
+            return arguments[arguments.index(name) + 1]
+        return default
+
+    result = asyncio.run(run_soak(
+        messages=int(option('--messages', '1000000')),
+        hours=float(option('--hours', '24')),
+        sample_minutes=float(option('--sample-minutes', '30')),
+        seed=int(option('--seed', '1')),
+        report_path=option('--report'),
+        max_rss_growth_mb=float(option('--max-rss-growth-mb', '64')),
+        max_p99_ratio=float(option('--max-p99-ratio', '2')),
+        max_object_growth=int(option('--max-object-growth', '20000')),
+    ))
+    print(f"🧪 Soak: {result['messages']} messages, {result['sent']} sent, "
+          f"{result['samples']} samples")
+    for failure in result['failures']:
+        print(f"❌ {failure}")
+    if not result['failures']:
+        print("✅ No drift beyond thresholds")
+    sys.exit(1 if result['failures'] else 0)
@@ -0,0 +1,37 @@
+import time
+import logging
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Measures how long each step of the startup phase takes"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.steps = []
+
+    @contextmanager
+    def step(self, name: str):
+        """Time a named startup step (works around awaits as well)"""
+        step_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - step_started) * 1000
+            self.steps.append((name, elapsed_ms))
+            logger.info(f"Startup step '{name}' took {elapsed_ms:.1f} ms")
+
+    @property
+    def total_ms(self) -> float:
+        """Milliseconds since the startup phase began"""
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def report(self):
+        """Log a summary of the whole startup phase"""
+        logger.info("Startup phase summary:")
+        for name, elapsed_ms in self.steps:
+            logger.info(f"  {name:<24} {elapsed_ms:8.1f} ms")
+        logger.info(f"  {'total':<24} {self.total_ms:8.1f} ms")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Sharded multi-process mode for the Message Forwarder Bot
+Splits the source groups across N ingest processes (each with its own
+login, session and event loop) that pass processed jobs to one send process.
+A crashed process is restarted on its own; the others keep running.
+
+Usage:
+    python supervisor.py --login    # log each shard in once (asks for the code)
+    python supervisor.py            # SHARD_COUNT shards (default: CPU count)
+    python supervisor.py --shards 4
+"""
+
+import os
+import sys
+import time
+import queue
+import signal
+import asyncio
+import logging
+import multiprocessing
+from typing import Dict, List, Optional
+from config import API_HASH, API_ID, PHONE, SOURCE_GROUP_IDS, SHARD_COUNT, USE_UVLOOP
+
+
+logger = logging.getLogger(__name__)
+
+BASE_SESSION = 'session_name'
+# Restart backoff per process: doubles on every crash, reset after a stable run
+MIN_BACKOFF = 1
+MAX_BACKOFF = 60
+STABLE_AFTER = 60
+
+
+def partition_groups(group_ids: List[int], shards: int) -> List[List[int]]:
+    """Spread source groups round-robin over at most ``shards`` shards"""
+    shards = max(1, min(shards, len(group_ids)))
+    return [group_ids[i::shards] for i in range(shards)]
+
+
+def shard_session(index: int) -> str:
+    """Session name of an ingest shard
+
+    Every shard has its own login (its own auth key): processes sharing one
+    key get AUTH_KEY_DUPLICATED or have it revoked. ``--login`` creates them.
+    """
+    return f'{BASE_SESSION}.shard{index}'
+
+
+async def login_sessions(session_names: List[str]):
+    """Log each session in that isn't yet, asking for the code on this terminal"""
+    from telethon import TelegramClient
+
+    for name in session_names:
+        client = TelegramClient(name, API_ID, API_HASH)
+        try:
+            await client.start(phone=PHONE)
+            logger.info(f"Session {name} is logged in")
+        finally:
+            await client.disconnect()
+
+
+def run_process(role: str, group_ids: List[int], session_name: str, outbox, control=None):
+    """Entry point of a child process"""
+    # Ctrl+C reaches the whole process group; the supervisor stops us instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Imported in the child so each process builds its own client and loop
+    from bot import MessageForwarderBot, main
+    from capabilities import install_uvloop
+
+    install_uvloop(USE_UVLOOP)
+    bot = MessageForwarderBot(group_ids=group_ids, session_name=session_name,
+                              outbox=outbox, role=role, control=control)
+    try:
+        asyncio.run(main(bot))
+    except KeyboardInterrupt:
+        pass
+
+
+class ManagedProcess:
+    """One child process plus its restart bookkeeping"""
+
+    def __init__(self, name: str, role: str, group_ids: List[int], session_name: str):
+        self.name = name
+        self.role = role
+        self.group_ids = group_ids
+        self.session_name = session_name
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.backoff = MIN_BACKOFF
+        self.restart_at = 0.0
+        self.restarts = 0
+
+
+class Supervisor:
+    """Starts the send process and the ingest shards and keeps them alive
+
+    Admin /pause, /resume and /drain run in the send process, which passes
+    them here through ``commands``; they are relayed to the shard owning the
+    group and replayed to it after a restart.
+    """
+
+    def __init__(self, shards: int = SHARD_COUNT, group_ids: List[int] = None):
+        self.context = multiprocessing.get_context('spawn')
+        # Jobs from every ingest shard to the single send process
+        self.outbox = self.context.Queue()
+        # Group commands from the send process, and one queue per shard for them
+        self.commands = self.context.Queue()
+        self.controls: Dict[str, multiprocessing.Queue] = {}
+        self.group_state: Dict[int, str] = {}  # last pause/drain per group
+        group_ids = SOURCE_GROUP_IDS if group_ids is None else group_ids
+
+        self.processes: Dict[str, ManagedProcess] = {
+            'sender': ManagedProcess('sender', 'send', [], BASE_SESSION)
+        }
+        for index, shard_groups in enumerate(partition_groups(group_ids, shards)):
+            name = f'shard{index}'
+            self.processes[name] = ManagedProcess(name, 'ingest', shard_groups,
+                                                  shard_session(index))
+            self.controls[name] = self.context.Queue()
+        self._stopping = False
+
+    def missing_sessions(self) -> List[str]:
+        """Shard sessions that were never logged in"""
+        return [
+            managed.session_name for managed in self.processes.values()
+            if managed.role == 'ingest' and not os.path.exists(f'{managed.session_name}.session')
+        ]
+
+    def start(self, managed: ManagedProcess):
+        control = self.commands if managed.role == 'send' else self.controls[managed.name]
+        managed.process = self.context.Process(
+            target=run_process,
+            args=(managed.role, managed.group_ids, managed.session_name, self.outbox, control),
+            name=managed.name,
+        )
+        managed.process.start()
+        managed.started_at = time.monotonic()
+        logger.info(
+            f"Started {managed.name} (pid {managed.process.pid}, "
+            f"groups {managed.group_ids or 'n/a'})"
+        )
+        if managed.role == 'ingest':
+            # A restarted shard starts with every group enabled again
+            for group_id in managed.group_ids:
+                if group_id in self.group_state:
+                    control.put((self.group_state[group_id], group_id))
+
+    def relay_commands(self):
+        """Pass group commands from the send process to the shard owning the group"""
+        while True:
+            try:
+                command, group_id = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if command == 'resume':
+                self.group_state.pop(group_id, None)
+            else:
+                self.group_state[group_id] = command
+            for name, managed in self.processes.items():
+                if group_id in managed.group_ids:
+                    self.controls[name].put((command, group_id))
+                    logger.info(f"Relayed {command} of {group_id} to {name}")
+
+    def check(self, managed: ManagedProcess):
+        """Schedule a restart for a dead process, start it once its backoff passed"""
+        now = time.monotonic()
+        if managed.process is not None and managed.process.is_alive():
+            if now - managed.started_at > STABLE_AFTER:
+                managed.backoff = MIN_BACKOFF
+            return
+
+        if managed.process is not None:
+            logger.error(
+                f"{managed.name} exited with code {managed.process.exitcode}, "
+                f"restarting in {managed.backoff}s"
+            )
+            managed.process = None
+            managed.restart_at = now + managed.backoff
+            managed.backoff = min(managed.backoff * 2, MAX_BACKOFF)
+            managed.restarts += 1
+        elif now >= managed.restart_at:
+            self.start(managed)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        missing = self.missing_sessions()
+        if missing:
+            logger.error(f"Not logged in: {', '.join(missing)}. Run: python supervisor.py --login")
+            return
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for managed in self.processes.values():
+            self.start(managed)
+        try:
+            while not self._stopping:
+                self.relay_commands()
+                for managed in self.processes.values():
+                    self.check(managed)
+                time.sleep(1)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        logger.info("Stopping all processes...")
+        for managed in self.processes.values():
+            if managed.process is not None and managed.process.is_alive():
+                managed.process.terminate()
+        for managed in self.processes.values():
+            if managed.process is not None:
+                managed.process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    shards = SHARD_COUNT
+    if '--shards' in sys.argv:
+        shards = int(sys.argv[sys.argv.index('--shards') + 1])
+    supervisor = Supervisor(shards)
+    if '--login' in sys.argv:
+        asyncio.run(login_sessions(supervisor.missing_sessions()))
+    else:
+        supervisor.run()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for the admin commands and pipeline metrics
+Runs /status, /pause, /resume, /drain and /schedule against a bot with a fake
+client, and checks the rates and percentiles the status is built from
+"""
+
+import time
+import asyncio
+from bot import MessageForwarderBot
+from config import SOURCE_GROUP_SETTINGS
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob
+from metrics import PipelineMetrics, percentiles
+
+GROUP_ID = -1009990041
+SETTINGS = {'letter': 'T', 'name': 'Test Group'}
+
+
+def _job(message_id: int) -> ForwardJob:
+    return ForwardJob(GROUP_ID, message_id, 7, time.time(), None, (),
+                      f"Gucci bag £{message_id}0", original_text=f"Gucci bag £{message_id}0")
+
+
+def _with_group(run):
+    """Run a coroutine with the test group configured"""
+    SOURCE_GROUP_SETTINGS[GROUP_ID] = SETTINGS
+    try:
+        return asyncio.run(run())
+    finally:
+        del SOURCE_GROUP_SETTINGS[GROUP_ID]
+
+
+def _bot() -> MessageForwarderBot:
+    bot = MessageForwarderBot(group_ids=[GROUP_ID])
+    bot.client = FakeTelegramClient()
+    bot.me_id = 1
+    return bot
+
+
+def test_group_commands():
+    """/pause holds queued posts, /resume releases them, /drain stops ingest only"""
+    print("🧪 Testing /pause, /resume and /drain")
+
+    async def run():
+        bot = _bot()
+        for message_id in (1, 2):
+            await bot.queue.put(_job(message_id))
+        replies, states = [], []
+        for command in ('/pause T', '/resume test group', f'/drain {GROUP_ID}', '/pause X'):
+            replies.append(bot.admin.execute(command))
+            states.append((GROUP_ID in bot.enabled_groups, GROUP_ID in bot.queue.held_groups))
+        status = bot.admin.status()
+        return replies, states, status
+
+    replies, states, status = _with_group(run)
+    print(f"   {replies}")
+    assert replies[:3] == ['✅ Paused [T] Test Group', '✅ Resumed [T] Test Group',
+                           '✅ Draining [T] Test Group']
+    assert replies[3] == '❌ Unknown group: X'
+    assert states == [(False, True), (True, False), (False, False), (False, False)]
+    assert '[T] Test Group [draining]' in status and 'queued 2' in status
+
+
+def test_status():
+    """/status reports queue depth, group counts and latency percentiles"""
+    print("\n🧪 Testing /status")
+
+    async def run():
+        bot = _bot()
+        await bot.queue.put(_job(1))
+        for latency in (1.0, 2.0, 3.0):
+            bot.metrics.record_received(GROUP_ID)
+            bot.metrics.record_forwarded(GROUP_ID, latency)
+        bot.metrics.record_failed(GROUP_ID)
+        return bot.admin.execute('/status')
+
+    reply = _with_group(run)
+    print('   ' + reply.replace('\n', '\n   '))
+    assert reply.startswith('📊 Pipeline status')
+    assert 'Queue: 1/' in reply and 'Latency: p50 2.0s, p95 3.0s, p99 3.0s' in reply
+    assert '[T] Test Group [active]' in reply and 'total 3→3 (1 failed)' in reply
+
+
+def test_schedule():
+    """/schedule lists upcoming posts soonest first, with their source"""
+    print("\n🧪 Testing /schedule")
+
+    async def run():
+        bot = _bot()
+        now = int(time.time())
+        for offset, message_id in ((120, 5), (60, 4), (180, 6)):
+            bot.timeline.add(now + offset, GROUP_ID, message_id, 100 + message_id)
+        bot.timeline.add(now + 240, None, None, 200)
+        bot.timeline.add(now + 300, GROUP_ID, -1, 300)  # A digest post
+        bot.timeline.last_slot = now + 300
+        return bot.admin.execute('/schedule'), bot.admin.schedule(limit=2)
+
+    reply, short = _with_group(run)
+    print('   ' + reply.replace('\n', '\n   '))
+    lines = reply.split('\n')
+    assert lines[0].startswith('🗓 5 post(s) scheduled, 0 published')
+    assert [line.split(' UTC ')[1] for line in lines[1:]] == [
+        '[T] Test Group #4', '[T] Test Group #5', '[T] Test Group #6', '(unknown source)',
+        '[T] Test Group digest']
+    assert short.endswith('… and 3 more')
+
+
+def test_metrics():
+    """Rates count only the window; percentiles use the nearest rank"""
+    print("\n🧪 Testing pipeline metrics")
+    now = [1000.0]
+    metrics = PipelineMetrics(window=60, clock=lambda: now[0])
+    now[0] = 1030.0  # 30 s of uptime: rates are per 30 s, not per window
+    for _ in range(15):
+        metrics.record_received(GROUP_ID)
+    early = metrics.group_rates([GROUP_ID])[GROUP_ID]
+    now[0] = 1100.0
+    for latency in range(1, 101):
+        metrics.record_forwarded(GROUP_ID, latency / 10)
+    later = metrics.group_rates([GROUP_ID])[GROUP_ID]
+    latency = metrics.latency_percentiles()
+    print(f"   {early}\n   {later}\n   {latency}")
+    assert early['received_per_min'] == 30.0
+    assert later['received_per_min'] == 0.0 and later['forwarded_per_min'] == 100.0
+    assert later['received'] == 15 and later['forwarded'] == 100
+    assert latency == {'p50': 5.1, 'p95': 9.6, 'p99': 10.0}
+    assert percentiles([]) == {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+
+    metrics.register_cache('media', lambda: {'hits': 3, 'misses': 1})
+    metrics.register_cache('empty', lambda: {})
+    rates = metrics.cache_hit_rates()
+    assert rates['media']['hit_rate'] == 0.75 and rates['empty']['hit_rate'] == 0.0
+
+
+if __name__ == "__main__":
+    test_group_commands()
+    test_status()
+    test_schedule()
+    test_metrics()
+    print("\n✨ All tests completed!")
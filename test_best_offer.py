@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for the cross-supplier best-offer window
+Checks product keys, that only the cheapest copy is sent, held edits and
+deletions, and the selector in the bot
+"""
+
+import asyncio
+from telethon.tl.types import Message, MessageMediaPhoto, PeerChannel, PeerUser
+from best_offer import OfferSelector, offer_key, text_fingerprint
+from bot import MessageForwarderBot
+from coalescer import PostCoalescer
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob, MediaRef
+from selftest import _synthetic_photo
+
+WINDOW = 0.05
+
+
+def _job(group_id: int, message_id: int, text: str, price, photo_size: int = 150000,
+         action: str = 'new') -> ForwardJob:
+    # The test's price_of reads the price from text: 'price=<n>'
+    media = (MediaRef('photo', message_id, 1, b'', photo_size),) if photo_size else ()
+    return ForwardJob(group_id, message_id, 1, 0.0, 'photo' if media else None, media,
+                      f"{text} price={price}" if price is not None else text,
+                      action=action, original_text=text)
+
+
+def _price_of(job: ForwardJob):
+    if 'price=' not in job.text:
+        return None
+    return float(job.text.rsplit('price=', 1)[1])
+
+
+def _run(jobs, window: float = WINDOW):
+    """Feed jobs through a selector and collect what it submits"""
+    async def run():
+        submitted = []
+
+        async def submit(job):
+            submitted.append(job)
+
+        selector = OfferSelector(submit, lambda group_id: window, _price_of)
+        for job in jobs:
+            await selector.add(job)
+        await asyncio.sleep(window * 3)
+        return submitted, selector
+
+    return asyncio.run(run())
+
+
+def test_product_key():
+    """Prices, emoji, filler and word order don't change the key; photos aren't part of it"""
+    print("🧪 Testing product keys")
+    first = text_fingerprint('🔥 NEW STOCK Rolex Submariner 41mm £150')
+    second = text_fingerprint('Submariner Rolex 41mm - 140 tk only!')
+    print(f"   {first!r} / {second!r}")
+    assert first == second == '41mm rolex submariner'
+    assert offer_key(_job(-1, 1, 'Rolex Submariner', 1)) == offer_key(_job(-2, 2, 'rolex submariner', 2))
+    assert offer_key(_job(-1, 1, 'Rolex Submariner', 1)) == offer_key(_job(-2, 2, 'Rolex Submariner', 2, 9000))
+    assert offer_key(_job(-1, 1, 'Rolex Submariner', 1)) != offer_key(_job(-2, 2, 'Rolex Daytona', 2))
+    assert offer_key(_job(-1, 1, '£150 🔥', 1)) is None
+
+
+def test_cheapest_copy_wins():
+    """Of three suppliers' copies only the cheapest is sent; other products pass"""
+    print("\n🧪 Testing best-offer selection")
+    submitted, selector = _run([
+        _job(-1, 1, 'Rolex Submariner', 270),
+        _job(-2, 2, 'rolex submariner', 255),
+        _job(-3, 3, 'Rolex Submariner', 255),
+        _job(-1, 4, 'Gucci bag', 90),
+        _job(-2, 5, 'Hello all', None),
+    ])
+    print(f"   Sent: {[(job.source_group_id, job.message_id) for job in submitted]}")
+    assert [job.message_id for job in submitted] == [5, 2, 4]
+    stats = selector.stats()
+    assert stats['chosen'] == 2 and stats['suppressed'] == 2 and stats['held'] == 0
+
+
+def test_edit_and_delete_held():
+    """A price cut by edit can win; deleting the best copy lets the next one win"""
+    print("\n🧪 Testing held edits and deletions")
+    submitted, _ = _run([
+        _job(-1, 1, 'Rolex Submariner', 250),
+        _job(-2, 2, 'Rolex Submariner', 260),
+        _job(-2, 2, 'Rolex Submariner', 240, action='edit'),
+        _job(-1, 6, 'Gucci bag', 80),
+        _job(-2, 7, 'Gucci bag', 90),
+        ForwardJob.deletion(-1, 6),
+        ForwardJob.deletion(-3, 9),
+    ])
+    print(f"   Sent: {[(job.action, job.message_id) for job in submitted]}")
+    assert [(job.action, job.message_id) for job in submitted] == [
+        ('delete', 9), ('new', 2), ('new', 7)]
+    assert submitted[1].text.endswith('price=240')
+
+
+def test_bot_sends_one_copy():
+    """Two groups posting the same listing put one post, the cheaper, in the queue"""
+    print("\n🧪 Testing best offer in the bot")
+    groups = [-1009990011, -1009990012]
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=groups)
+        bot.client = FakeTelegramClient()
+        bot.me_id = 1
+        bot.best_offer = OfferSelector(bot._submit, lambda group_id: WINDOW, bot._offer_price)
+        bot.coalescer = PostCoalescer(bot.best_offer.add, lambda group_id: 0)
+        for message_id, group_id, price in ((1, groups[0], 60), (2, groups[1], 55)):
+            message = Message(
+                id=message_id, peer_id=PeerChannel(abs(group_id)), date=None,
+                message=f'Gucci bag £{price}', from_id=PeerUser(7),
+                media=MessageMediaPhoto(photo=_synthetic_photo(message_id)))
+            message._text = message.message  # What a connected client renders
+            await bot.handle_source_message(message, group_id)
+        held = len(bot.best_offer)
+        await asyncio.sleep(WINDOW * 3)
+        return bot, held
+
+    bot, held = asyncio.run(run())
+    job = bot.queue._heap[0][-1] if len(bot.queue) else None
+    print(f"   Held {held}, queued {len(bot.queue)}: {job and job.text[:40]!r}")
+    assert held == 2 and len(bot.queue) == 1
+    assert job.source_group_id == groups[1]
+    assert bot.best_offer.stats()['suppressed'] == 1
+
+
+if __name__ == "__main__":
+    test_product_key()
+    test_cheapest_copy_wins()
+    test_edit_and_delete_held()
+    test_bot_sends_one_copy()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for the buffered session storage
+Checks that state survives a flush/reload and that a new auth key reaches
+the disk without waiting for a flush
+"""
+
+import os
+import asyncio
+import tempfile
+from telethon.crypto import AuthKey
+from telethon.sessions import SQLiteSession
+from telethon.tl.types import InputPeerUser
+from telethon.tl.types.contacts import ResolvedPeer
+from buffered_session import BufferedSession
+
+
+def _seed(path: str):
+    session = SQLiteSession(path)
+    session.set_dc(4, '149.154.167.91', 443)
+    session.auth_key = AuthKey(b'\x01' * 256)
+    session.process_entities(ResolvedPeer(None, [InputPeerUser(77, 1234)], []))
+    session.close()
+
+
+def test_round_trip():
+    """Loaded entities and new ones are on disk after a flush"""
+    print("🧪 Testing session round trip")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bot')
+        _seed(path)
+
+        session = BufferedSession(path, flush_interval=3600)
+        assert session.get_entity_rows_by_id(77) == (77, 1234)
+        session.process_entities(ResolvedPeer(None, [InputPeerUser(88, 5678)], []))
+        asyncio.run(session.save())  # not due yet
+        assert session.flushes == 0
+        asyncio.run(session.close())
+
+        stored = SQLiteSession(path)
+        print(f"   Flushes: {session.flushes}, dc {stored.dc_id}")
+        assert stored.dc_id == 4
+        assert stored.auth_key.key == b'\x01' * 256
+        assert stored.get_entity_rows_by_id(88) == (88, 5678)
+        assert stored.get_entity_rows_by_id(77) == (77, 1234)
+        stored.close()
+
+
+def test_auth_key_written_immediately():
+    """A changed auth key is on disk before any flush"""
+    print("\n🧪 Testing immediate auth key write")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bot')
+        _seed(path)
+
+        session = BufferedSession(path, flush_interval=3600)
+        session.auth_key = AuthKey(b'\x01' * 256)  # unchanged: no write
+        assert session.flushes == 0
+        session.auth_key = AuthKey(b'\x02' * 256)
+
+        stored = SQLiteSession(path)
+        print(f"   Flushes: {session.flushes}")
+        assert session.flushes == 1
+        assert stored.auth_key.key == b'\x02' * 256
+        stored.close()
+        assert not [name for name in os.listdir(directory) if 'flush' in name]
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_auth_key_written_immediately()
+    print("\n✨ All tests completed!")
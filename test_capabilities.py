@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the startup capability checks
+Checks crypto backend detection, the uvloop fallback, the offline
+encryption benchmarks and that startup skips them
+"""
+
+import asyncio
+import logging
+import capabilities
+from capabilities import (
+    benchmark_encrypt,
+    benchmark_upload_encrypt,
+    crypto_backend,
+    detect_capabilities,
+    install_uvloop,
+    libssl,
+    log_capabilities,
+    telethon_aes,
+)
+from fake_client import FakeTelegramClient
+
+
+def test_crypto_backend():
+    """cryptg is preferred over libssl, and pure Python is the last resort"""
+    print("🧪 Testing crypto backend detection")
+    saved = telethon_aes.cryptg, libssl.encrypt_ige, libssl.decrypt_ige
+    try:
+        telethon_aes.cryptg = object()
+        with_cryptg = crypto_backend()
+        telethon_aes.cryptg = None
+        libssl.encrypt_ige = libssl.decrypt_ige = lambda *args: b''
+        with_libssl = crypto_backend()
+        libssl.encrypt_ige = libssl.decrypt_ige = None
+        without = crypto_backend()
+    finally:
+        telethon_aes.cryptg, libssl.encrypt_ige, libssl.decrypt_ige = saved
+    print(f"   {with_cryptg} / {with_libssl} / {without}, here: {crypto_backend()}")
+    assert (with_cryptg, with_libssl, without) == ('cryptg', 'libssl', 'python')
+
+
+def test_uvloop_fallback():
+    """Without uvloop (or when disabled) the default event loop is kept"""
+    print("\n🧪 Testing the uvloop fallback")
+    policy = asyncio.get_event_loop_policy()
+    saved = capabilities.uvloop
+    try:
+        capabilities.uvloop = None
+        assert install_uvloop() is False
+    finally:
+        capabilities.uvloop = saved
+    assert install_uvloop(enabled=False) is False
+    assert asyncio.get_event_loop_policy() is policy
+    assert asyncio.run(asyncio.sleep(0, 'ok')) == 'ok'
+    print(f"   Loop kept: {capabilities.loop_implementation()}")
+
+
+def test_encryption_benchmarks():
+    """Both benchmarks measure encryption only and are labelled that way"""
+    print("\n🧪 Testing the encryption benchmarks")
+    encrypt = benchmark_encrypt(megabytes=0.25)
+    client = FakeTelegramClient()
+    upload = asyncio.run(benchmark_upload_encrypt(client, megabytes=1))
+    parts = [call for call in client.calls if call[0] == 'upload_part']
+    print(f"   AES-IGE {encrypt:.1f} MB/s, upload parts {upload:.1f} MB/s ({len(parts)} parts)")
+    assert encrypt > 0 and upload > 0 and len(parts) == 2
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    level = capabilities.logger.level
+    capabilities.logger.addHandler(handler)
+    capabilities.logger.setLevel(logging.INFO)
+    try:
+        log_capabilities({'crypto_backend': 'libssl', 'encrypt_mb_s': 50.0,
+                          'event_loop': 'asyncio', 'cryptg_installed': True,
+                          'uvloop_installed': True, 'upload_encrypt_mb_s': 40.0})
+    finally:
+        capabilities.logger.removeHandler(handler)
+        capabilities.logger.setLevel(level)
+    messages = [record.getMessage() for record in records]
+    assert 'Upload encryption (offline, no network): 40.0 MB/s' in messages
+
+
+def test_startup_check_skips_benchmark():
+    """The check run at startup reports the fast paths without benchmarking"""
+    print("\n🧪 Testing the startup capability check")
+    saved = capabilities.benchmark_encrypt
+    calls = []
+    capabilities.benchmark_encrypt = lambda megabytes: calls.append(megabytes) or 1.0
+    try:
+        startup = detect_capabilities()
+        selftest = detect_capabilities(benchmark_megabytes=4)
+    finally:
+        capabilities.benchmark_encrypt = saved
+    log_capabilities(startup)  # Must not need the benchmark result
+    print(f"   {startup}")
+    assert 'encrypt_mb_s' not in startup and selftest['encrypt_mb_s'] == 1.0
+    assert calls == [4]
+
+
+if __name__ == "__main__":
+    test_crypto_backend()
+    test_uvloop_fallback()
+    test_encryption_benchmarks()
+    test_startup_check_skips_benchmark()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for coalescing split supplier posts
+Checks text + photos merging, per-sender separation and held deletions
+"""
+
+import time
+import asyncio
+from best_offer import OfferSelector
+from bot import MessageForwarderBot
+from coalescer import PostCoalescer
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob, MediaRef
+
+WINDOW = 0.05
+
+
+def _job(message_id: int, text: str = '', photos: int = 0, sender_id: int = 1,
+         action: str = 'new') -> ForwardJob:
+    media = tuple(MediaRef('photo', message_id * 100 + i, 1, b'') for i in range(photos))
+    return ForwardJob(-100, message_id, sender_id, 0.0, 'photo' if media else None,
+                      media, text, action=action, original_text=text)
+
+
+def _run(jobs, window: float = WINDOW):
+    """Feed jobs through a coalescer and collect what it submits"""
+    async def run():
+        submitted = []
+
+        async def submit(job):
+            submitted.append(job)
+
+        coalescer = PostCoalescer(submit, lambda group_id: window)
+        for job in jobs:
+            await coalescer.add(job)
+        await asyncio.sleep(window * 3)
+        return submitted, coalescer
+
+    return asyncio.run(run())
+
+
+def test_text_then_photos_merge():
+    """A text post and the sender's next two photos become one captioned album"""
+    print("🧪 Testing text + photos merge")
+    submitted, coalescer = _run([_job(1, 'Gucci bag £50'), _job(2, photos=1), _job(3, photos=1)])
+    print(f"   Submitted {len(submitted)} job(s), merged {coalescer.merged}")
+    assert len(submitted) == 1
+    assert submitted[0].message_id == 1
+    assert submitted[0].text == 'Gucci bag £50'
+    assert len(submitted[0].media) == 2
+
+
+def test_other_sender_and_complete_posts_pass():
+    """Different senders never merge; complete posts and window 0 pass through"""
+    print("\n🧪 Testing separation")
+    submitted, _ = _run([_job(1, 'Bag £50', sender_id=1), _job(2, photos=1, sender_id=2)])
+    assert len(submitted) == 2 and all(not (job.text and job.media) for job in submitted)
+
+    submitted, coalescer = _run([_job(1, 'Bag £50', photos=1)])
+    assert len(submitted) == 1 and len(coalescer) == 0
+
+    submitted, _ = _run([_job(1, 'Bag £50'), _job(2, photos=1)], window=0)
+    print(f"   Window 0 submitted {len(submitted)} jobs")
+    assert len(submitted) == 2
+
+
+def test_deleting_held_part():
+    """Deleting a held text post leaves only its photo"""
+    print("\n🧪 Testing deletion of a held part")
+    submitted, _ = _run([_job(1, 'Bag £50'), _job(2, photos=1),
+                         ForwardJob.deletion(-100, 1)])
+    print(f"   Submitted: {[(job.message_id, job.text) for job in submitted]}")
+    assert len(submitted) == 1
+    assert submitted[0].message_id == 2 and not submitted[0].text
+
+
+def test_stop_sends_held_posts():
+    """Posts held for merging or best offer, and queued ones, are sent on stop"""
+    print("\n🧪 Testing held posts on stop")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[-100])
+        bot.client = FakeTelegramClient()
+        bot.target_peer = 'target'
+        bot.pacing_enabled = False
+        bot.best_offer = OfferSelector(bot._submit, lambda group_id: 60, lambda job: 50)
+        bot.coalescer = PostCoalescer(bot.best_offer.add, lambda group_id: 60)
+        bot._worker_task = asyncio.create_task(bot._forward_worker())
+        bot.lanes.start()
+        now = time.time()
+        await bot.coalescer.add(_job(1, 'Bag £50')._replace(created_at=now))
+        await bot.best_offer.add(_job(2, 'Rolex Submariner £150', photos=1)._replace(created_at=now))
+        held = len(bot.queue) + bot.client.sent_count
+        await bot.stop()
+        sent = [call[1][1] for call in bot.client.calls if call[0].startswith('send')]
+        return held, sent
+
+    held, sent = asyncio.run(run())
+    print(f"   Sent before stop {held}, on stop {len(sent)}")
+    assert held == 0 and len(sent) == 2
+    assert any('Bag' in str(message) for message in sent)
+
+
+if __name__ == "__main__":
+    test_text_then_photos_merge()
+    test_other_sender_and_complete_posts_pass()
+    test_deleting_held_part()
+    test_stop_sends_held_posts()
+    print("\n✨ All tests completed!")
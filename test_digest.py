@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Test script for digest mode
+Checks that catalogue posts stay within Telegram's limits, that listings are
+sent in far fewer posts, held edits and deletions, and restoring the buffer,
+including listings whose digest was not sent yet
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+from config import CONTACT_INFO, OUTPUT_TEMPLATE
+from coalescer import CAPTION_LIMIT
+from bot import MessageForwarderBot
+from digest import TEXT_LIMIT, DigestBuffer, pack_digests
+from fake_client import FakeMessage, FakeTelegramClient
+from forward_job import ForwardJob, MediaRef
+from forward_queue import ForwardQueue
+from message_map import MessageMap
+from output_templates import OutputTemplate
+
+GROUP_ID = -1009990021
+TEMPLATE = OutputTemplate(OUTPUT_TEMPLATE, letter='S', contact_info=CONTACT_INFO)
+MINUTES = 0.001  # 60 ms
+
+
+def _listing(message_id: int, photos: int = 1, action: str = 'new', extra: str = '') -> ForwardJob:
+    media = tuple(MediaRef('photo', message_id * 10 + i, 1, b'\x02' * 8, 150000, message_id)
+                  for i in range(photos))
+    text = TEMPLATE.render(f"Gucci bag model {message_id} {extra}\nAll colours\nPrice £{100 + message_id}")
+    return ForwardJob(GROUP_ID, message_id, 7, 1000.0 + message_id, 'photo' if media else None,
+                      media, text, action=action, original_text=text)
+
+
+def _buffer(path: str, submitted: list, max_items: int = 10, photos: int = 1) -> DigestBuffer:
+    async def submit(job):
+        submitted.append(job)
+
+    settings = {'minutes': MINUTES, 'max_items': max_items, 'photos': photos}
+    return DigestBuffer(submit, lambda group_id: settings if group_id == GROUP_ID else {},
+                        lambda group_id: TEMPLATE, path=path)
+
+
+def test_pack_within_limits():
+    """Every listing appears once and no post passes the caption or text limit"""
+    print("🧪 Testing digest packing")
+    listings = [_listing(i, extra='x' * (i * 7)) for i in range(1, 41)]
+    for photos, limit in ((4, CAPTION_LIMIT), (0, TEXT_LIMIT)):
+        posts = pack_digests(listings, TEMPLATE, photos)
+        lengths = [len(post.text) for post in posts]
+        print(f"   {photos} photos: {len(posts)} posts, longest {max(lengths)} chars")
+        assert max(lengths) <= limit
+        assert all(len(post.media) <= photos for post in posts)
+        ids = [post.message_id for post in posts]
+        assert all(message_id < 0 for message_id in ids) and len(set(ids)) == len(ids)
+        for listing in listings:
+            line = f"model {listing.message_id} "
+            assert sum(line in post.text for post in posts) == 1
+        assert all(post.text.count(CONTACT_INFO['telegram_link']) == 1 for post in posts)
+    again = pack_digests(listings[:1], TEMPLATE, 1)[0]
+    assert 'Price £101' in again.text and again.message_id not in ids
+
+
+def test_fewer_posts():
+    """35 listings go out in a handful of posts, the last batch when its time is up"""
+    print("\n🧪 Testing digest batching")
+
+    async def run(path):
+        submitted = []
+        digest = _buffer(path, submitted)
+        for message_id in range(1, 36):
+            await digest.add(_listing(message_id))
+        await digest.add(_listing(99, photos=0)._replace(source_group_id=-5))
+        before_timer = len(submitted)
+        await asyncio.sleep(MINUTES * 60 * 3)
+        unsent = digest.stats()['unsent']
+        for post in submitted:
+            if post.message_id < 0:
+                digest.sent(post)
+        return submitted, before_timer, unsent, digest
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'digest.json')
+        submitted, before_timer, unsent, digest = asyncio.run(run(path))
+        saved = os.path.exists(path)
+    digests = [post for post in submitted if post.message_id < 0]
+    print(f"   35 listings -> {len(digests)} posts ({before_timer} before the timer), {digest.stats()}")
+    assert len(submitted) - len(digests) == 1  # the other group's listing
+    assert len(digests) <= 35 // 10 + 2 and digest.stats()['digested'] == 35
+    assert unsent == 35 and len(digest) == 0 and not saved
+
+
+def test_kept_until_sent():
+    """Flushed listings stay in the file until their post is sent, and come back on restore"""
+    print("\n🧪 Testing listings kept until their digest is sent")
+
+    async def run(path):
+        submitted = []
+        digest = _buffer(path, submitted, max_items=2)
+        for message_id in (1, 2, 3):
+            await digest.add(_listing(message_id))
+        await digest.flush()  # Posts queued, the process stops before they go out
+
+        held = len(_restored(path))
+        digest.sent(submitted[0])
+        after_first = len(_restored(path))
+        digest.sent(submitted[1])
+        return submitted, held, after_first, os.path.exists(path)
+
+    def _restored(path):
+        buffer = _buffer(path, [])
+        buffer.restore()
+        buffer._cancel(GROUP_ID)
+        return buffer
+
+    with tempfile.TemporaryDirectory() as workdir:
+        submitted, held, after_first, saved = asyncio.run(run(os.path.join(workdir, 'digest.json')))
+    print(f"   {len(submitted)} posts, restored {held}, {after_first} after the first was sent")
+    assert len(submitted) == 2 and held == 3
+    assert after_first == 3 - submitted[0].text.count('Gucci bag')
+    assert not saved
+
+
+def test_edit_delete_and_restore():
+    """Held edits and deletions apply, and a new buffer picks up the saved listings"""
+    print("\n🧪 Testing held edits, deletions and restore")
+
+    async def run(path):
+        submitted = []
+        digest = _buffer(path, submitted)
+        for message_id in (1, 2, 3):
+            await digest.add(_listing(message_id))
+        await digest.add(_listing(2, extra='EDITED', action='edit'))
+        await digest.add(ForwardJob.deletion(GROUP_ID, 3))
+        await digest.add(ForwardJob.deletion(GROUP_ID, 42))
+        digest._cancel(GROUP_ID)  # The process stops here
+
+        restored = _buffer(path, submitted)
+        restored.restore()
+        held = len(restored)
+        await asyncio.sleep(MINUTES * 60 * 3)
+        return submitted, held
+
+    with tempfile.TemporaryDirectory() as workdir:
+        submitted, held = asyncio.run(run(os.path.join(workdir, 'digest.json')))
+    print(f"   Restored {held}, sent {[(post.action, post.message_id) for post in submitted]}")
+    assert held == 2
+    assert [(post.action, post.message_id > 0) for post in submitted] == [('delete', True), ('new', False)]
+    text = submitted[1].text
+    assert 'model 1 ' in text and 'model 2 EDITED' in text and 'model 3 ' not in text
+    assert submitted[1].media[0].file_reference == b'\x02' * 8
+
+
+def test_long_window_not_stale():
+    """A digest of listings older than the queue's max age is still sent"""
+    print("\n🧪 Testing a 30-minute digest through the queue")
+
+    async def run():
+        queue = ForwardQueue(max_age=30 * 60)
+        submitted = []
+
+        async def submit(job):
+            submitted.append(job)
+            return await queue.put(job)
+
+        settings = {'minutes': 30, 'max_items': 10, 'photos': 1}
+        digest = DigestBuffer(submit, lambda group_id: settings, lambda group_id: TEMPLATE,
+                              path=os.path.join(workdir, 'digest.json'))
+        for message_id in (1, 2, 3):
+            await digest.add(_listing(message_id)._replace(created_at=time.time() - 31 * 60))
+        await digest.flush()
+        delivered = []
+        while len(queue):
+            try:
+                delivered.append(await asyncio.wait_for(queue.get(), 1))
+            except asyncio.TimeoutError:
+                break  # Everything left was shed
+        return delivered, queue.stats()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        delivered, stats = asyncio.run(run())
+    print(f"   Delivered {len(delivered)}, shed {stats['shed_stale']} stale")
+    assert len(delivered) == 1 and 'model 3 ' in delivered[0].text
+    assert stats['shed_stale'] == 0
+
+
+def test_digest_posts_kept_apart():
+    """Scheduled digest posts each get a timeline entry and none is mapped"""
+    print("\n🧪 Testing digest posts in the bot")
+    bot = MessageForwarderBot(group_ids=[GROUP_ID])
+    bot.message_map = MessageMap(':memory:')
+    posts = pack_digests([_listing(1), _listing(2)], TEMPLATE, 1) + pack_digests([_listing(3)], TEMPLATE, 1)
+    for slot, post in enumerate(posts, 1000):
+        bot._record_forward(post, FakeMessage(slot), slot)
+    upcoming = bot.timeline.upcoming()
+    print(f"   {[(post.slot, post.source_message_id) for post in upcoming]}")
+    assert len(bot.message_map) == 0 and len(upcoming) == 2
+    assert upcoming[0].source_message_id != upcoming[1].source_message_id
+    bot.message_map.close()
+
+
+def test_bot_releases_sent_digests():
+    """The bot drops a digest's listings from the file once its post is sent"""
+    print("\n🧪 Testing the buffer file after the bot sends a digest")
+
+    async def run(path):
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = FakeTelegramClient()
+        bot.target_peer = 'target'
+        bot.pacing_enabled = False
+        settings = {'minutes': 30, 'max_items': 10, 'photos': 1}
+        bot.digest = DigestBuffer(bot._submit, lambda group_id: settings,
+                                  lambda group_id: TEMPLATE, path=path)
+        for message_id in (1, 2):
+            await bot.digest.add(_listing(message_id))
+        await bot.digest.flush()
+        queued = os.path.exists(path)
+        await bot._execute(await asyncio.wait_for(bot.queue.get(), 1))
+        return queued, os.path.exists(path), bot.client.sent_count
+
+    with tempfile.TemporaryDirectory() as workdir:
+        queued, saved, sent = asyncio.run(run(os.path.join(workdir, 'digest.json')))
+    print(f"   Saved while queued: {queued}, after sending: {saved}")
+    assert queued and not saved and sent == 1
+
+
+if __name__ == "__main__":
+    test_pack_within_limits()
+    test_fewer_posts()
+    test_kept_until_sent()
+    test_edit_delete_and_restore()
+    test_long_window_not_stale()
+    test_digest_posts_kept_apart()
+    test_bot_releases_sent_digests()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the compact forward-job record
+Compares the memory held per queued message against the old processed-content dict
+"""
+
+from datetime import datetime
+from telethon.tl.types import (
+    Message,
+    MessageMediaPhoto,
+    Photo,
+    PhotoSize,
+    PhotoStrippedSize,
+    PeerChannel,
+    PeerUser,
+)
+from forward_job import ForwardJob, MediaRef, deep_sizeof
+from message_processor import MessageProcessor
+
+
+def _make_photo_message(message_id: int = 1) -> Message:
+    """Build a realistic photo message like the ones Telethon delivers"""
+    photo = Photo(
+        id=5000000000 + message_id,
+        access_hash=-123456789012345,
+        file_reference=b'\x01' * 32,
+        date=datetime(2024, 1, 1),
+        sizes=[
+            PhotoStrippedSize('i', b'\x00' * 600),
+            PhotoSize('m', 320, 320, 21000),
+            PhotoSize('x', 800, 800, 81000),
+            PhotoSize('y', 1280, 1280, 164000),
+        ],
+        dc_id=4,
+    )
+    return Message(
+        id=message_id,
+        peer_id=PeerChannel(1879591244),
+        date=datetime(2024, 1, 1),
+        message='Gucci wallet for £35 - Boxed, NEW STOCK ' * 4,
+        from_id=PeerUser(42),
+        media=MessageMediaPhoto(photo=photo),
+    )
+
+
+def test_job_keeps_only_send_fields():
+    """The job must carry ids, hashes, file references and rendered text"""
+    print("🧪 Testing forward-job contents")
+    print("=" * 50)
+
+    message = _make_photo_message()
+    processor = MessageProcessor()
+    content = processor.process_message({
+        'text': message.message,
+        'media': message.media,
+        'photo': message.photo,
+        'caption': message.message,
+    })
+    job = ForwardJob.from_content(content, -1001879591244,
+                                  message_id=message.id, sender_id=42)
+
+    assert job.media_type == 'photo'
+    assert job.media == (MediaRef('photo', message.photo.id,
+                                  message.photo.access_hash,
+                                  message.photo.file_reference, 164000,
+                                  message.id),)
+    assert job.text == content['text']
+    assert job.media[0].to_input().id == message.photo.id
+    print(f"✅ Job: {job.media_type}, {len(job.media)} media, {len(job.text)} chars")
+
+
+def test_bytes_per_job():
+    """Report bytes held per message vs the processed-content dict used before
+
+    Before ForwardJob, the dict returned by process_message (with the
+    MessageMediaPhoto and its Photo) was what stayed alive until sent. For
+    this photo message that is about 4.6 KB vs about 1 KB, roughly 4.7x.
+    """
+    print("\n📏 Bytes per queued message")
+    print("=" * 50)
+
+    message = _make_photo_message()
+    # The record handle_source_message built and kept before this change
+    old_record = MessageProcessor().process_message({
+        'text': message.message,
+        'media': message.media,
+        'photo': message.photo,
+        'video': None,
+        'document': None,
+        'audio': None,
+        'caption': message.message,
+    })
+    job = ForwardJob.from_content(dict(old_record), -1001879591244, message_id=1)
+
+    old_bytes = deep_sizeof(old_record)
+    job_bytes = deep_sizeof(job)
+    print(f"   Processed-content dict: {old_bytes} bytes")
+    print(f"   ForwardJob:             {job_bytes} bytes")
+    print(f"   Reduction:              {old_bytes / job_bytes:.1f}x")
+    assert job_bytes * 4 < old_bytes
+
+
+if __name__ == "__main__":
+    test_job_keeps_only_send_fields()
+    test_bytes_per_job()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded forward queue
+Checks priority ordering, overflow eviction, stale-message shedding and
+edits/deletions of posts that are still queued
+"""
+
+import asyncio
+from forward_job import ForwardJob
+from forward_queue import ForwardQueue, PRIORITY_EDIT
+
+
+def _job(message_id: int, group_id: int = -100, created_at: float = 0.0,
+         action: str = 'new') -> ForwardJob:
+    return ForwardJob(group_id, message_id, None, created_at, None, (),
+                      f'item {message_id}', action=action)
+
+
+def test_priority_order():
+    """Edits jump ahead of new posts; equal priorities stay in arrival order"""
+    print("🧪 Testing priority order")
+
+    async def run():
+        queue = ForwardQueue(maxsize=10, clock=lambda: 0.0)
+        await queue.put(_job(1), 10)
+        await queue.put(_job(2), 5)
+        await queue.put(_job(3, action='edit'), PRIORITY_EDIT)
+        await queue.put(_job(4), 10)
+        return [(await queue.get()).message_id for _ in range(4)]
+
+    order = asyncio.run(run())
+    print(f"   Dequeue order: {order}")
+    assert order == [3, 2, 1, 4]
+
+
+def test_overflow_evicts_lowest_priority():
+    """A full queue drops its oldest low-priority job for a higher one"""
+    print("\n🧪 Testing overflow eviction")
+
+    async def run():
+        queue = ForwardQueue(maxsize=2, put_timeout=0.01, clock=lambda: 0.0)
+        await queue.put(_job(1), 10)
+        await queue.put(_job(2), 10)
+        accepted_high = await queue.put(_job(3), 1)
+        accepted_low = await queue.put(_job(4), 20)  # lower class: shed
+        remaining = [(await queue.get()).message_id for _ in range(len(queue))]
+        return accepted_high, accepted_low, remaining, queue.stats()
+
+    accepted_high, accepted_low, remaining, stats = asyncio.run(run())
+    print(f"   Remaining: {remaining}, stats: {stats}")
+    assert accepted_high and not accepted_low
+    assert remaining == [3, 2]
+    assert stats['shed_overflow'] == 2
+
+
+def test_stale_posts_are_shed():
+    """New posts past max age are dropped; edits are still delivered"""
+    print("\n🧪 Testing stale shedding")
+    now = [0.0]
+
+    async def run():
+        queue = ForwardQueue(maxsize=10, max_age=60, clock=lambda: now[0])
+        await queue.put(_job(1, created_at=0.0), 10)
+        await queue.put(_job(2, created_at=0.0, action='edit'), PRIORITY_EDIT)
+        await queue.put(_job(3, created_at=100.0), 10)
+        now[0] = 120.0
+        return [(await queue.get()).message_id for _ in range(2)], queue.stats()
+
+    delivered, stats = asyncio.run(run())
+    print(f"   Delivered: {delivered}, shed stale: {stats['shed_stale']}")
+    assert delivered == [2, 3]
+    assert stats['shed_stale'] == 1
+
+
+def test_followups_of_queued_posts():
+    """An edit replaces its queued post in place, a deletion cancels it, also while parked"""
+    print("\n🧪 Testing edits and deletions of queued posts")
+
+    async def run():
+        queue = ForwardQueue(maxsize=10, clock=lambda: 0.0)
+        await queue.put(_job(1), 10)
+        await queue.put(_job(2), 10)
+        await queue.put(_job(1, created_at=5.0, action='edit')._replace(text='item 1 edited'), PRIORITY_EDIT)
+        await queue.put(ForwardJob.deletion(-100, 2), PRIORITY_EDIT)
+        await queue.put(_job(9, action='edit'), PRIORITY_EDIT)  # already sent: stays an edit
+        jobs = [await queue.get() for _ in range(2)]
+
+        queue.hold(-200)
+        await queue.put(_job(3, group_id=-200), 10)
+        await queue.put(_job(4), 10)
+        jobs.append(await queue.get())  # parks message 3 on the way
+        await queue.put(ForwardJob.deletion(-200, 3), PRIORITY_EDIT)
+        queue.release(-200)
+        return jobs, len(queue)
+
+    jobs, left = asyncio.run(run())
+    print(f"   Sent: {[(job.action, job.message_id, job.text) for job in jobs]}, {left} left")
+    assert [(job.action, job.message_id) for job in jobs] == [('edit', 9), ('new', 1), ('new', 4)]
+    assert jobs[1].text == 'item 1 edited' and jobs[1].created_at == 0.0
+    assert left == 0
+
+
+if __name__ == "__main__":
+    test_priority_order()
+    test_overflow_evicts_lowest_priority()
+    test_stale_posts_are_shed()
+    test_followups_of_queued_posts()
+    print("\n✨ All tests completed!")
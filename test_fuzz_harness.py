@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for the differential fuzz harness
+Checks that the current pipeline matches the frozen reference and that a
+deliberately broken pipeline is caught with a small reproducer
+"""
+
+from config import SOURCE_GROUP_SETTINGS
+from fuzz_harness import legacy_modify_text, minimise, reference_rules, run_fuzz
+from message_processor import MessageProcessor
+
+GROUP_ID = -1009990039
+
+
+class CaseSensitiveKeywords(MessageProcessor):
+    """Broken on purpose: keyword replacement ignores lower-case spellings"""
+
+    def _replace_keywords(self, text: str) -> str:
+        for pattern, new_keyword in self._keyword_patterns:
+            text = text.replace(pattern.pattern.replace('\\', ''), new_keyword)
+        return text
+
+
+def test_current_pipeline_matches_reference():
+    """No divergence on a few hundred adversarial captions"""
+    print("🧪 Testing current pipeline against the reference")
+    result = run_fuzz(cases=300, seed=11, repeat=1)
+    print(f"   {result['cases']} cases, speedup {result['speedup']}")
+    assert result['divergences'] == []
+
+
+def test_prefixed_path_matches_reference():
+    """A labelled group's posts match the original "[letter] " prefix path"""
+    print("\n🧪 Testing the prefixed path against the reference")
+    settings = dict(next(iter(SOURCE_GROUP_SETTINGS.values())), letter='S', name='Sam',
+                    delivery_message='2/4 weeks delivery')
+    settings['output_template'] = dict(settings['output_template'], delivery='2/4 weeks delivery')
+    SOURCE_GROUP_SETTINGS[GROUP_ID] = settings
+    try:
+        result = run_fuzz(cases=300, seed=11, processor=MessageProcessor(), repeat=1)
+    finally:
+        del SOURCE_GROUP_SETTINGS[GROUP_ID]
+    print(f"   {result['cases']} cases, {result['prefixed_cases']} prefixed")
+    assert result['prefixed_cases'] > 0
+    assert result['divergences'] == []
+
+
+def test_reference_reads_no_config():
+    """The frozen reference applies exactly the rules it is given"""
+    rules = dict(reference_rules(), keyword_replacements={'bag': 'tote'},
+                 price_update_rules={'90': '95'}, delivery_message='Ships in 2 days')
+    rules['contact_info'] = dict(rules['contact_info'], auto_add_contact=False)
+    assert legacy_modify_text('Gucci bag 90 dm', None, rules) == 'Gucci tote 95 dm\n\nShips in 2 days'
+
+
+def test_divergence_is_minimised():
+    """A broken pipeline is reported with a short reproducer"""
+    print("\n🧪 Testing divergence reporting")
+    result = run_fuzz(cases=300, seed=11, processor=CaseSensitiveKeywords(), repeat=1)
+    shortest = min(result['divergences'], key=lambda divergence: len(divergence['input']))
+    print(f"   {len(result['divergences'])} divergences, shortest {shortest['input']!r}")
+    assert result['divergences']
+    assert len(shortest['input']) <= 10
+    assert shortest['expected'] != shortest['actual']
+
+
+def test_minimise():
+    """Delta debugging keeps only what makes the check fail"""
+    text = 'Rolex watch £50 with box, NEW STOCK, cheap postage'
+    assert minimise(text, lambda candidate: '£5' in candidate) == '£5'
+
+
+if __name__ == "__main__":
+    test_current_pipeline_matches_reference()
+    test_prefixed_path_matches_reference()
+    test_reference_reads_no_config()
+    test_divergence_is_minimised()
+    test_minimise()
+    print("\n✨ All tests completed!")
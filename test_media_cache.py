@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the media handle cache
+Checks TTL/LRU eviction and that a protected group's reposted photo is sent
+from the cache instead of being downloaded and uploaded again
+"""
+
+import asyncio
+from telethon.errors import ChatForwardsRestrictedError
+from telethon.tl.types import InputPhoto, Message, MessageMediaPhoto, PeerChannel
+from bot import MessageForwarderBot
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob, MediaRef
+from media_cache import MediaHandleCache
+from selftest import _synthetic_photo
+
+GROUP_ID = -1009990002
+
+
+class ProtectedSourceClient(FakeTelegramClient):
+    """Refuses to send source-group media by reference, like a protected chat"""
+
+    async def send_file(self, entity, file, caption=None, **kwargs):
+        items = file if isinstance(file, (list, tuple)) else [file]
+        if any(isinstance(item, InputPhoto) and item.id < 10 ** 12 for item in items):
+            raise ChatForwardsRestrictedError(request=None)
+        return await super().send_file(entity, file, caption=caption, **kwargs)
+
+
+def test_ttl_and_lru():
+    """Expired entries miss, the least recently used entry is evicted first"""
+    print("🧪 Testing TTL and LRU eviction")
+    now = [0.0]
+    cache = MediaHandleCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    refs = [MediaRef('photo', i, 0, b'', 100) for i in range(3)]
+    cache.put(refs[0], 'a')
+    cache.put(refs[1], 'b')
+    assert cache.get(refs[0]) == 'a'  # refs[1] is now least recently used
+    cache.put(refs[2], 'c')
+    assert cache.get(refs[1]) is None
+    now[0] = 11
+    assert cache.get(refs[2]) is None
+    stats = cache.stats()
+    print(f"   Stats: {stats}")
+    assert stats['hits'] == 1 and stats['misses'] == 2 and stats['evictions'] == 1
+    assert stats['bytes_saved'] == 200
+
+
+def test_protected_repost_uses_cache():
+    """Only the first post of a protected photo is downloaded and uploaded"""
+    print("\n🧪 Testing re-upload and cached reposts")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = ProtectedSourceClient()
+        bot.target_peer = 'target'
+        bot.pacing_enabled = False
+        photo = _synthetic_photo(7)
+        bot.client.history[GROUP_ID] = [
+            Message(id=1, peer_id=PeerChannel(9990002), date=None, message='Bag £50',
+                    media=MessageMediaPhoto(photo=photo))
+        ]
+        content = {'text': '[G1] Bag', 'media': [photo], 'media_type': 'photo', 'caption': ''}
+        for message_id in (1, 2):  # the same photo posted again
+            await bot.forward_to_target(ForwardJob.from_content(content, GROUP_ID, message_id=1))
+        return bot
+
+    bot = asyncio.run(run())
+    downloads = sum(1 for name, *_ in bot.client.calls if name == 'download_media')
+    stats = bot.media_cache.stats()
+    print(f"   Sent {bot.client.sent_count}, downloads {downloads}, cache {stats}")
+    assert bot.client.sent_count == 2
+    assert downloads == 1
+    assert GROUP_ID in bot.restricted_groups
+    assert stats['hits'] == 1 and stats['bytes_saved'] == 2 * 150000
+    assert 'media' in bot.metrics.cache_hit_rates()
+
+
+if __name__ == "__main__":
+    test_ttl_and_lru()
+    test_protected_repost_uses_cache()
+    print("\n✨ All tests completed!")
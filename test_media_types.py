@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script for typed media classification and native album sends
+Checks each kind of Telegram media, that videos are no longer mistaken for
+documents, and that an album costs one request, including a source album
+whose items arrive as separate messages
+"""
+
+import asyncio
+from types import SimpleNamespace
+from telethon import events
+from telethon.tl.types import (
+    Document,
+    DocumentAttributeAnimated,
+    DocumentAttributeAudio,
+    DocumentAttributeFilename,
+    DocumentAttributeSticker,
+    DocumentAttributeVideo,
+    InputStickerSetEmpty,
+    Message,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+    MessageMediaWebPage,
+    PeerChannel,
+    PeerUser,
+    PhotoEmpty,
+    WebPageEmpty,
+)
+from bot import MessageForwarderBot
+from coalescer import PostCoalescer, merge_jobs
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob
+from media_types import classify_media
+from message_processor import MessageProcessor
+from selftest import _synthetic_photo
+
+GROUP_ID = -1009990031
+
+
+def _document(document_id: int, *attributes) -> Document:
+    return Document(id=document_id, access_hash=1, file_reference=b'\x01', date=None,
+                    mime_type='application/octet-stream', size=2048, dc_id=2,
+                    attributes=list(attributes))
+
+
+def _video(document_id: int) -> Document:
+    return _document(document_id, DocumentAttributeVideo(duration=12, w=720, h=1280))
+
+
+def test_classify():
+    """Every kind of media is told apart by its TL type and attributes"""
+    print("🧪 Testing media classification")
+    cases = {
+        'photo': MessageMediaPhoto(photo=_synthetic_photo(1)),
+        'video': MessageMediaDocument(document=_video(2)),
+        'animation': MessageMediaDocument(document=_document(
+            3, DocumentAttributeVideo(duration=2, w=320, h=240), DocumentAttributeAnimated())),
+        'video_note': MessageMediaDocument(document=_document(
+            4, DocumentAttributeVideo(duration=5, w=240, h=240, round_message=True))),
+        'voice': MessageMediaDocument(document=_document(5, DocumentAttributeAudio(duration=3, voice=True))),
+        'audio': MessageMediaDocument(document=_document(6, DocumentAttributeAudio(duration=200))),
+        'sticker': MessageMediaDocument(document=_document(
+            7, DocumentAttributeSticker(alt='👍', stickerset=InputStickerSetEmpty()))),
+        'document': _document(8, DocumentAttributeFilename('price list.pdf')),
+    }
+    kinds = {name: classify_media(media)[0] for name, media in cases.items()}
+    print(f"   {kinds}")
+    assert all(name == kind for name, kind in kinds.items())
+    assert classify_media(MessageMediaWebPage(webpage=WebPageEmpty(id=1))) is None
+    assert classify_media(MessageMediaPhoto(photo=PhotoEmpty(id=1))) is None
+
+
+def test_video_is_not_a_document():
+    """A supplier's video keeps its kind and its Document through processing"""
+    print("\n🧪 Testing extract_content on a video")
+    video = _video(9)
+    content = MessageProcessor().extract_content({
+        'text': 'Nike trainers £40', 'media': MessageMediaDocument(document=video, video=True),
+        'photo': None, 'video': video, 'document': video, 'audio': None,
+    })
+    print(f"   {content['media_type']}: {[type(item).__name__ for item in content['media']]}")
+    assert content['media_type'] == 'video' and content['media'] == [video]
+    job = ForwardJob.from_content(content, GROUP_ID, message_id=9)
+    assert job.media_type == 'video' and job.media[0].id == 9
+
+
+def test_album_in_one_request():
+    """A text post merged with 3 photos is sent as one album; voice notes are never merged"""
+    print("\n🧪 Testing native album sends")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = FakeTelegramClient()
+        bot.target_peer = 'target'
+        bot.me_id = 1
+        bot.pacing_enabled = False
+        bot.coalescer = PostCoalescer(bot.best_offer.add, lambda group_id: 5)
+        for message_id in (1, 2, 3, 4):
+            await bot.handle_source_message(Message(
+                id=message_id, peer_id=PeerChannel(9990031), date=None,
+                message='Gucci bag £60' if message_id == 1 else '', from_id=PeerUser(7),
+                media=MessageMediaPhoto(photo=_synthetic_photo(message_id)) if message_id > 1 else None
+            ), GROUP_ID)
+        await bot.coalescer.flush()
+        job = await bot.queue.get()
+        await bot.forward_to_target(job)
+        return bot.client.calls
+
+    calls = asyncio.run(run())
+    sends = [call for call in calls if call[0].startswith('send')]
+    print(f"   {len(sends)} request(s): {[(name, type(args[1]).__name__) for name, args, _ in sends]}")
+    assert len(sends) == 1 and sends[0][0] == 'send_file'
+    assert len(sends[0][1][1]) == 3 and sends[0][2]['caption'].startswith('[G')
+
+    voice = [ForwardJob.from_content(MessageProcessor().extract_content(
+        {'media': MessageMediaDocument(document=_document(
+            message_id, DocumentAttributeAudio(duration=3, voice=True)))}), GROUP_ID, message_id)
+        for message_id in (11, 12)]
+    assert voice[0].media_type == 'voice' and merge_jobs(*voice) is None
+
+
+def _album_item(message_id: int, caption: str = '') -> Message:
+    return Message(id=message_id, peer_id=PeerChannel(9990031), date=None, message=caption,
+                   from_id=PeerUser(7), grouped_id=555,
+                   media=MessageMediaPhoto(photo=_synthetic_photo(message_id)))
+
+
+def test_source_album_one_post():
+    """A 4-photo album (caption on the first) is one send with the default config"""
+    print("\n🧪 Testing a source album")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = FakeTelegramClient()
+        bot.target_peer = 'target'
+        bot.me_id = 1
+        bot.pacing_enabled = False
+        bot._add_group_handlers(GROUP_ID)
+        handlers = {type(event): handler for event, handler in bot.client.handlers}
+        album = [_album_item(21, 'Gucci bag £60')] + [_album_item(i) for i in (22, 23, 24)]
+        # Telethon raises NewMessage for every item, then one Album event
+        for message in album:
+            await handlers[events.NewMessage](SimpleNamespace(message=message))
+        await handlers[events.Album](SimpleNamespace(messages=album))
+        queued = len(bot.queue)
+        await bot.forward_to_target(await bot.queue.get())
+        return queued, bot.client.calls
+
+    queued, calls = asyncio.run(run())
+    sends = [call for call in calls if call[0].startswith('send')]
+    print(f"   {queued} queued, {len(sends)} request(s)")
+    assert queued == 1 and len(sends) == 1 and sends[0][0] == 'send_file'
+    assert [item.id for item in sends[0][1][1]] == [21, 22, 23, 24]
+    assert 'Gucci bag' in sends[0][2]['caption']
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_video_is_not_a_document()
+    test_album_in_one_request()
+    test_source_album_one_post()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for output templates
+Checks the post layout, duplicate detection and per-group overrides
+"""
+
+from output_templates import OutputTemplate
+
+CONTACT_INFO = {
+    'contact_text': 'For orders message here',
+    'telegram_link': 'https://t.me/BFSshopuk',
+    'shop_name': 'BFS',
+    'auto_add_contact': True,
+}
+DEFAULT = {
+    'prefix': '[{letter}] ',
+    'delivery': 'Quick Free delivery 3/4 days',
+    'contact': '{contact_text}\n{telegram_link}',
+    'separator': '\n\n',
+}
+
+
+def test_layout():
+    """Prefix, body, delivery line and contact block in order"""
+    print("🧪 Testing the default layout")
+    template = OutputTemplate(DEFAULT, letter='S', contact_info=CONTACT_INFO)
+    text = template.render('Gucci bag £60')
+    print(f"   {text!r}")
+    assert text == ('[S] Gucci bag £60\n\nQuick Free delivery 3/4 days\n\n'
+                    'For orders message here\nhttps://t.me/BFSshopuk')
+    assert template.render('Gucci bag £60', prefixed=False).startswith('Gucci bag')
+    assert template.render('') == ''
+
+
+def test_existing_parts_not_repeated():
+    """A body that already has the delivery line or contact text keeps one copy"""
+    print("\n🧪 Testing duplicate detection")
+    template = OutputTemplate(DEFAULT, letter='S', contact_info=CONTACT_INFO)
+    body = 'Bag £60\nquick free DELIVERY 3/4 days\nfor orders message here'
+    text = template.render(body, prefixed=False)
+    print(f"   {text!r}")
+    assert text == body
+
+
+def test_group_overrides():
+    """Per-group delivery line, and parts left out"""
+    print("\n🧪 Testing per-group templates")
+    joyce = OutputTemplate({**DEFAULT, 'delivery': '2/4 weeks delivery'}, letter='J',
+                           contact_info=CONTACT_INFO)
+    assert '\n\n2/4 weeks delivery\n\n' in joyce.render('Watch £20')
+    bare = OutputTemplate({**DEFAULT, 'prefix': '', 'contact': ''}, letter='A',
+                          contact_info=CONTACT_INFO)
+    assert bare.render('Watch £20') == 'Watch £20\n\nQuick Free delivery 3/4 days'
+    no_contact = OutputTemplate(DEFAULT, letter='A',
+                                contact_info={**CONTACT_INFO, 'auto_add_contact': False})
+    assert no_contact.render('Watch £20').endswith('3/4 days')
+
+
+if __name__ == "__main__":
+    test_layout()
+    test_existing_parts_not_repeated()
+    test_group_overrides()
+    print("\n✨ All tests completed!")
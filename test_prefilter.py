@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for the pre-filter stage
+Checks each rule, the split-post exemptions and that dropped chatter never
+reaches processing or the queue
+"""
+
+import asyncio
+from telethon.tl.types import (
+    Document,
+    DocumentAttributeSticker,
+    InputStickerSetEmpty,
+    Message,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+    PeerChannel,
+    PeerUser,
+)
+from bot import MessageForwarderBot
+from dedup_store import DedupStore
+from fake_client import FakeTelegramClient
+from prefilter import Prefilter, compile_rules, reject_reason
+from selftest import _synthetic_photo
+
+GROUP_ID = -1009990004
+RULES = {
+    'min_length': 10,
+    'require_price': True,
+    'require_media': True,
+    'blocklist': ['sold', 'good morning'],
+    'senders': [],
+}
+
+
+def _message(message_id: int, text: str, media=None, sender: int = 7) -> Message:
+    return Message(id=message_id, peer_id=PeerChannel(9990004), date=None, message=text,
+                   media=media, from_id=PeerUser(sender))
+
+
+def _sticker():
+    return MessageMediaDocument(document=Document(
+        id=1, access_hash=1, file_reference=b'', date=None, mime_type='image/webp', size=10,
+        dc_id=2, attributes=[DocumentAttributeSticker(alt='👍', stickerset=InputStickerSetEmpty())]))
+
+
+def test_rules():
+    """Each rule rejects its kind of chatter; split halves of a listing pass"""
+    print("🧪 Testing pre-filter rules")
+    rules = compile_rules(RULES, merges_posts=True)
+    cases = {
+        'ok': reject_reason(rules, 'ok', False, 7),
+        'no price': reject_reason(rules, 'Anyone in London today?', False, 7),
+        'sold': reject_reason(rules, 'Rolex £50 SOLD', True, 7),
+        'text half': reject_reason(rules, 'Gucci bag £60, all colours', False, 7),
+        'photo half': reject_reason(rules, '', True, 7),
+        'listing': reject_reason(rules, 'Gucci bag £60', True, 7),
+    }
+    print(f"   {cases}")
+    assert cases == {'ok': 'min_length', 'no price': 'price', 'sold': 'blocklist',
+                     'text half': None, 'photo half': None, 'listing': None}
+    no_merge = compile_rules(RULES)
+    assert reject_reason(no_merge, 'Gucci bag £60, all colours', False, 7) == 'media'
+    only_sam = compile_rules({'senders': [1]})
+    assert reject_reason(only_sam, 'Gucci bag £60', True, 7) == 'sender'
+    assert compile_rules({'min_length': 0, 'blocklist': []}) is None
+
+
+def test_chatter_never_queued():
+    """Dropped messages skip processing and queueing and are counted per rule"""
+    print("\n🧪 Testing the pre-filter in the bot")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = FakeTelegramClient()
+        bot.me_id = 1
+        bot.prefilter = Prefilter(lambda group_id: RULES)
+        processed = []
+        process_message = bot.processor.process_message
+        bot.processor.process_message = lambda data, group_id: processed.append(1) or process_message(data, group_id)
+        messages = [
+            _message(1, 'Good morning all!'),
+            _message(2, '', _sticker()),
+            _message(3, 'Rolex £50 - SOLD', MessageMediaPhoto(photo=_synthetic_photo(3))),
+            _message(4, 'Gucci bag £60', MessageMediaPhoto(photo=_synthetic_photo(4))),
+        ]
+        for message in messages:
+            await bot.handle_source_message(message, GROUP_ID)
+        return bot, processed
+
+    bot, processed = asyncio.run(run())
+    stats = bot.prefilter.stats()
+    print(f"   Pre-filter: {stats}, queued {len(bot.queue)}")
+    assert len(processed) == 1 and len(bot.queue) == 1
+    assert stats['by_rule'] == {'price': 1, 'min_length': 1, 'blocklist': 1}
+    assert stats['passed'] == 1
+
+
+def test_dropped_chatter_is_not_a_gap():
+    """Pre-filtered messages are claimed, so gap recovery doesn't count them as missed"""
+    print("\n🧪 Testing pre-filtered messages and gap recovery")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = FakeTelegramClient()
+        bot.me_id = 1
+        bot.dedup = DedupStore(':memory:')
+        bot.prefilter = Prefilter(lambda group_id: RULES)
+        messages = [
+            _message(1, 'Gucci bag £60', MessageMediaPhoto(photo=_synthetic_photo(1))),
+            _message(2, 'Good morning all!'),
+            _message(3, 'Anyone in London today?'),
+        ]
+        bot.client.history[GROUP_ID] = messages
+        for message in messages:
+            await bot.handle_source_message(message, GROUP_ID)
+        return await bot.watchdog.recover_gap(), len(bot.queue)
+
+    missed, queued = asyncio.run(run())
+    print(f"   Missed {missed}, queued {queued}")
+    assert missed == 0 and queued == 1
+
+
+if __name__ == "__main__":
+    test_rules()
+    test_chatter_never_queued()
+    test_dropped_chatter_is_not_a_gap()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for the category pricing table
+Checks band lookup, category detection and the legacy-equivalent default table
+"""
+
+import math
+from config import PRICING_LOGIC, WATCH_KEYWORDS
+from pricing_table import PricingTable, legacy_pricing_definition
+
+
+TIERED = {
+    'round_up_prices': True,
+    'categories': [
+        {'name': 'watches', 'keywords': ['watch', 'rolex'], 'bands': [
+            {'up_to': 100, 'multiplier': 1, 'add': 105},
+            {'up_to': None, 'multiplier': 1.5, 'add': 50}]},
+        {'name': 'bags', 'keywords': ['bag'], 'bands': [
+            {'up_to': None, 'multiplier': 2, 'add': 0},
+            {'up_to': 20, 'multiplier': 3, 'add': 0}]},  # declared out of order
+        {'name': 'default', 'bands': [{'up_to': None, 'multiplier': 1.65, 'add': 5}]},
+    ],
+}
+
+
+def test_band_lookup():
+    """Band bounds are inclusive, out-of-order bands are sorted"""
+    print("🧪 Testing band lookup")
+    table = PricingTable(TIERED)
+    watches, bags = table.category('watches'), table.category('bags')
+    prices = table.price_many(watches, [100, 100.5, 200])
+    print(f"   Watches 100/100.5/200 -> {prices}")
+    assert prices == [205, math.ceil(100.5 * 1.5 + 50), 350]
+    assert table.price_many(bags, [20, 21]) == [60, 42]
+
+
+def test_category_detection():
+    """First category with a matching keyword wins, else the fallback"""
+    print("\n🧪 Testing category detection")
+    table = PricingTable(TIERED)
+    for text, expected in [('ROLEX bag £50', 'watches'), ('Gucci Bag', 'bags'),
+                           ('Nike shoes', 'default')]:
+        name = table.category_for(text).name
+        print(f"   {text!r} -> {name}")
+        assert name == expected
+
+
+def test_legacy_definition_matches_old_formula():
+    """The default table prices exactly like the old two-case formula"""
+    print("\n🧪 Testing legacy-equivalent table")
+    table = PricingTable(legacy_pricing_definition(PRICING_LOGIC, WATCH_KEYWORDS))
+    originals = [0, 1, 9.99, 50, 85, 99.5, 1000, 12345.67]
+    watch = table.price_many(table.category_for('casio watch'), originals)
+    other = table.price_many(table.category_for('leather belt'), originals)
+    assert watch == [math.ceil(p + PRICING_LOGIC['watch_multiplier']) for p in originals]
+    assert other == [math.ceil(p * PRICING_LOGIC['non_watch_multiplier']
+                               + PRICING_LOGIC['non_watch_delivery_fee']) for p in originals]
+    print(f"   {len(originals) * 2} prices identical")
+
+
+if __name__ == "__main__":
+    test_band_lookup()
+    test_category_detection()
+    test_legacy_definition_matches_old_formula()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the on-demand profiling controls
+Checks CPU sampling start/stop, the per-stage breakdown, report and snapshot
+file names, the filters applied to memory snapshots, and the SIGUSR1/SIGUSR2
+toggles
+"""
+
+import os
+import re
+import signal
+import asyncio
+import tempfile
+import tracemalloc
+from profiling import STAGE_MODULES, ProfilingControls, SamplingProfiler
+
+
+def _busy(seconds: float):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        sum(range(1000))
+
+
+def test_cpu_profile():
+    """Sampling runs only between start and stop, and writes both report files"""
+    print("🧪 Testing CPU sampling")
+
+    async def run(workdir):
+        controls = ProfilingControls(output_dir=workdir, sample_interval=0.001)
+        assert controls.stop_cpu_profile() is None  # Not running
+        controls.start_cpu_profile()
+        running = controls.cpu.running and controls.loop_lag.running
+        _busy(0.1)
+        await asyncio.sleep(0.05)
+        report = controls.stop_cpu_profile()
+        samples = controls.cpu.samples
+        await asyncio.sleep(0.02)
+        return running, report, samples, controls
+
+    with tempfile.TemporaryDirectory() as workdir:
+        running, report, samples, controls = asyncio.run(run(workdir))
+        files = sorted(os.listdir(workdir))
+        with open(report) as f:
+            text = f.read()
+    print(f"   {samples} samples, files {files}")
+    assert running and not controls.cpu.running and not controls.loop_lag.running
+    assert controls.cpu.samples == samples and samples > 0  # Nothing sampled after stop
+    assert len(files) == 2
+    assert re.fullmatch(r'cpu-\d{8}-\d{6}\.collapsed', files[0])
+    assert re.fullmatch(r'cpu-\d{8}-\d{6}\.txt', files[1])
+    assert os.path.basename(report) == files[1] and 'samples:' in text
+
+
+def test_stage_breakdown():
+    """Every pipeline module gets its own section; other frames are left out"""
+    print("\n🧪 Testing the per-stage breakdown")
+    here = os.path.dirname(os.path.abspath(__file__))
+    assert all(os.path.exists(os.path.join(here, module)) for module in STAGE_MODULES)
+    profiler = SamplingProfiler()
+    profiler.stacks.update({
+        'run (bot.py:1);add (coalescer.py:90);merge_jobs (coalescer.py:15)': 3,
+        'run (bot.py:1);flush (digest.py:180);render_digest (digest.py:40)': 2,
+        'run (bot.py:1);dispatch (send_lanes.py:50)': 1,
+    })
+    stages = profiler.stage_breakdown()
+    print(f"   {dict(stages)}")
+    assert stages == {'add (coalescer.py:90)': 3, 'merge_jobs (coalescer.py:15)': 3,
+                      'flush (digest.py:180)': 2, 'render_digest (digest.py:40)': 2,
+                      'dispatch (send_lanes.py:50)': 1}
+
+
+def test_memory_snapshots():
+    """The first call only starts tracing; later ones write filtered snapshots"""
+    print("\n🧪 Testing memory snapshots")
+    with tempfile.TemporaryDirectory() as workdir:
+        controls = ProfilingControls(output_dir=workdir)
+        filtered = []
+        filter_traces = tracemalloc.Snapshot.filter_traces
+
+        def spy(snapshot, filters):
+            filtered.append([(f.inclusive, f.filename_pattern) for f in filters])
+            return filter_traces(snapshot, filters)
+
+        tracemalloc.Snapshot.filter_traces = spy
+        try:
+            assert controls.memory_snapshot() is None and tracemalloc.is_tracing()
+            held = [bytearray(1024) for _ in range(100)]
+            path = controls.memory_snapshot()
+        finally:
+            tracemalloc.Snapshot.filter_traces = filter_traces
+            controls.shutdown()
+        name = os.path.basename(path)
+        with open(path) as f:
+            text = f.read()
+    print(f"   {name}: {len(held)} KiB held")
+    assert re.fullmatch(r'memory-\d{8}-\d{6}\.txt', name)
+    assert 'Growth since previous snapshot' in text
+    assert not tracemalloc.is_tracing() and controls._last_snapshot is None
+    # Both ends of the diff exclude tracemalloc's own allocations
+    assert filtered == [[(False, tracemalloc.__file__)]] * 2
+
+
+def test_signal_toggles():
+    """SIGUSR1 starts and stops the CPU profile; SIGUSR2 starts memory tracing"""
+    print("\n🧪 Testing signal toggles")
+
+    async def run(workdir):
+        controls = ProfilingControls(output_dir=workdir, sample_interval=0.001)
+        assert controls.install_signal_handlers()
+        states = []
+        for signum in (signal.SIGUSR1, signal.SIGUSR1, signal.SIGUSR2):
+            os.kill(os.getpid(), signum)
+            await asyncio.sleep(0.05)
+            states.append((controls.cpu.running, tracemalloc.is_tracing()))
+        controls.shutdown()
+        return states
+
+    with tempfile.TemporaryDirectory() as workdir:
+        states = asyncio.run(run(workdir))
+        files = os.listdir(workdir)
+    print(f"   (cpu, memory) after each signal: {states}")
+    assert states == [(True, False), (False, False), (False, True)]
+    assert len(files) == 2 and not tracemalloc.is_tracing()
+
+
+if __name__ == "__main__":
+    test_cpu_profile()
+    test_stage_breakdown()
+    test_memory_snapshots()
+    test_signal_toggles()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming replay of Telegram Desktop exports
+Writes a synthetic export, replays it with a tiny read chunk and checks the
+report and that memory does not grow with the export size
+"""
+
+import os
+import json
+import tempfile
+import tracemalloc
+from replay_export import iter_export_messages, replay
+
+
+def _write_export(path: str, count: int, malformed=()):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n "name": "Sam\'s group",\n "type": "private_supergroup",\n'
+                ' "id": 1879591244,\n "messages": [\n')
+        for message_id in range(1, count + 1):
+            if message_id % 10 == 0:
+                message = {'id': message_id, 'type': 'service', 'action': 'pin_message', 'text': ''}
+            else:
+                message = {
+                    'id': message_id, 'type': 'message', 'date': '2024-01-01T10:00:00',
+                    'text': ['Casio ', {'type': 'bold', 'text': 'watch'}, f' £{message_id % 500}']
+                    if message_id % 2 else f'Gucci wallet for £{message_id % 90} - Boxed',
+                }
+            line = json.dumps(message, ensure_ascii=False)
+            if message_id in malformed:
+                line = line.replace('"type": "message"', '"type": "message" "oops"') + ' ' * 300
+            f.write((',\n' if message_id > 1 else '') + line)
+        f.write('\n ]\n}\n')
+
+
+def test_streaming_parser():
+    """Header and every message come through with a chunk smaller than a message"""
+    print("🧪 Testing streaming export parser")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'result.json')
+        _write_export(path, 500)
+        header, messages = iter_export_messages(path, chunk_size=64)
+        ids = [message['id'] for message in messages]
+        print(f"   Header: {header}, messages: {len(ids)}")
+        assert header['id'] == 1879591244
+        assert ids == list(range(1, 501))
+
+
+def test_malformed_message_skipped():
+    """A broken object is skipped without buffering the rest of the file, even the last one"""
+    print("\n🧪 Testing malformed export messages")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'result.json')
+        _write_export(path, 500, malformed=(3, 251))
+        header, messages = iter_export_messages(path, chunk_size=64, max_message_size=256)
+        ids = [message['id'] for message in messages]
+        print(f"   {len(ids)} messages, missing {sorted(set(range(1, 501)) - set(ids))}")
+        assert ids == [i for i in range(1, 501) if i not in (3, 251)]
+
+        # Near the end of the file, and as the last object
+        _write_export(path, 500, malformed=(498, 499))
+        header, messages = iter_export_messages(path, chunk_size=64, max_message_size=4096)
+        assert [message['id'] for message in messages] == list(range(1, 498)) + [500]
+        _write_export(path, 499, malformed=(499,))
+        header, messages = iter_export_messages(path, chunk_size=64, max_message_size=4096)
+        assert [message['id'] for message in messages] == list(range(1, 499))
+
+
+def test_replay_report_and_memory():
+    """Report lines match messages; peak memory is flat across export sizes"""
+    print("\n🧪 Testing replay report and memory")
+    peaks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (1000, 10000):
+            path = os.path.join(tmp, f'result-{count}.json')
+            out_path = os.path.join(tmp, f'report-{count}.jsonl')
+            _write_export(path, count)
+
+            tracemalloc.start()
+            stats = replay(path, out_path, chunk_size=16 * 1024)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+            with open(out_path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+            print(f"   {count} messages: {stats}, peak {peaks[-1] / 1024:.0f} KiB")
+            assert len(records) == stats['messages'] == count - count // 10
+            assert records[0]['category'] == 'watches' and records[0]['original_prices'] == [1.0]
+            assert records[0]['rewritten_prices'] == [106.0]
+            assert records[1]['category'] == 'default'
+            assert sum(stats['categories'].values()) == stats['messages']
+
+    # 10x the messages must not mean 10x the memory
+    assert peaks[1] < peaks[0] * 2
+
+
+if __name__ == "__main__":
+    test_streaming_parser()
+    test_malformed_message_skipped()
+    test_replay_report_and_memory()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk re-pricing of forwarded listings
+Runs the repricer against a temporary message map and a recording client
+"""
+
+import os
+import asyncio
+import tempfile
+from message_map import MessageMap
+from message_processor import MessageProcessor
+from reprice import Repricer
+
+
+class RecordingClient:
+    """Stands in for TelegramClient and records edit_message calls"""
+
+    def __init__(self):
+        self.edits = []
+
+    async def edit_message(self, entity, message_id, text):
+        self.edits.append((message_id, text))
+
+
+def test_reprice_edits_only_changed_captions():
+    """Only listings whose rendered caption changed are edited"""
+    print("🧪 Testing bulk re-pricing")
+    print("=" * 50)
+
+    processor = MessageProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        message_map = MessageMap(os.path.join(tmp, 'map.db'))
+        checkpoint = os.path.join(tmp, 'checkpoint.json')
+
+        up_to_date = processor.process_message({'text': 'Gucci wallet £35'}, -100)['text']
+        message_map.record(-100, 1, 501, 'Gucci wallet £35', up_to_date)
+        message_map.record(-100, 2, 502, 'Casio watch £50', 'Casio watch £155 (old markup)')
+        message_map.record(-100, 3, 503, '', '')  # photo without caption
+
+        client = RecordingClient()
+        repricer = Repricer(client, 'target', message_map, processor,
+                            checkpoint_path=checkpoint, edits_per_second=1000)
+        stats = asyncio.run(repricer.run())
+
+        print(f"   Stats: {stats}")
+        print(f"   Edits: {client.edits}")
+        assert [message_id for message_id, _ in client.edits] == [502]
+        assert message_map.get(-100, 2).posted_text == client.edits[0][1]
+        assert stats['scanned'] == 3 and stats['edited'] == 1
+        assert not os.path.exists(checkpoint)
+
+        # A second pass has nothing left to change
+        client.edits.clear()
+        asyncio.run(Repricer(client, 'target', message_map, processor,
+                             checkpoint_path=checkpoint).run())
+        assert client.edits == []
+        message_map.close()
+    print("✅ Only changed captions were edited")
+
+
+if __name__ == "__main__":
+    test_reprice_edits_only_changed_captions()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for scheduled pacing
+Checks the spacing timeline, and that scheduled posts are tracked until
+published and edited/deleted as scheduled messages meanwhile
+"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+from bot import MessageForwarderBot
+from fake_client import FakeTelegramClient
+from forward_job import ForwardJob
+from message_map import MessageMap
+from scheduled_pacing import PostTimeline, schedule_date
+
+GROUP_ID = -1009990003
+
+
+def test_timeline_spacing():
+    """Slots keep the delay between posts; only far-off slots are scheduled"""
+    print("🧪 Testing the spacing timeline")
+    now = [1000.0]
+    timeline = PostTimeline(min_lead=10, limit=3, clock=lambda: now[0])
+    slots = [timeline.reserve(4) for _ in range(5)]
+    print(f"   Slots: {slots}")
+    assert slots == [1000, 1004, 1008, 1012, 1016]
+    assert not timeline.should_schedule(slots[1])
+    assert timeline.should_schedule(slots[3])
+    for slot in slots[2:]:
+        timeline.add(slot, GROUP_ID, slot, slot)
+    assert not timeline.should_schedule(1100)  # Telegram's per-chat limit reached
+    now[0] = 2000.0
+    assert timeline.reserve(4) == 2000  # an idle timeline never schedules into the past
+
+    rebuilt = PostTimeline(clock=lambda: now[0])
+    rebuilt.rebuild([SimpleNamespace(id=7, date=schedule_date(2500)),
+                     SimpleNamespace(id=8, date=schedule_date(2500))], [])
+    assert len(rebuilt) == 1 and rebuilt.last_slot == 2500
+    assert rebuilt.reserve(2) == 2502
+
+
+def test_scheduled_posts_follow_publication():
+    """Scheduled posts move to their published id; pending ones stay scheduled"""
+    print("\n🧪 Testing scheduled forwards")
+
+    async def run():
+        bot = MessageForwarderBot(group_ids=[GROUP_ID])
+        bot.client = FakeTelegramClient()
+        bot.target_peer = 'target'
+        bot.message_map = MessageMap(':memory:')
+        bot.scheduled_pacing = True
+        bot.timeline.last_slot = int(time.time()) + 60  # a burst is already scheduled
+        for message_id in (1, 2):
+            await bot.forward_to_target(
+                ForwardJob.from_content({'text': f'Bag {message_id}'}, GROUP_ID, message_id=message_id))
+        first_slot = bot.timeline.upcoming()[0].slot
+
+        published = SimpleNamespace(id=900, date=schedule_date(first_slot), from_scheduled=True)
+        await bot.handle_published(SimpleNamespace(message=published))
+        await bot.apply_edit(ForwardJob.from_content({'text': 'Bag 2 sold'}, GROUP_ID, message_id=2,
+                                                     action='edit'))
+        await bot.apply_delete(ForwardJob.deletion(GROUP_ID, 2))
+        return bot
+
+    bot = asyncio.run(run())
+    calls = bot.client.calls
+    print(f"   Timeline: {bot.timeline.stats()}")
+    assert all(kwargs.get('schedule') for name, _, kwargs in calls if name == 'send_message')
+    assert bot.message_map.get(GROUP_ID, 1).target_message_id == 900
+    assert bot.message_map.get(GROUP_ID, 1).scheduled_for is None
+    edit = next(kwargs for name, _, kwargs in calls if name == 'edit_message')
+    assert edit.get('schedule') is not None
+    assert any(name == 'DeleteScheduledMessagesRequest' for name, _, _ in calls)
+    assert bot.message_map.get(GROUP_ID, 2) is None
+    assert len(bot.timeline) == 0
+
+
+if __name__ == "__main__":
+    test_timeline_spacing()
+    test_scheduled_posts_follow_publication()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the send lanes
+Checks size/type routing and that text posts are sent while a large video
+is still uploading, with edits of the video applied after it
+"""
+
+import time
+import asyncio
+from forward_job import ForwardJob, MediaRef
+from send_lanes import SendLanes, FAST, BULK
+
+MB = 1024 * 1024
+
+
+def _job(message_id: int, media_type: str = None, size: int = 0,
+         action: str = 'new') -> ForwardJob:
+    kind = 'photo' if media_type == 'photo' else 'document'
+    media = (MediaRef(kind, message_id, 0, b'', size),) if media_type else ()
+    return ForwardJob(-100, message_id, None, time.time(), media_type, media,
+                      f'item {message_id}', action=action)
+
+
+def test_routing():
+    """Large or unknown-size videos/documents go bulk, text and photos stay fast"""
+    print("🧪 Testing lane routing")
+
+    async def handler(job):
+        return True
+
+    lanes = SendLanes(handler, workers=2, threshold=5 * MB)
+    routes = {
+        'text': lanes.lane_for(_job(1)),
+        'photo': lanes.lane_for(_job(2, 'photo', 300_000)),
+        'small video': lanes.lane_for(_job(3, 'video', 2 * MB)),
+        'large video': lanes.lane_for(_job(4, 'video', 200 * MB)),
+        'unknown document': lanes.lane_for(_job(5, 'document', 0)),
+        'edit': lanes.lane_for(_job(6, 'video', 200 * MB, action='edit')),
+    }
+    print(f"   Routes: {routes}")
+    assert routes == {'text': FAST, 'photo': FAST, 'small video': FAST,
+                      'large video': BULK, 'unknown document': BULK, 'edit': FAST}
+    assert SendLanes(handler, workers=0).lane_for(_job(4, 'video', 200 * MB)) == FAST
+
+
+def test_text_not_blocked_by_upload():
+    """Posts behind a slow upload finish first; the upload's edit waits for it"""
+    print("\n🧪 Testing fast lane during a bulk upload")
+    finished = []
+
+    async def handler(job):
+        if job.media_type == 'video':
+            await asyncio.sleep(0.2)
+        finished.append((job.message_id, job.action))
+        return True
+
+    async def run():
+        lanes = SendLanes(handler, workers=1, threshold=5 * MB)
+        lanes.start()
+        await lanes.dispatch(_job(1, 'video', 200 * MB))
+        await lanes.dispatch(_job(1, action='edit'))
+        for message_id in (2, 3, 4):
+            await lanes.dispatch(_job(message_id))
+        await asyncio.sleep(0.3)
+        lanes.stop()
+        return lanes.stats()
+
+    stats = asyncio.run(run())
+    print(f"   Finished: {finished}")
+    print(f"   Fast: {stats[FAST]}\n   Bulk: {stats[BULK]}")
+    assert finished == [(2, 'new'), (3, 'new'), (4, 'new'), (1, 'new'), (1, 'edit')]
+    assert stats[BULK]['sent'] == 1 and stats[BULK]['bytes'] == 200 * MB
+    assert stats[FAST]['sent'] == 4
+    assert stats[BULK]['send_time']['p50'] >= 0.2
+
+
+if __name__ == "__main__":
+    test_routing()
+    test_text_not_blocked_by_upload()
+    print("\n✨ All tests completed!")
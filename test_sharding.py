@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for sharded ingestion
+Checks group partitioning, that the shared dedup store lets exactly one
+process claim each message, separate shard logins and that group commands
+reach the shards
+"""
+
+import os
+import queue
+import asyncio
+import tempfile
+import multiprocessing
+from types import SimpleNamespace
+from bot import MessageForwarderBot
+from dedup_store import DedupStore
+from supervisor import Supervisor, partition_groups
+
+
+class _IdleProcess:
+    """Stands in for a child process that is never started"""
+
+    def __init__(self, **kwargs):
+        self.pid = 0
+
+    def start(self):
+        pass
+
+
+def _claim_all(path: str, results):
+    store = DedupStore(path)
+    results.put(sum(store.claim(-100, message_id) for message_id in range(200)))
+    store.close()
+
+
+def test_partition_groups():
+    """Every group lands in exactly one shard, shards stay balanced"""
+    print("🧪 Testing group partitioning")
+    groups = [-1, -2, -3, -4, -5]
+    shards = partition_groups(groups, 2)
+    print(f"   2 shards: {shards}")
+    assert sorted(sum(shards, [])) == sorted(groups)
+    assert [len(shard) for shard in shards] == [3, 2]
+    assert len(partition_groups(groups, 16)) == len(groups)
+
+
+def test_dedup_across_processes():
+    """Four processes race to claim the same 200 messages"""
+    print("\n🧪 Testing shared dedup store")
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dedup.db')
+        DedupStore(path).close()
+        results = context.Queue()
+        processes = [context.Process(target=_claim_all, args=(path, results))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        claimed = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+
+        store = DedupStore(path)
+        print(f"   Claims per process: {claimed}")
+        assert sum(claimed) == 200
+        assert store.last_message_id(-100) == 199
+        store.close()
+
+
+def test_shards_need_own_login():
+    """Shard sessions are never copied from the main one; missing logins block the start"""
+    print("\n🧪 Testing shard logins")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            open('session_name.session', 'w').close()
+            supervisor = Supervisor(shards=2, group_ids=[-1, -2, -3])
+            missing = supervisor.missing_sessions()
+            print(f"   Missing: {missing}")
+            assert missing == ['session_name.shard0', 'session_name.shard1']
+            assert not os.path.exists('session_name.shard0.session')
+            open('session_name.shard0.session', 'w').close()
+            assert supervisor.missing_sessions() == ['session_name.shard1']
+        finally:
+            os.chdir(cwd)
+
+
+def test_group_commands_reach_shards():
+    """/pause in the send process stops the owning shard, also after its restart"""
+    print("\n🧪 Testing group commands in sharded mode")
+    supervisor = Supervisor(shards=2, group_ids=[-1, -2, -3])
+    supervisor.commands = queue.Queue()
+    supervisor.controls = {name: queue.Queue() for name in supervisor.controls}
+
+    sender = MessageForwarderBot(group_ids=[], role='send', control=supervisor.commands)
+    sender.pause_group(-2)
+    sender.drain_group(-3)
+    sender.resume_group(-3)
+    supervisor.relay_commands()
+    relayed = {name: list(control.queue) for name, control in supervisor.controls.items()}
+    print(f"   Relayed: {relayed}, state {supervisor.group_state}")
+    assert relayed == {'shard0': [('drain', -3), ('resume', -3)], 'shard1': [('pause', -2)]}
+    assert supervisor.group_state == {-2: 'pause'}
+
+    async def apply(control):
+        shard = MessageForwarderBot(group_ids=[-2], role='ingest', control=control)
+        task = asyncio.create_task(shard._read_control())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        return shard
+
+    shard = asyncio.run(apply(supervisor.controls['shard1']))
+    assert -2 not in shard.enabled_groups
+
+    # A restarted shard is told again
+    supervisor.context = SimpleNamespace(Process=_IdleProcess)
+    supervisor.start(supervisor.processes['shard1'])
+    assert list(supervisor.controls['shard1'].queue) == [('pause', -2)]
+
+
+if __name__ == "__main__":
+    test_partition_groups()
+    test_dedup_across_processes()
+    test_shards_need_own_login()
+    test_group_commands_reach_shards()
+    print("\n✨ All tests completed!")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for the soak harness
+Checks drift detection on made-up samples and a short soak run end to end
+"""
+
+import os
+import json
+import asyncio
+import tempfile
+from soak import detect_drift, run_soak
+
+
+def _sample(rss: float, p99: float, dicts: int) -> dict:
+    return {'rss_mb': rss, 'latency_ms': {'p50': p99 / 2, 'p95': p99, 'p99': p99},
+            'objects': {'dict': dicts, 'function': 1000}}
+
+
+def test_detect_drift():
+    """Steady samples pass; growing memory, latency or objects fail"""
+    print("🧪 Testing drift detection")
+    steady = [_sample(50, 20, 5000) for _ in range(10)]
+    assert detect_drift(steady) == []
+
+    leaking = [_sample(50 + 20 * i, 20 * 1.5 ** i, 5000 + 5000 * i) for i in range(10)]
+    failures = detect_drift(leaking)
+    print(f"   {failures}")
+    assert len(failures) == 3
+    assert detect_drift(leaking[:2]) == []  # not enough samples after warm-up
+
+
+def test_short_soak():
+    """A short run sends everything, samples on simulated time and reports"""
+    print("\n🧪 Testing a short soak run")
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, 'soak.jsonl')
+        result = asyncio.run(run_soak(messages=3000, hours=2, sample_minutes=15,
+                                      report_path=report_path))
+        with open(report_path) as f:
+            lines = [json.loads(line) for line in f]
+    print(f"   {result}")
+    assert result['sent'] == result['messages'] == 3000
+    assert result['failures'] == []
+    assert 7 <= result['samples'] <= 10
+    assert lines[-1]['summary'] == result
+    assert all(0 < line['sim_hours'] <= 2.1 for line in lines[:-1])
+
+
+if __name__ == "__main__":
+    test_detect_drift()
+    test_short_soak()
+    print("\n✨ All tests completed!")
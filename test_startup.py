@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the startup warm-up
+Checks that every configured group's rules are warmed, that startup steps are
+timed, and media DC warming with and without Telethon's private sender API
+"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+import bot as bot_module
+from bot import MessageForwarderBot
+from config import SOURCE_GROUP_SETTINGS
+from fake_client import FakeTelegramClient
+from message_processor import MessageProcessor
+from startup import StartupTimer
+
+
+def test_warm_up_every_group():
+    """warm_up runs the sample through each configured group and the ungrouped path"""
+    print("🧪 Testing rule warm-up")
+    processor = MessageProcessor()
+    seen = []
+    process_message = processor.process_message
+
+    def spy(message_data, source_group_id=None):
+        seen.append(source_group_id)
+        return process_message(message_data, source_group_id)
+
+    processor.process_message = spy
+    warmed = processor.warm_up()
+    print(f"   Warmed {warmed} group(s): {seen}")
+    assert warmed == len(SOURCE_GROUP_SETTINGS)
+    assert seen == list(SOURCE_GROUP_SETTINGS) + [None]
+
+    seen.clear()
+    assert processor.warm_up([-1, -2]) == 2 and seen == [-1, -2, None]
+
+
+def test_startup_timer():
+    """Each step is recorded with its duration, even when it fails"""
+    print("\n🧪 Testing the startup timer")
+    timer = StartupTimer()
+    with timer.step('sleep'):
+        time.sleep(0.02)
+    try:
+        with timer.step('failing'):
+            raise ValueError('boom')
+    except ValueError:
+        pass
+    timer.report()
+    print(f"   {timer.steps}, total {timer.total_ms:.1f} ms")
+    assert [name for name, _ in timer.steps] == ['sleep', 'failing']
+    assert timer.steps[0][1] >= 20 and timer.total_ms >= timer.steps[0][1]
+
+
+class _SenderClient(FakeTelegramClient):
+    """Fake client with Telethon's private exported-sender calls"""
+
+    def __init__(self):
+        super().__init__()
+        self.session = SimpleNamespace(dc_id=2)
+        self.borrowed = []
+
+    async def _borrow_exported_sender(self, dc_id):
+        self.borrowed.append(dc_id)
+        return dc_id
+
+    async def _return_exported_sender(self, sender):
+        pass
+
+
+def test_warm_media_dcs():
+    """Media DCs other than the home one are borrowed once; without the API, skipped"""
+    print("\n🧪 Testing media DC warming")
+    saved = bot_module.WARM_MEDIA_DC_IDS, bot_module.TARGET_GROUP_ID
+    bot_module.WARM_MEDIA_DC_IDS, bot_module.TARGET_GROUP_ID = [4, 2, 1], 0
+
+    async def run(client):
+        bot = MessageForwarderBot(group_ids=[])
+        bot.client = client
+        await bot._warm_media_dcs()
+
+    try:
+        with_api = _SenderClient()
+        asyncio.run(run(with_api))
+        without_api = FakeTelegramClient()
+        without_api.session = SimpleNamespace(dc_id=2)
+        asyncio.run(run(without_api))  # Must not raise
+    finally:
+        bot_module.WARM_MEDIA_DC_IDS, bot_module.TARGET_GROUP_ID = saved
+    print(f"   Borrowed senders for DCs {with_api.borrowed}")
+    assert with_api.borrowed == [1, 4]
+
+
+if __name__ == "__main__":
+    test_warm_up_every_group()
+    test_startup_timer()
+    test_warm_media_dcs()
+    print("\n✨ All tests completed!")
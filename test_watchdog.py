@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the connection watchdog
+Checks reconnecting after a dropped connection and gap recovery without
+duplicates, against the offline fake client
+"""
+
+import asyncio
+from telethon.tl.types import Message, MessageMediaPhoto, PeerChannel
+from bot import MessageForwarderBot
+from dedup_store import DedupStore
+from fake_client import FakeTelegramClient
+from selftest import _synthetic_photo
+
+GROUP_ID = -1009990001
+
+
+def _bot() -> MessageForwarderBot:
+    bot = MessageForwarderBot(group_ids=[GROUP_ID])
+    bot.client = FakeTelegramClient()
+    bot.dedup = DedupStore(':memory:')
+    bot.client.history[GROUP_ID] = [
+        Message(id=message_id, peer_id=PeerChannel(9990001), date=None,
+                message=f'Leather bag £{message_id}0')
+        for message_id in range(1, 6)
+    ]
+    return bot
+
+
+def test_reconnect_recovers_gap_once():
+    """Messages after the last claimed one are queued once, however often we recover"""
+    print("🧪 Testing gap recovery after reconnect")
+
+    async def run():
+        bot = _bot()
+        for message_id in (1, 2, 3):
+            bot.dedup.claim(GROUP_ID, message_id)
+        bot.client.drop()
+        bot.watchdog._running = True
+        await bot.watchdog.reconnect()
+        again = await bot.watchdog.recover_gap()
+        queued = sorted([(await bot.queue.get()).message_id for _ in range(len(bot.queue))])
+        return bot, again, queued
+
+    bot, again, queued = asyncio.run(run())
+    print(f"   Queued {queued}, stats {bot.watchdog.stats()}")
+    assert bot.client.is_connected()
+    assert queued == [4, 5]
+    assert again == 0
+
+
+def test_run_loop_notices_drop():
+    """A dropped connection is restored by the watchdog loop on its own"""
+    print("\n🧪 Testing reconnect from the watch loop")
+
+    async def run():
+        bot = _bot()
+        bot.watchdog.interval = 0.01
+        task = asyncio.create_task(bot.watchdog.run())
+        await asyncio.sleep(0.05)
+        bot.client.drop()
+        await asyncio.sleep(0.1)
+        bot.watchdog.stop()
+        await task
+        return bot
+
+    bot = asyncio.run(run())
+    print(f"   Reconnects: {bot.watchdog.reconnects}")
+    assert bot.watchdog.reconnects == 1
+    assert bot.client.is_connected()
+
+
+def test_recovered_album_one_post():
+    """A missed album is recovered as one post, between the messages around it"""
+    print("\n🧪 Testing gap recovery of an album")
+
+    async def run():
+        bot = _bot()
+        bot.client.history[GROUP_ID][3:] = [
+            Message(id=message_id, peer_id=PeerChannel(9990001), date=None,
+                    message='Leather bag £40' if message_id == 4 else '', grouped_id=77,
+                    media=MessageMediaPhoto(photo=_synthetic_photo(message_id)))
+            for message_id in (4, 5, 6)
+        ] + [Message(id=7, peer_id=PeerChannel(9990001), date=None, message='Wallet £15')]
+        for message_id in (1, 2, 3):
+            bot.dedup.claim(GROUP_ID, message_id)
+        missed = await bot.watchdog.recover_gap()
+        queued = [await bot.queue.get() for _ in range(len(bot.queue))]
+        return missed, sorted((job.message_id, len(job.media)) for job in queued)
+
+    missed, queued = asyncio.run(run())
+    print(f"   Recovered {missed}, queued {queued}")
+    assert missed == 4 and queued == [(4, 3), (7, 0)]
+
+
+if __name__ == "__main__":
+    test_reconnect_recovers_gap_once()
+    test_run_loop_notices_drop()
+    test_recovered_album_one_post()
+    print("\n✨ All tests completed!")